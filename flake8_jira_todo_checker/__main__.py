@@ -0,0 +1,5 @@
+import sys
+
+from flake8_jira_todo_checker.cli import main
+
+sys.exit(main())
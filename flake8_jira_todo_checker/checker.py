@@ -1,21 +1,67 @@
-import collections
-import contextlib
+import bisect
 import enum
-import io
+import itertools
 import logging
+import pathlib
 import re
+import tokenize
 
+from flake8_jira_todo_checker.daemon import add_daemon_options, daemon_client_from_options
+from flake8_jira_todo_checker.git_diff import add_git_diff_options, changed_lines_from_options
+from flake8_jira_todo_checker.issue_cache import add_issue_cache_options, issue_cache_from_options
+from flake8_jira_todo_checker.issue_preload import add_issue_preload_options, issue_preload_from_options
+from flake8_jira_todo_checker.issue_registry import IssueRegistry
 from flake8_jira_todo_checker.jira_client import (
     MAX_ISSUES_PER_JIRA_QUERY,
     add_jira_client_options,
     jira_client_from_options,
 )
+from flake8_jira_todo_checker.jira_guard import JiraUnavailable, add_jira_guard_options, jira_guard_from_options
+from flake8_jira_todo_checker.scan_cache import add_scan_cache_options, scan_cache_from_options
+from flake8_jira_todo_checker.shared_issue_cache import shared_issue_cache_from_options
+from flake8_jira_todo_checker.snapshot import add_snapshot_options, snapshot_from_options
+from flake8_jira_todo_checker.stats import add_stats_options, stats_from_options
+from flake8_jira_todo_checker.todo_index import add_todo_index_options
 from flake8_jira_todo_checker.version import __version__
 
 logger = logging.getLogger(__name__)
 
 _MAX_ERROR_DETAIL_LENGTH = 60
-TodoDetail = collections.namedtuple("ErrorDetail", ["todo_word", "jira_issue", "line", "line_number", "start_of_match"])
+_DEFAULT_ALLOWED_TODO_SYNONYMS = ["TODO"]
+_DEFAULT_DISALLOWED_TODO_SYNONYMS = ["FIXME", "QQ"]
+# Bump this whenever the way scan results are stored in the scan cache changes
+_SCAN_RESULT_FORMAT = 2
+# Marks where a word ends in the tries built by _trie_alternation
+_END_OF_WORD = ""
+
+
+class TodoDetail:
+    # One of these is kept for every TODO until its JIRA issue has been checked, so it doesn't hold on to the line it
+    # was found on.  The text of an error is only cut out of the line if the error is reported.
+    __slots__ = ("todo_word", "jira_issue", "line_number", "start_of_match")
+
+    def __init__(self, todo_word, jira_issue, line_number, start_of_match):
+        self.todo_word = todo_word
+        self.jira_issue = jira_issue
+        self.line_number = line_number
+        self.start_of_match = start_of_match
+
+    def _fields(self):
+        return self.todo_word, self.jira_issue, self.line_number, self.start_of_match
+
+    def __eq__(self, other):
+        if not isinstance(other, TodoDetail):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self):
+        return hash(self._fields())
+
+    def __repr__(self):
+        return (
+            f"TodoDetail(todo_word={self.todo_word!r}, jira_issue={self.jira_issue!r}, "
+            f"line_number={self.line_number!r}, start_of_match={self.start_of_match!r})"
+        )
 
 
 @enum.unique
@@ -27,12 +73,17 @@ class ErrorCode(str, enum.Enum):
     JIR005 = "JIR005 Bad capitalisation of JIRA ticket ID"
 
 
+_ERROR_MESSAGE_TEMPLATES = {error_code: f"{error_code.value}: {{}}" for error_code in ErrorCode}
+_ERROR_MESSAGE_WITH_DETAIL_TEMPLATES = {error_code: f"{error_code.value} ({{}}): {{}}" for error_code in ErrorCode}
+
+
 class Checker:
     name = "flake8-jira-todo-checker"
     version = __version__
 
-    def __init__(self, tree, lines):
+    def __init__(self, tree, lines, filename=None):
         self.lines = lines
+        self.filename = filename
 
     @classmethod
     def add_options(cls, parser):
@@ -48,7 +99,7 @@ class Checker:
             action="store",
             parse_from_config=True,
             comma_separated_list=True,
-            default=["TODO"],
+            default=_DEFAULT_ALLOWED_TODO_SYNONYMS,
             help="Allowed words which will be treated like a TODO.  Defaults to TODO.",
         )
         parser.add_option(
@@ -56,7 +107,7 @@ class Checker:
             action="store",
             parse_from_config=True,
             comma_separated_list=True,
-            default=["FIXME", "QQ"],
+            default=_DEFAULT_DISALLOWED_TODO_SYNONYMS,
             help="Disallowed words which will be treated like a TODO.  Defaults to FIXME, QQ.",
         )
         parser.add_option(
@@ -81,7 +132,26 @@ class Checker:
             "the same time as disallowed-jira-resolutions.",
             default=True,
         )
+        parser.add_option(
+            "--jira-todo-scan-mode",
+            action="store",
+            parse_from_config=True,
+            choices=["lines", "buffer", "comments"],
+            help="How to search for TODOs: 'lines' searches each line containing a TODO synonym separately, 'buffer' "
+            "searches the whole file at once, which is faster for files with many TODOs, and 'comments' only searches "
+            "comments, ignoring TODOs in code and strings.  Defaults to lines.",
+            default="lines",
+        )
         add_jira_client_options(parser)
+        add_jira_guard_options(parser)
+        add_issue_cache_options(parser)
+        add_issue_preload_options(parser)
+        add_snapshot_options(parser)
+        add_daemon_options(parser)
+        add_scan_cache_options(parser)
+        add_git_diff_options(parser)
+        add_stats_options(parser)
+        add_todo_index_options(parser)
 
     @classmethod
     def parse_options(cls, options):
@@ -92,6 +162,25 @@ class Checker:
         cls.allowed_todo_synonyms = set(allowed_todo_synonyms)
         cls.jira_project_ids = jira_project_ids
         cls.todo_pattern = _construct_todo_pattern(jira_project_ids, allowed_todo_synonyms, disallowed_todo_synonyms)
+        cls.todo_buffer_pattern = _construct_todo_pattern(
+            jira_project_ids, allowed_todo_synonyms, disallowed_todo_synonyms, whole_file=True
+        )
+        cls.folded_todo_synonyms = _fold_todo_synonyms(allowed_todo_synonyms, disallowed_todo_synonyms)
+        cls.scan_mode = options.jira_todo_scan_mode
+        cls.stats = stats_from_options(options)
+        # Everything which affects what we'd find in a file
+        cls.scan_config = {
+            "version": __version__,
+            "scan_mode": cls.scan_mode,
+            "todo_pattern": cls.todo_pattern.pattern,
+            "todo_buffer_pattern": cls.todo_buffer_pattern.pattern,
+            "allowed_todo_synonyms": sorted(cls.allowed_todo_synonyms),
+            "has_jira_project_ids": bool(jira_project_ids),
+            "scan_result_format": _SCAN_RESULT_FORMAT,
+        }
+        cls.scan_cache = scan_cache_from_options(options, cls.scan_config)
+        # Worked out once here, rather than in every flake8 worker
+        cls.changed_lines = changed_lines_from_options(options)
 
         if options.disallow_all_jira_resolutions and options.disallowed_jira_resolutions:
             raise ValueError("You cannot set both disallow_all_jira_resolutions and disallowed_jira_resolutions")
@@ -100,7 +189,25 @@ class Checker:
         cls.disallowed_jira_resolutions = options.disallowed_jira_resolutions
         cls.disallow_all_jira_resolutions = options.disallow_all_jira_resolutions
 
-        cls.jira_client = jira_client_from_options(options)
+        def direct_jira_client():
+            # Only used if the daemon stops answering part way through the run, when we may be in one of flake8's
+            # workers, so no preloading or cache shared between them, and no syncing the cache in every one of them.
+            # The guard around the daemon's client covers this too, so that the run's time budget is shared between
+            # them.
+            return issue_cache_from_options(
+                options, jira_client_from_options(options, cls.stats), cls.stats, sync=False
+            )
+
+        jira_client = snapshot_from_options(options) or jira_guard_from_options(
+            options, daemon_client_from_options(options, cls.stats, direct_jira_client), cls.stats
+        )
+        if not jira_client:
+            jira_client = jira_guard_from_options(options, jira_client_from_options(options, cls.stats), cls.stats)
+            issue_lookup = shared_issue_cache_from_options(
+                options, issue_cache_from_options(options, jira_client, cls.stats), cls.stats
+            )
+            jira_client = issue_preload_from_options(options, jira_client, issue_lookup, cls.stats)
+        cls.jira_client = IssueRegistry(jira_client, cls.stats) if jira_client else None
 
     def run(self):
         jira_issues_to_check_batch = []
@@ -115,100 +222,270 @@ class Checker:
         yield from self._check_jira_issues(jira_issues_to_check_batch)
 
     def _check_lines(self):
-        for line_number, line in enumerate(self.lines, start=1):
+        if self.changed_lines is None:
+            self.stats.count(files_checked=1, lines_checked=len(self.lines))
+            return self._check_all_lines()
+
+        changed_lines = self.changed_lines.get(str(pathlib.Path(self.filename).resolve())) if self.filename else None
+        if not changed_lines:
+            logger.debug("Skipping unchanged file")
+            self.stats.count(files_skipped=1)
+            return []
+        self.stats.count(files_checked=1, lines_checked=len(self.lines))
+        return [
+            (error, todo_detail)
+            for error, todo_detail in self._check_all_lines()
+            if (error[0] if error else todo_detail.line_number) in changed_lines
+        ]
+
+    def _check_all_lines(self):
+        if not self.scan_cache:
+            return self._scan_lines()
+
+        key = self.scan_cache.key(self.lines)
+        cached_results = self.scan_cache.get(key)
+        if cached_results is not None:
+            logger.debug("Using cached scan results")
+            self.stats.count(scan_cache_hits=1)
+            return [_decode_scan_result(cached_result) for cached_result in cached_results]
+
+        self.stats.count(scan_cache_misses=1)
+        results = list(self._scan_lines())
+        self.scan_cache.put(key, [_encode_scan_result(result) for result in results])
+        return results
+
+    def _scan_lines(self):
+        matches = 0
+        for line_number, line, match, start_of_match in self._find_matches():
+            logger.debug("Found match: %s on line %s", match.span(), line)
+            matches += 1
+
+            todo_detail, errors, check_jira_issue = _scan_match(
+                match, line_number, line, start_of_match, self.allowed_todo_synonyms, self.jira_project_ids
+            )
+            for error in errors:
+                yield error, None
+            if check_jira_issue:
+                yield None, todo_detail
+
+        self.stats.count(files_scanned=1, lines_scanned=len(self.lines), todo_matches=matches)
+
+    def _find_matches(self):
+        if self.scan_mode == "buffer":
+            return self._find_matches_in_buffer()
+        if self.scan_mode == "comments":
+            return self._find_matches_in_comments()
+        return self._find_matches_in_lines()
+
+    def _find_matches_in_comments(self):
+        # Tokenizing is much slower than searching, so don't bother unless there's a TODO synonym somewhere
+        folded_text = "".join(self.lines).casefold()
+        if not any(synonym in folded_text for synonym in self.folded_todo_synonyms):
+            return
+
+        # We tokenize the lines ourselves rather than asking flake8 for file_tokens, as flake8 would then tokenize
+        # every file for us even when we're not looking at comments.
+        line_iter = iter(self.lines)
+        try:
+            comments = [
+                token.start
+                for token in tokenize.generate_tokens(lambda: next(line_iter, ""))
+                if token.type == tokenize.COMMENT
+            ]
+        except (tokenize.TokenError, SyntaxError):
+            # flake8 reports files which can't be tokenized itself, so just check every line
+            logger.debug("Unable to tokenize file, checking every line instead")
+            yield from self._find_matches_in_lines()
+            return
+
+        for line_number, start_of_comment in comments:
+            line = self.lines[line_number - 1]
+            # Comments always run to the end of the line, so we only need to say where this one starts
+            for match in self.todo_pattern.finditer(line, start_of_comment):
+                yield line_number, line, match, match.start(1)
+
+    def _find_matches_in_lines(self):
+        for line_number in self._candidate_line_numbers():
+            line = self.lines[line_number - 1]
             for match in self.todo_pattern.finditer(line):
-                logger.debug("Found match: %s on line %s", match.span(), line)
+                yield line_number, line, match, match.start(1)
 
-                try:
-                    jira_issue = match.group(2)
-                except IndexError:
-                    jira_issue = None
-                else:
-                    if not jira_issue:
-                        jira_issue = None
-
-                todo_detail = TodoDetail(
-                    todo_word=match.group(1),
-                    jira_issue=jira_issue.strip().upper() if jira_issue else None,
-                    line=line,
-                    line_number=line_number,
-                    start_of_match=match.span(1)[0],
-                )
-                logger.debug("todo_detail: %s", todo_detail)
-
-                if jira_issue and not jira_issue.isupper():
-                    yield _format_error(ErrorCode.JIR005, todo_detail), None
-
-                if todo_detail.todo_word not in self.allowed_todo_synonyms:
-                    yield _format_error(ErrorCode.JIR004, todo_detail), None
-
-                if self.jira_project_ids:
-                    if todo_detail.jira_issue:
-                        yield None, todo_detail
-                    else:
-                        yield _format_error(ErrorCode.JIR001, todo_detail), None
-                else:
-                    yield _format_error(ErrorCode.JIR001, todo_detail), None
+    def _find_matches_in_buffer(self):
+        # Search the whole file at once and then work out which line each match is on, rather than searching each line
+        # separately.
+        text = "".join(self.lines)
+        folded_text = text.casefold()
+        line_starts = None
+
+        if len(folded_text) == len(text):
+            # re can't skip ahead to the interesting parts of the file by itself, so only try matching where we know a
+            # TODO synonym starts, skipping any that an earlier match has already consumed, the same as finditer would.
+            end_of_previous_match = 0
+            matches = []
+            for synonym_offset in sorted(self._synonym_offsets(folded_text)):
+                if synonym_offset - 1 < end_of_previous_match:
+                    continue
+                match = self.todo_buffer_pattern.match(text, synonym_offset - 1)
+                if match:
+                    end_of_previous_match = match.end()
+                    matches.append(match)
+        else:
+            # Some characters fold to more than one character, so offsets in folded_text don't line up with text
+            matches = self.todo_buffer_pattern.finditer(text)
+
+        for match in matches:
+            if line_starts is None:
+                line_starts = [0, *itertools.accumulate(len(line) for line in self.lines)]
+            start_of_match = match.start(1)
+            line_index = bisect.bisect_right(line_starts, start_of_match) - 1
+            yield line_index + 1, self.lines[line_index], match, start_of_match - line_starts[line_index]
+
+    def _candidate_line_numbers(self):
+        # todo_pattern is comparatively slow, so we only run it on lines which contain a TODO synonym somewhere, found
+        # by searching the whole file at once.  casefold rather than lower, so that every character todo_pattern's
+        # re.IGNORECASE would match is folded to the same thing, e.g. the Kelvin sign and K.
+        text = "".join(self.lines)
+        folded_text = text.casefold()
+        if len(folded_text) != len(text):
+            # Some characters fold to more than one character, so offsets in folded_text don't line up with the lines
+            return [
+                line_number
+                for line_number, line in enumerate(self.lines, start=1)
+                if any(synonym in line.casefold() for synonym in self.folded_todo_synonyms)
+            ]
+
+        line_ends = None
+        line_numbers = set()
+        for offset in self._synonym_offsets(folded_text):
+            if line_ends is None:
+                line_ends = list(itertools.accumulate(len(line) for line in self.lines))
+            line_numbers.add(bisect.bisect_right(line_ends, offset) + 1)
+        return sorted(line_numbers)
+
+    def _synonym_offsets(self, folded_text):
+        for synonym in self.folded_todo_synonyms:
+            offset = folded_text.find(synonym)
+            while offset != -1:
+                yield offset
+                offset = folded_text.find(synonym, offset + 1)
 
     def _check_jira_issues(self, jira_issues_to_check):
         if jira_issues_to_check and self.jira_client:
-            existing_issues = self.jira_client.get_issues({detail.jira_issue for detail in jira_issues_to_check})
+            try:
+                existing_issues = self.jira_client.get_issues({detail.jira_issue for detail in jira_issues_to_check})
+            except JiraUnavailable:
+                # Already warned about, and there's nothing more we can check without JIRA
+                return
             for todo_detail in jira_issues_to_check:
                 try:
                     status, resolution = existing_issues[todo_detail.jira_issue]
                 except KeyError:
                     logger.debug("No such issue")
-                    yield _format_error(ErrorCode.JIR002, todo_detail)
+                    yield _format_error(ErrorCode.JIR002, todo_detail, self.lines[todo_detail.line_number - 1])
                 else:
                     logger.debug("Found issue with status: %s and resolution: %s", status, resolution)
                     if status in self.disallowed_jira_statuses:
                         logger.debug("JIRA status is disallowed")
-                        yield _format_error(ErrorCode.JIR003, todo_detail, f"Status={status}")
+                        yield _format_error(
+                            ErrorCode.JIR003, todo_detail, self.lines[todo_detail.line_number - 1], f"Status={status}"
+                        )
                     elif resolution and (
                         self.disallow_all_jira_resolutions or resolution in self.disallowed_jira_resolutions
                     ):
                         logger.debug("JIRA resolution is disallowed")
-                        yield _format_error(ErrorCode.JIR003, todo_detail, f"Resolution={resolution}")
-
-
-def _format_error(error_code, todo_detail, extra_error_detail=None):
-    with contextlib.closing(io.StringIO()) as error_message:
-        error_message.write(error_code.value)
-        if extra_error_detail:
-            error_message.write(" (")
-            error_message.write(extra_error_detail)
-            error_message.write(")")
-        error_message.write(": ")
-        error_message.write(
-            todo_detail.line.rstrip()[
-                todo_detail.start_of_match : todo_detail.start_of_match + _MAX_ERROR_DETAIL_LENGTH
-            ]
-        )
-        if len(todo_detail.line.rstrip()) > todo_detail.start_of_match + _MAX_ERROR_DETAIL_LENGTH:
-            error_message.write("...")
-        return (
-            todo_detail.line_number,
-            todo_detail.start_of_match,
-            error_message.getvalue(),
-            type(Checker),
-        )
+                        yield _format_error(
+                            ErrorCode.JIR003,
+                            todo_detail,
+                            self.lines[todo_detail.line_number - 1],
+                            f"Resolution={resolution}",
+                        )
+
+
+def _scan_match(match, line_number, line, start_of_match, allowed_todo_synonyms, jira_project_ids):
+    # Returns the TodoDetail for a match of todo_pattern, every error which can be reported without asking JIRA, and
+    # whether its JIRA issue still needs to be checked.
+    try:
+        jira_issue = match.group(2)
+    except IndexError:
+        jira_issue = None
+    else:
+        if not jira_issue:
+            jira_issue = None
+
+    todo_detail = TodoDetail(
+        todo_word=match.group(1),
+        jira_issue=jira_issue.strip().upper() if jira_issue else None,
+        line_number=line_number,
+        start_of_match=start_of_match,
+    )
+    logger.debug("todo_detail: %s", todo_detail)
+
+    errors = []
+    if jira_issue and not jira_issue.isupper():
+        errors.append(_format_error(ErrorCode.JIR005, todo_detail, line))
+
+    if todo_detail.todo_word not in allowed_todo_synonyms:
+        errors.append(_format_error(ErrorCode.JIR004, todo_detail, line))
+
+    if jira_project_ids and todo_detail.jira_issue:
+        return todo_detail, errors, True
+    errors.append(_format_error(ErrorCode.JIR001, todo_detail, line))
+    return todo_detail, errors, False
 
 
-def _construct_todo_pattern(jira_project_ids, allowed_todo_synonyms, disallowed_todo_synonyms):
+def _format_error(error_code, todo_detail, line, extra_error_detail=None):
+    # The same as line.rstrip()[start_of_match:end_of_excerpt], with "..." if that cut anything off, but without copying
+    # the whole line.
+    end_of_excerpt = todo_detail.start_of_match + _MAX_ERROR_DETAIL_LENGTH
+    excerpt = line[todo_detail.start_of_match : end_of_excerpt]
+    if len(line) > end_of_excerpt and not line[end_of_excerpt:].isspace():
+        excerpt += "..."
+    else:
+        excerpt = excerpt.rstrip()
+
+    if extra_error_detail:
+        message = _ERROR_MESSAGE_WITH_DETAIL_TEMPLATES[error_code].format(extra_error_detail, excerpt)
+    else:
+        message = _ERROR_MESSAGE_TEMPLATES[error_code].format(excerpt)
+    return todo_detail.line_number, todo_detail.start_of_match, message, type(Checker)
+
+
+def _encode_scan_result(result):
+    error, todo_detail = result
+    if error:
+        line_number, column, message, _ = error
+        return ["error", line_number, column, message]
+    return ["todo", *todo_detail._fields()]
+
+
+def _decode_scan_result(encoded_result):
+    kind, *fields = encoded_result
+    if kind == "error":
+        return (*fields, type(Checker)), None
+    return None, TodoDetail(*fields)
+
+
+def _fold_todo_synonyms(allowed_todo_synonyms, disallowed_todo_synonyms):
+    return tuple({synonym.casefold() for synonym in [*allowed_todo_synonyms, *disallowed_todo_synonyms]})
+
+
+def _construct_todo_pattern(jira_project_ids, allowed_todo_synonyms, disallowed_todo_synonyms, whole_file=False):
     if not allowed_todo_synonyms:
         raise ValueError("You must provide at least one value for allowed-todo-synonyms")
 
-    todo_synonyms = [*allowed_todo_synonyms, *disallowed_todo_synonyms]
-    todo_like = "|".join(todo_synonyms)
+    todo_like = _trie_alternation([*allowed_todo_synonyms, *disallowed_todo_synonyms])
+    # When matching a single line, a TODO right at the start of the line doesn't match as there's nothing before it.
+    # To find exactly the same matches in the whole file, don't let the preceding character be the previous newline.
+    not_a_character = r"[^a-z\n]" if whole_file else "[^a-z]"
     if jira_project_ids:
         return re.compile(
             rf"""
-                [^a-z]                              # Not a character
+                {not_a_character}                   # Not a character
                                                     #   (We don't want to match words which end with a todo synonym)
                 ({todo_like})
                 (
                     [ ]                             # Single Whitespace
-                    ({"|".join(jira_project_ids)})  # JIRA project ID
+                    ({_trie_alternation(jira_project_ids)})  # JIRA project ID
                     -
                     \d+                             # JIRA card number
                 )?
@@ -220,7 +497,7 @@ def _construct_todo_pattern(jira_project_ids, allowed_todo_synonyms, disallowed_
     else:
         return re.compile(
             rf"""
-                [^a-z]                              # Not a character
+                {not_a_character}                   # Not a character
                                                     #   (We don't want to match words which end with a todo synonym)
                 ({todo_like})
                 [^a-z]                              # Not a character
@@ -228,3 +505,30 @@ def _construct_todo_pattern(jira_project_ids, allowed_todo_synonyms, disallowed_
             """,
             re.VERBOSE | re.IGNORECASE,
         )
+
+
+def _trie_alternation(words):
+    # A regex matching any of words, which unlike "|".join(words) doesn't have to try every word in turn, as words with
+    # a common prefix share a branch.  e.g. ["ABC", "ABD", "AB", "XY"] becomes "(?:AB(?:C|D)?|XY)".  Where more than one
+    # word matches, the longest is preferred.
+    trie = {}
+    for word in words:
+        node = trie
+        for character in word:
+            node = node.setdefault(character, {})
+        node[_END_OF_WORD] = None
+    return _trie_to_regex(trie)
+
+
+def _trie_to_regex(node):
+    alternatives = [
+        re.escape(character) + _trie_to_regex(child)
+        for character, child in sorted(node.items())
+        if character != _END_OF_WORD
+    ]
+    if not alternatives:
+        return ""
+    if len(alternatives) == 1 and _END_OF_WORD not in node:
+        return alternatives[0]
+    regex = f"(?:{'|'.join(alternatives)})"
+    return f"{regex}?" if _END_OF_WORD in node else regex
@@ -0,0 +1,249 @@
+import argparse
+import logging
+import os
+import pathlib
+import signal
+import sys
+
+import flake8.main.application
+
+from flake8_jira_todo_checker.checker import Checker
+from flake8_jira_todo_checker.daemon import webhook_address_from_options
+from flake8_jira_todo_checker.daemon_server import serve
+from flake8_jira_todo_checker.issue_cache import issue_cache_from_options
+from flake8_jira_todo_checker.issue_registry import IssueRegistry
+from flake8_jira_todo_checker.jira_client import jira_client_from_options
+from flake8_jira_todo_checker.jira_guard import JiraUnavailable
+from flake8_jira_todo_checker.snapshot import write_snapshot
+from flake8_jira_todo_checker.todo_index import todo_index_from_options
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m flake8_jira_todo_checker")
+    subparsers = parser.add_subparsers(dest="command")
+
+    check_parser = subparsers.add_parser(
+        "check",
+        help="Check every file in two phases: first find all the TODOs, then look up all the JIRA issues they "
+        "reference in as few queries as possible.  Accepts the same arguments as flake8, but only runs this plugin.",
+    )
+    check_parser.set_defaults(func=_check)
+
+    export_snapshot_parser = subparsers.add_parser(
+        "export-snapshot",
+        help="Save the status of every issue in the configured JIRA projects to a file, which can be used with "
+        "--jira-snapshot.  Accepts the same arguments as flake8.",
+    )
+    export_snapshot_parser.add_argument("output", help="Where to write the snapshot")
+    export_snapshot_parser.set_defaults(func=_export_snapshot)
+
+    index_parser = subparsers.add_parser(
+        "index",
+        help="Update the index of which TODOs reference each JIRA issue, only scanning files which have changed since "
+        "they were last indexed.  Accepts the same arguments as flake8.",
+    )
+    index_parser.set_defaults(func=_index)
+
+    query_index_parser = subparsers.add_parser(
+        "query-index",
+        help="Print every TODO in the index which references the given JIRA issues.  Accepts the same arguments as "
+        "flake8.",
+    )
+    query_index_parser.add_argument(
+        "--issues", type=_comma_separated_list, default=[], help="Comma separated JIRA issues, e.g. ABC-1,ABC-2"
+    )
+    query_index_parser.add_argument(
+        "--jql",
+        help="Also look for TODOs referencing the issues in jira-project-ids which JIRA finds with this query, e.g. "
+        "'status CHANGED TO Done AFTER -1d'",
+    )
+    query_index_parser.set_defaults(func=_query_index)
+
+    daemon_parser = subparsers.add_parser(
+        "daemon",
+        help="Keep an authenticated JIRA client and the status of every issue looked up in memory, and answer lookups "
+        "from flake8 runs with the same jira-daemon-socket.  Accepts the same arguments as flake8.",
+    )
+    daemon_parser.set_defaults(func=_daemon)
+
+    # Any arguments we don't recognise are passed through to flake8
+    args, flake8_args = parser.parse_known_args(argv)
+    if not args.command:
+        parser.error("A command is required")
+    return args.func(args, flake8_args)
+
+
+def _initialise_flake8(flake8_args):
+    # Let flake8 parse the command line and config files, which also calls Checker.parse_options
+    app = flake8.main.application.Application()
+    app.initialize(flake8_args)
+    return app
+
+
+def _check(args, flake8_args):
+    app = _initialise_flake8(flake8_args)
+    file_checker_manager = app.file_checker_manager
+    file_checker_manager.make_checkers(app.args)
+
+    # Phase 1: scan every file, reporting the errors which don't need JIRA and remembering the issues which do.
+    jira_issues_to_check_by_file = []
+    for file_checker in file_checker_manager.checkers:
+        checker = Checker(None, file_checker.processor.lines, file_checker.filename)
+        jira_issues_to_check = []
+        for error, jira_issue_to_check in checker._check_lines():
+            if error:
+                _report(file_checker, error)
+            if jira_issue_to_check:
+                jira_issues_to_check.append(jira_issue_to_check)
+        if jira_issues_to_check:
+            jira_issues_to_check_by_file.append((file_checker, checker, jira_issues_to_check))
+
+    # Phase 2: look up every distinct issue at once, which the JIRA client splits into full batches.
+    # Checker.jira_client remembers the results, so phase 3 doesn't go back to JIRA.
+    if Checker.jira_client:
+        all_jira_issues = {
+            jira_issue_to_check.jira_issue
+            for _, _, jira_issues_to_check in jira_issues_to_check_by_file
+            for jira_issue_to_check in jira_issues_to_check
+        }
+        logger.debug("Looking up %s distinct JIRA issues", len(all_jira_issues))
+        try:
+            Checker.jira_client.get_issues(all_jira_issues)
+        except JiraUnavailable:
+            # Phase 3 will skip the JIRA checks
+            pass
+
+    # Phase 3: report the JIRA errors for each file.
+    for file_checker, checker, jira_issues_to_check in jira_issues_to_check_by_file:
+        for error in checker._check_jira_issues(jira_issues_to_check):
+            _report(file_checker, error)
+
+    app.formatter.start()
+    app.report_errors()
+    app.formatter.stop()
+    Checker.stats.report()
+
+    if app.result_count and not app.options.exit_zero:
+        return 1
+    return 0
+
+
+def _export_snapshot(args, flake8_args):
+    app = _initialise_flake8(flake8_args)
+    if not app.options.jira_project_ids:
+        raise ValueError("jira-project-ids must be set to export a snapshot")
+    jira_client = jira_client_from_options(app.options)
+    if not jira_client:
+        raise ValueError("jira-server must be set to export a snapshot")
+
+    issues = jira_client.search_issues(f"project in ({','.join(app.options.jira_project_ids)}) ORDER BY key")
+    write_snapshot(args.output, issues)
+    logger.info("Exported %s issues to %s", len(issues), args.output)
+    return 0
+
+
+def _index(args, flake8_args):
+    app = _initialise_flake8(flake8_args)
+    todo_index = todo_index_from_options(app.options, Checker.scan_config)
+    file_checker_manager = app.file_checker_manager
+    file_checker_manager.make_checkers(app.args)
+
+    indexed = 0
+    for file_checker in file_checker_manager.checkers:
+        lines = file_checker.processor.lines
+        path = str(pathlib.Path(file_checker.filename).resolve())
+        content_hash = todo_index.content_hash(lines)
+        if todo_index.is_current(path, content_hash):
+            continue
+        # Every TODO in the file, even if jira-todo-diff-base says not to check it
+        checker = Checker(None, lines, file_checker.filename)
+        todo_index.update_file(
+            path, content_hash, [todo_detail for _, todo_detail in checker._check_all_lines() if todo_detail]
+        )
+        indexed += 1
+    removed = todo_index.remove_missing_files()
+    todo_index.close()
+    logger.info(
+        "Indexed %s changed files out of %s, removed %s missing files",
+        indexed,
+        len(file_checker_manager.checkers),
+        removed,
+    )
+    return 0
+
+
+def _query_index(args, flake8_args):
+    app = _initialise_flake8(flake8_args)
+    todo_index = todo_index_from_options(app.options, Checker.scan_config)
+    jira_issues = {issue.upper() for issue in args.issues}
+
+    if args.jql:
+        if not app.options.jira_project_ids:
+            raise ValueError("jira-project-ids must be set to query JIRA")
+        jira_client = jira_client_from_options(app.options)
+        if not jira_client:
+            raise ValueError("jira-server must be set to query JIRA")
+        found = jira_client.search_issues(f"project in ({','.join(app.options.jira_project_ids)}) AND ({args.jql})")
+        logger.info("JIRA found %s issues", len(found))
+        jira_issues.update(found)
+
+    for path, line_number, start_of_match, todo_word, jira_issue in todo_index.find(jira_issues):
+        # The same as flake8 would report it
+        print(f"{_relative_path(path)}:{line_number}:{start_of_match + 1}: {todo_word} {jira_issue}")
+    todo_index.close()
+    return 0
+
+
+def _relative_path(path):
+    try:
+        return os.path.relpath(path)
+    except ValueError:
+        # On a different drive
+        return path
+
+
+def _comma_separated_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _daemon(args, flake8_args):
+    # The daemon never runs any workers itself, and anything which only lives as long as one flake8 run, like the issues
+    # shared between workers, would otherwise keep stale statuses for as long as the daemon does.
+    app = _initialise_flake8([*flake8_args, "--jobs=1"])
+    if not app.options.jira_daemon_socket:
+        raise ValueError("jira-daemon-socket must be set to run the daemon")
+    if not app.options.jira_server or app.options.jira_snapshot:
+        raise ValueError("jira-server must be set, and jira-snapshot must not be, to run the daemon")
+
+    # Exit cleanly when stopped, so that the socket is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        serve(
+            app.options.jira_daemon_socket,
+            _daemon_jira_client(app.options),
+            app.options.jira_server,
+            app.options.jira_cache_ttl,
+            webhook_address_from_options(app.options),
+            app.options.jira_webhook_secret,
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _daemon_jira_client(options):
+    # Built afresh rather than using Checker.jira_client, whose JiraGuard is only meant to last one run: it would give
+    # up on JIRA for good after a few failures in a row, or once the time budget was spent.  Each request to JIRA is
+    # still limited by jira-timeout, or jira-time-budget if that's all that's set.
+    #
+    # Nothing is preloaded, as the daemon only finds out how old each status is when it's first looked up, so preloaded
+    # statuses could outlive jira-cache-ttl.  The cache was already synced while parsing options.
+    jira_client = jira_client_from_options(options, Checker.stats)
+    return IssueRegistry(issue_cache_from_options(options, jira_client, Checker.stats, sync=False), Checker.stats)
+
+
+def _report(file_checker, error):
+    line_number, column, text, _ = error
+    file_checker.report(None, line_number, column, text)
@@ -0,0 +1,151 @@
+import json
+import logging
+import socket
+
+from flake8_jira_todo_checker.jira_client import IssueStatus, jira_timeout_from_options
+from flake8_jira_todo_checker.jira_guard import JiraUnavailable
+from flake8_jira_todo_checker.stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+# Bump this whenever the requests or responses change, so that an old daemon is never misunderstood
+PROTOCOL_VERSION = 1
+_CONNECT_TIMEOUT_SECONDS = 1
+_MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+_DEFAULT_WEBHOOK_HOST = "127.0.0.1"
+
+
+class DaemonError(Exception):
+    pass
+
+
+# Looks up issues through a daemon started with `python -m flake8_jira_todo_checker daemon`, which keeps an
+# authenticated JIRA client and every issue it has looked up in memory between flake8 runs.  Each lookup is a single
+# request over a Unix socket, so that short runs, e.g. from an editor or a pre-commit hook, never need to talk to JIRA
+# themselves.  If the daemon stops answering part way through a run, the rest of the run looks issues up with the client
+# returned by fallback instead, or skips the JIRA checks if there isn't one.  Not answering within timeout counts as
+# stopping.
+class DaemonClient:
+    def __init__(self, socket_path, jira_server, stats=None, fallback=None, timeout=None):
+        self._socket_path = str(socket_path)
+        self._jira_server = jira_server
+        self._stats = stats or RunStats()
+        self._timeout = timeout
+        self._fallback = fallback
+        self._fallback_client = None
+
+    def get_issues(self, issue_ids):
+        if self._fallback_client is None:
+            try:
+                return self._get_issues_from_daemon(issue_ids)
+            except (OSError, DaemonError) as e:
+                self._stats.count(daemon_failures=1)
+                if not self._fallback:
+                    logger.warning("Unable to check some TODOs against JIRA, as the daemon failed: %s", e)
+                    raise JiraUnavailable(f"the daemon failed: {e}") from e
+                logger.warning("The daemon failed, so looking up issues with JIRA directly instead: %s", e)
+                self._fallback_client = self._fallback()
+        return self._fallback_client.get_issues(issue_ids)
+
+    def _get_issues_from_daemon(self, issue_ids):
+        issue_ids = sorted(issue_ids)
+        response = self._request({"issue_ids": issue_ids})
+        self._stats.count(daemon_lookups=1, daemon_keys_looked_up=len(issue_ids))
+        return {issue_id: IssueStatus(*issue) for issue_id, issue in response["issues"].items()}
+
+    def ping(self):
+        self._request({"issue_ids": []})
+
+    def _request(self, request):
+        # A new connection for every request, which is cheap for a Unix socket, and means we never share one between
+        # flake8's workers.
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(_CONNECT_TIMEOUT_SECONDS)
+            connection.connect(self._socket_path)
+            # Looking up issues the daemon hasn't seen before takes as long as JIRA does, so wait as long as we would
+            # for JIRA
+            connection.settimeout(self._timeout)
+            send_message(connection, {"version": PROTOCOL_VERSION, "jira_server": self._jira_server, **request})
+            response = receive_message(connection)
+        if "error" in response:
+            raise DaemonError(response["error"])
+        return response
+
+
+def send_message(connection, message):
+    # One JSON document per connection in each direction, ended by a newline
+    connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def receive_message(connection):
+    chunks = []
+    received = 0
+    while True:
+        chunk = connection.recv(65536)
+        if not chunk:
+            raise DaemonError("Connection closed before a complete message was received")
+        chunks.append(chunk)
+        received += len(chunk)
+        if chunk.endswith(b"\n"):
+            return json.loads(b"".join(chunks).decode("utf-8"))
+        if received > _MAX_MESSAGE_BYTES:
+            raise DaemonError("Message too large")
+
+
+def add_daemon_options(parser):
+    parser.add_option(
+        "--jira-daemon-socket",
+        action="store",
+        parse_from_config=True,
+        help="Look up JIRA issues through the daemon listening on this Unix socket, started with "
+        "`python -m flake8_jira_todo_checker daemon`, when it's running.  Otherwise JIRA is queried as usual.",
+        default=None,
+    )
+    parser.add_option(
+        "--jira-webhook-port",
+        action="store",
+        type=int,
+        parse_from_config=True,
+        help="Have the daemon listen on this port for JIRA's issue created, updated and deleted webhooks, and trust "
+        "the issues it remembers until it's told they've changed, rather than for jira-cache-ttl.  Unset by default.",
+        default=None,
+    )
+    parser.add_option(
+        "--jira-webhook-host",
+        action="store",
+        parse_from_config=True,
+        help=f"The address to listen on for JIRA's webhooks.  Defaults to {_DEFAULT_WEBHOOK_HOST}.",
+        default=_DEFAULT_WEBHOOK_HOST,
+    )
+    parser.add_option(
+        "--jira-webhook-secret",
+        action="store",
+        parse_from_config=True,
+        help="The secret JIRA's webhooks must prove they know, either as the token in the URL, e.g. "
+        "http://host:port/?token=secret, or by signing their payload with it.  Required with jira-webhook-port.",
+        default=None,
+    )
+
+
+def daemon_client_from_options(options, stats=None, fallback=None):
+    if not options.jira_daemon_socket or not options.jira_server:
+        return None
+
+    daemon_client = DaemonClient(
+        options.jira_daemon_socket, options.jira_server, stats, fallback, jira_timeout_from_options(options)
+    )
+    try:
+        daemon_client.ping()
+    except (OSError, DaemonError) as e:
+        logger.debug("Not using the daemon on %s: %s", options.jira_daemon_socket, e)
+        return None
+    logger.debug("Using the daemon on %s", options.jira_daemon_socket)
+    return daemon_client
+
+
+def webhook_address_from_options(options):
+    if options.jira_webhook_port is None:
+        return None
+    if not options.jira_webhook_secret:
+        raise ValueError("jira-webhook-secret must be set to listen for JIRA webhooks")
+    return options.jira_webhook_host, options.jira_webhook_port
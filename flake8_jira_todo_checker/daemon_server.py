@@ -0,0 +1,141 @@
+import logging
+import os
+import socketserver
+import threading
+import time
+
+from flake8_jira_todo_checker.daemon import PROTOCOL_VERSION, DaemonClient, DaemonError, receive_message, send_message
+from flake8_jira_todo_checker.webhook import WebhookServer
+
+logger = logging.getLogger(__name__)
+
+# The daemon's side of daemon.py, which is only imported by `python -m flake8_jira_todo_checker daemon`, so that flake8
+# never imports socketserver or http.server when it loads the plugin.
+
+
+# Answers DaemonClient's lookups from jira_client, an IssueRegistry.  Each request is handled in its own thread, so that
+# the many which can be answered from memory never wait for one which needs JIRA.  Only one request fetches from JIRA
+# at a time though, so that two flake8 runs asking about the same new issue at once only fetch it once.
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # The longest we wait for a client to send its request or read our response, so that one which has hung can't hold
+    # up everyone else's
+    request_timeout = 10
+
+    def __init__(self, socket_path, jira_client, jira_server, ttl, clock=None):
+        self.jira_client = jira_client
+        self.jira_server = jira_server
+        # None when we're told about every change to an issue, e.g. by JIRA's webhooks, so never need to forget it
+        self._ttl = ttl
+        self._clock = clock or time.monotonic
+        # When each issue was first looked up since it was last forgotten.  Anything older than the TTL is forgotten
+        # before the next lookup, so that a daemon left running doesn't report stale statuses forever.
+        self._looked_up_at = {}
+        # Held while using or changing what we remember, but not while fetching from JIRA
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        # Every update received while fetching from JIRA, which is applied again afterwards so that it can't be
+        # overwritten by an older status fetched at the same time.  None when we're not fetching.
+        self._updates_while_fetching = None
+        super().__init__(str(socket_path), _DaemonRequestHandler)
+
+    def get_issues(self, issue_ids):
+        with self._lock:
+            if self._ttl is not None:
+                self._forget_expired(issue_ids)
+            if self.jira_client.knows_all(issue_ids):
+                return self.jira_client.get_issues(issue_ids)
+
+        with self._fetch_lock:
+            with self._lock:
+                self._updates_while_fetching = []
+            try:
+                issues = self.jira_client.get_issues(issue_ids)
+            finally:
+                with self._lock:
+                    for update in self._updates_while_fetching:
+                        self._apply_update(*update)
+                    updated = bool(self._updates_while_fetching)
+                    self._updates_while_fetching = None
+                    if updated and self.jira_client.knows_all(issue_ids):
+                        issues = self.jira_client.get_issues(issue_ids)
+            return issues
+
+    def update_issues(self, issues, old_issue_ids=()):
+        # Issues which have been deleted are given as None.  The old keys of issues which have moved to another project
+        # are forgotten, so that they're looked up again next time they're needed.
+        with self._lock:
+            self._apply_update(issues, old_issue_ids)
+            if self._updates_while_fetching is not None:
+                self._updates_while_fetching.append((issues, old_issue_ids))
+            now = self._clock()
+            for issue_id in issues:
+                self._looked_up_at[issue_id] = now
+            for issue_id in old_issue_ids:
+                self._looked_up_at.pop(issue_id, None)
+
+    def _apply_update(self, issues, old_issue_ids):
+        # Called with the lock held
+        self.jira_client.update(issues)
+        if old_issue_ids:
+            self.jira_client.forget(old_issue_ids)
+
+    def _forget_expired(self, issue_ids):
+        now = self._clock()
+        expired = [issue_id for issue_id, looked_up_at in self._looked_up_at.items() if now - looked_up_at >= self._ttl]
+        if expired:
+            logger.debug("Forgetting %s issues looked up more than %ss ago", len(expired), self._ttl)
+            self.jira_client.forget(expired)
+            for issue_id in expired:
+                del self._looked_up_at[issue_id]
+        for issue_id in issue_ids:
+            self._looked_up_at.setdefault(issue_id, now)
+
+
+class _DaemonRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.request.settimeout(self.server.request_timeout)
+        try:
+            request = receive_message(self.request)
+            if request.get("version") != PROTOCOL_VERSION:
+                raise DaemonError(f"Unsupported protocol version {request.get('version')}, expected {PROTOCOL_VERSION}")
+            if request.get("jira_server") != self.server.jira_server:
+                raise DaemonError(
+                    f"The daemon is using JIRA server {self.server.jira_server}, not {request.get('jira_server')}"
+                )
+            issues = self.server.get_issues(set(request["issue_ids"]))
+            response = {"issues": {issue_id: list(issue) for issue_id, issue in issues.items()}}
+        except Exception as e:
+            logger.exception("Unable to handle request")
+            response = {"error": f"{type(e).__name__}: {e}"}
+        try:
+            send_message(self.request, response)
+        except OSError as e:
+            logger.warning("Unable to respond to request: %s", e)
+
+
+def serve(socket_path, jira_client, jira_server, ttl, webhook_address=None, webhook_secret=None):
+    socket_path = str(socket_path)
+    if os.path.exists(socket_path):
+        try:
+            DaemonClient(socket_path, jira_server).ping()
+        except (OSError, DaemonError):
+            # Left behind by a daemon which didn't shut down cleanly
+            os.unlink(socket_path)
+        else:
+            raise ValueError(f"A daemon is already listening on {socket_path}")
+
+    server = DaemonServer(socket_path, jira_client, jira_server, None if webhook_address else ttl)
+    webhook_server = None
+    try:
+        if webhook_address:
+            webhook_server = WebhookServer(webhook_address, webhook_secret, server.update_issues)
+            webhook_server.start()
+        logger.info("Listening on %s", socket_path)
+        server.serve_forever()
+    finally:
+        if webhook_server:
+            webhook_server.shutdown()
+            webhook_server.server_close()
+        server.server_close()
+        os.unlink(socket_path)
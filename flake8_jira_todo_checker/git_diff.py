@@ -0,0 +1,117 @@
+import logging
+import pathlib
+import re
+import subprocess
+import sys
+
+logger = logging.getLogger(__name__)
+
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# Every line of a file which is new since the diff base, however long it is
+ALL_LINES = range(1, sys.maxsize)
+# The escapes git uses in quoted paths, besides octal bytes
+_QUOTED_PATH_ESCAPES = {"a": b"\a", "b": b"\b", "t": b"\t", "n": b"\n", "v": b"\v", "f": b"\f", "r": b"\r"}
+
+
+def changed_lines(diff_base, cwd=None):
+    # Returns a map of the resolved path of every file changed since diff_base to the line numbers which were added or
+    # changed in it.  Changes are counted from where HEAD branched off diff_base, so that anything which has only
+    # changed on diff_base since then isn't included, and every untracked file which isn't ignored is new in full.
+    top_level = pathlib.Path(_git(["rev-parse", "--show-toplevel"], cwd).strip())
+    merge_base = _git(["merge-base", diff_base, "HEAD"], cwd).strip()
+    diff = _git(
+        [
+            # Keep non-ASCII paths readable, and don't let any user config change the format of the diff
+            "-c",
+            "core.quotePath=false",
+            "diff",
+            "--unified=0",
+            "--no-color",
+            "--no-ext-diff",
+            "--src-prefix=a/",
+            "--dst-prefix=b/",
+            merge_base,
+            "--",
+        ],
+        cwd,
+    )
+
+    lines_by_path = {}
+    current_lines = None
+    # How many lines of the current hunk are still to come, so that added or removed lines which look like headers
+    # aren't mistaken for them
+    old_lines_left = new_lines_left = 0
+    for diff_line in diff.split("\n"):
+        if old_lines_left or new_lines_left:
+            if diff_line.startswith("-"):
+                old_lines_left -= 1
+            elif diff_line.startswith("+"):
+                new_lines_left -= 1
+            # Otherwise "\ No newline at end of file", which isn't counted
+        elif diff_line.startswith("+++ "):
+            target = _diff_path(diff_line[len("+++ ") :])
+            if target == "/dev/null":
+                # The file was deleted
+                current_lines = None
+            else:
+                current_lines = lines_by_path.setdefault(str((top_level / target[len("b/") :]).resolve()), set())
+        elif diff_line.startswith("@@ "):
+            match = _HUNK_HEADER.match(diff_line)
+            old_lines_left = int(match.group(1)) if match.group(1) is not None else 1
+            start = int(match.group(2))
+            new_lines_left = int(match.group(3)) if match.group(3) is not None else 1
+            if current_lines is not None:
+                current_lines.update(range(start, start + new_lines_left))
+
+    changed = {path: frozenset(lines) for path, lines in lines_by_path.items()}
+    untracked = _git(["ls-files", "-z", "--others", "--exclude-standard"], top_level)
+    for path in untracked.split("\0"):
+        if path:
+            changed[str((top_level / path).resolve())] = ALL_LINES
+
+    logger.debug("%s files changed since %s (%s)", len(changed), diff_base, merge_base)
+    return changed
+
+
+def _diff_path(path):
+    # Git quotes paths with unusual characters in them, like C strings, and ends ones with spaces in them with a tab
+    if not path.startswith('"'):
+        return path.rstrip("\t")
+    unquoted = bytearray()
+    characters = iter(path[1 : path.rindex('"')])
+    for character in characters:
+        if character != "\\":
+            unquoted += character.encode("utf-8")
+            continue
+        character = next(characters)
+        if character in "01234567":
+            unquoted.append(int(character + next(characters) + next(characters), 8))
+        else:
+            unquoted += _QUOTED_PATH_ESCAPES.get(character, character.encode("utf-8"))
+    return unquoted.decode("utf-8")
+
+
+def _git(args, cwd):
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=cwd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding="utf-8"
+        ).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise ValueError(f"Unable to run git {' '.join(args)}: {getattr(e, 'stderr', None) or e}") from e
+
+
+def add_git_diff_options(parser):
+    parser.add_option(
+        "--jira-todo-diff-base",
+        action="store",
+        parse_from_config=True,
+        help="Only check TODOs on lines which have been added or changed since this git ref, e.g. origin/main.  Files "
+        "which haven't changed aren't scanned at all.  Unset by default.",
+        default=None,
+    )
+
+
+def changed_lines_from_options(options):
+    if not options.jira_todo_diff_base:
+        return None
+    return changed_lines(options.jira_todo_diff_base)
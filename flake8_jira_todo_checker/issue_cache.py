@@ -0,0 +1,229 @@
+import contextlib
+import logging
+import math
+import pathlib
+import time
+
+from flake8_jira_todo_checker.jira_guard import JiraUnavailable
+from flake8_jira_todo_checker.sqlite_connection import chunks, connect, placeholders, transaction
+from flake8_jira_todo_checker.stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+_CACHE_FILE_NAME = "issues.sqlite"
+_DEFAULT_TTL_SECONDS = 60 * 60
+_DEFAULT_MAX_ENTRIES = 100_000
+# How far before the last sync to look for updated issues, to allow for our clock and JIRA's disagreeing, and for JIRA
+# taking a while to index updates
+_SYNC_OVERLAP_SECONDS = 5 * 60
+
+
+class IssueCache:
+    def __init__(
+        self, jira_client, cache_dir, ttl=_DEFAULT_TTL_SECONDS, max_entries=_DEFAULT_MAX_ENTRIES, clock=None, stats=None
+    ):
+        self._jira_client = jira_client
+        self._stats = stats or RunStats()
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._clock = clock or time.time
+
+        cache_dir = pathlib.Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self._path = cache_dir / _CACHE_FILE_NAME
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS issues (
+                    key TEXT PRIMARY KEY,
+                    found INTEGER NOT NULL,
+                    status TEXT,
+                    resolution TEXT,
+                    fetched_at REAL NOT NULL
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS issues_fetched_at ON issues (fetched_at)")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS project_syncs (
+                    project TEXT PRIMARY KEY,
+                    synced_at REAL NOT NULL
+                )
+                """
+            )
+
+    def get_issues(self, issue_ids):
+        issue_ids = set(issue_ids)
+        now = self._clock()
+        cached = self._read(issue_ids, now)
+        stale_or_missing = issue_ids - cached.keys()
+        logger.debug("Issue cache: %s fresh, %s stale or missing", len(cached), len(stale_or_missing))
+        self._stats.count(issue_cache_hits=len(cached), issue_cache_misses=len(stale_or_missing))
+
+        if stale_or_missing:
+            fetched = self._jira_client.get_issues(stale_or_missing)
+            self._write(stale_or_missing, fetched, now)
+            for issue_id in stale_or_missing:
+                cached[issue_id] = fetched.get(issue_id)
+
+        # Issues which don't exist are cached as None so that we don't keep asking JIRA about them, but callers expect
+        # them to be absent.
+        return {issue_id: issue for issue_id, issue in cached.items() if issue is not None}
+
+    def sync(self, project_ids):
+        # Brings every cached issue in these projects up to date, by fetching only the issues which have been updated
+        # since the last sync, or every issue in the project the first time.  Anything else in the cache was already
+        # up to date at the last sync and can't have changed since, so it's trusted for another TTL.
+        #
+        # Issues which are deleted, or moved to another project, are never updated, so stay cached as they were.
+        for project_id in project_ids:
+            # Issue keys are always upper case, whatever case the project was configured in
+            project_id = project_id.upper()
+            now = self._clock()
+            with self._connect() as connection:
+                row = connection.execute(
+                    "SELECT synced_at FROM project_syncs WHERE project = ?", (project_id,)
+                ).fetchone()
+            jql = f"project in ({project_id})"
+            if row:
+                # Relative to JIRA's clock, so that we don't need to know which timezone it uses
+                minutes = math.ceil((now - row[0] + _SYNC_OVERLAP_SECONDS) / 60)
+                jql += f" AND updated >= -{minutes}m"
+            updated = self._jira_client.search_issues(jql)
+            logger.debug("Synced %s updated issues in %s", len(updated), project_id)
+            self._stats.count(issues_synced=len(updated))
+
+            with self._connect() as connection:
+                with transaction(connection):
+                    # Every key in the project starts with "<project_id>-", and "." sorts straight after "-"
+                    connection.execute(
+                        "UPDATE issues SET fetched_at = ? WHERE key >= ? AND key < ?",
+                        (now, f"{project_id}-", f"{project_id}."),
+                    )
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO issues (key, found, status, resolution, fetched_at) "
+                        "VALUES (?, 1, ?, ?, ?)",
+                        [(issue_id, status, resolution, now) for issue_id, (status, resolution) in updated.items()],
+                    )
+                    connection.execute(
+                        "INSERT OR REPLACE INTO project_syncs (project, synced_at) VALUES (?, ?)", (project_id, now)
+                    )
+                    self._evict(connection, now)
+
+    def update(self, issues):
+        # Issues which have been deleted are given as None
+        self._write(issues.keys(), {issue_id: issue for issue_id, issue in issues.items() if issue}, self._clock())
+
+    def forget(self, issue_ids):
+        with self._connect() as connection:
+            with transaction(connection):
+                for chunk in chunks(issue_ids):
+                    connection.execute(f"DELETE FROM issues WHERE key IN ({placeholders(chunk)})", chunk)
+
+    def _connect(self):
+        # sqlite3's own context manager only handles transactions, so make sure the connection gets closed too.
+        return contextlib.closing(connect(self._path))
+
+    def _read(self, issue_ids, now):
+        result = {}
+        with self._connect() as connection:
+            for chunk in chunks(issue_ids):
+                rows = connection.execute(
+                    f"SELECT key, found, status, resolution FROM issues "
+                    f"WHERE fetched_at >= ? AND key IN ({placeholders(chunk)})",
+                    [now - self._ttl, *chunk],
+                )
+                for key, found, status, resolution in rows:
+                    result[key] = (status, resolution) if found else None
+        return result
+
+    def _write(self, issue_ids, fetched, now):
+        rows = []
+        for issue_id in issue_ids:
+            try:
+                status, resolution = fetched[issue_id]
+            except KeyError:
+                rows.append((issue_id, False, None, None, now))
+            else:
+                rows.append((issue_id, True, status, resolution, now))
+
+        with self._connect() as connection:
+            with transaction(connection):
+                connection.executemany(
+                    "INSERT OR REPLACE INTO issues (key, found, status, resolution, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._evict(connection, now)
+
+    def _evict(self, connection, now):
+        connection.execute("DELETE FROM issues WHERE fetched_at < ?", (now - self._ttl,))
+        connection.execute(
+            "DELETE FROM issues WHERE key IN (SELECT key FROM issues ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)",
+            (self._max_entries,),
+        )
+
+
+def add_issue_cache_options(parser):
+    parser.add_option(
+        "--jira-cache-dir",
+        action="store",
+        parse_from_config=True,
+        help="Directory in which to cache the status of JIRA issues, and the TODOs found in each file, between runs.  "
+        "If unset, no cache is used.",
+        default=None,
+    )
+    parser.add_option(
+        "--jira-cache-ttl",
+        action="store",
+        type=int,
+        parse_from_config=True,
+        help=f"How long in seconds to trust a cached JIRA issue status.  Defaults to {_DEFAULT_TTL_SECONDS}.",
+        default=_DEFAULT_TTL_SECONDS,
+    )
+    parser.add_option(
+        "--jira-cache-max-entries",
+        action="store",
+        type=int,
+        parse_from_config=True,
+        help=f"Maximum number of JIRA issues to keep in the cache.  Defaults to {_DEFAULT_MAX_ENTRIES}.",
+        default=_DEFAULT_MAX_ENTRIES,
+    )
+    parser.add_option(
+        "--jira-cache-sync",
+        action="store_true",
+        parse_from_config=True,
+        help="Before checking any files, fetch every issue in jira-project-ids which has been updated since the last "
+        "run, and trust everything else in the cache for another jira-cache-ttl, rather than looking it up again.",
+        default=False,
+    )
+
+
+def issue_cache_from_options(options, jira_client, stats=None, sync=True):
+    # sync is only for the first cache built in a run, as every later one shares its database
+    if not jira_client or not options.jira_cache_dir:
+        logger.debug("Not using JIRA issue cache")
+        return jira_client
+
+    if options.jira_cache_ttl < 0:
+        raise ValueError("jira-cache-ttl must not be negative")
+    if options.jira_cache_max_entries < 1:
+        raise ValueError("jira-cache-max-entries must be at least 1")
+
+    issue_cache = IssueCache(
+        jira_client,
+        options.jira_cache_dir,
+        ttl=options.jira_cache_ttl,
+        max_entries=options.jira_cache_max_entries,
+        stats=stats,
+    )
+
+    if options.jira_cache_sync and sync:
+        if not options.jira_project_ids:
+            raise ValueError("jira-project-ids must be set to sync the JIRA issue cache")
+        # Done here while parsing options, so that flake8's workers all see the result
+        try:
+            issue_cache.sync(options.jira_project_ids)
+        except JiraUnavailable:
+            pass
+    return issue_cache
@@ -0,0 +1,74 @@
+import logging
+
+from flake8_jira_todo_checker.jira_guard import JiraUnavailable
+from flake8_jira_todo_checker.stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+
+# Holds the status of every open issue in the configured projects, fetched with a handful of paginated searches before
+# any files are checked, so that TODOs referencing open issues (usually nearly all of them) never need a query of
+# their own.  Anything else is either closed or doesn't exist, and is looked up as usual to tell which.
+class IssuePreload:
+    def __init__(self, open_issues, jira_client, stats=None):
+        self._open_issues = open_issues
+        self._jira_client = jira_client
+        self._stats = stats or RunStats()
+
+    def get_issues(self, issue_ids):
+        issues = {issue_id: self._open_issues[issue_id] for issue_id in issue_ids if issue_id in self._open_issues}
+        not_open = set(issue_ids) - issues.keys()
+        logger.debug("Issue preload: %s open, %s to look up", len(issues), len(not_open))
+        self._stats.count(issue_preload_hits=len(issues), issue_preload_misses=len(not_open))
+
+        if not_open:
+            issues.update(self._jira_client.get_issues(not_open))
+        return issues
+
+    def forget(self, issue_ids):
+        for issue_id in issue_ids:
+            self._open_issues.pop(issue_id, None)
+        forget = getattr(self._jira_client, "forget", None)
+        if forget:
+            forget(issue_ids)
+
+    def update(self, issues):
+        # We can't tell which of them are still open, so leave that to whatever looks up everything else
+        for issue_id in issues:
+            self._open_issues.pop(issue_id, None)
+        update = getattr(self._jira_client, "update", None)
+        if update:
+            update(issues)
+
+
+def add_issue_preload_options(parser):
+    parser.add_option(
+        "--jira-preload-open-issues",
+        action="store_true",
+        parse_from_config=True,
+        help="Before checking any files, fetch the status of every issue in jira-project-ids which isn't done, so "
+        "that only TODOs referencing other issues need to be looked up individually.",
+        default=False,
+    )
+
+
+def issue_preload_from_options(options, jira_client, fallback_jira_client, stats=None):
+    # jira_client is used to search for the open issues, and fallback_jira_client, which may cache jira_client, to look
+    # up everything else.
+    if not jira_client or not options.jira_preload_open_issues:
+        return fallback_jira_client
+
+    if not options.jira_project_ids:
+        raise ValueError("jira-project-ids must be set to preload open issues")
+
+    # Done here while parsing options, so that flake8's workers share the result rather than each fetching it again
+    try:
+        open_issues = jira_client.search_issues(
+            f"project in ({','.join(options.jira_project_ids)}) AND statusCategory != Done"
+        )
+    except JiraUnavailable:
+        return fallback_jira_client
+    logger.debug("Preloaded %s open issues", len(open_issues))
+    if stats:
+        stats.count(issues_preloaded=len(open_issues))
+    return IssuePreload(open_issues, fallback_jira_client, stats)
@@ -0,0 +1,58 @@
+import logging
+
+from flake8_jira_todo_checker.stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+
+# Remembers every issue looked up during a flake8 run, so that each distinct issue is only fetched once even though
+# flake8 creates a new Checker for every file.
+class IssueRegistry:
+    def __init__(self, jira_client, stats=None):
+        self._jira_client = jira_client
+        self._stats = stats or RunStats()
+        # Issues which don't exist are stored as None
+        self._issues = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_issues(self, issue_ids):
+        issue_ids = set(issue_ids)
+        unknown_issue_ids = issue_ids - self._issues.keys()
+        self.hits += len(issue_ids) - len(unknown_issue_ids)
+        self.misses += len(unknown_issue_ids)
+        self._stats.count(
+            issue_registry_hits=len(issue_ids) - len(unknown_issue_ids), issue_registry_misses=len(unknown_issue_ids)
+        )
+        logger.debug("Issue registry: %s hits, %s misses so far", self.hits, self.misses)
+
+        issues = {issue_id: self._issues[issue_id] for issue_id in issue_ids - unknown_issue_ids}
+        if unknown_issue_ids:
+            fetched = self._jira_client.get_issues(unknown_issue_ids)
+            for issue_id in unknown_issue_ids:
+                issues[issue_id] = self._issues[issue_id] = fetched.get(issue_id)
+
+        return {issue_id: issue for issue_id, issue in issues.items() if issue is not None}
+
+    def knows_all(self, issue_ids):
+        return all(issue_id in self._issues for issue_id in issue_ids)
+
+    def forget(self, issue_ids):
+        # So that they're fetched from JIRA next time they're needed, not from anything else which remembers them
+        for issue_id in issue_ids:
+            self._issues.pop(issue_id, None)
+        forget = getattr(self._jira_client, "forget", None)
+        if forget:
+            forget(issue_ids)
+
+    def update(self, issues):
+        # Issues which have been deleted are given as None.  Anything else which remembers issues is updated too, or
+        # told to forget them if it can't be.
+        self._issues.update(issues)
+        update = getattr(self._jira_client, "update", None)
+        if update:
+            update(issues)
+            return
+        forget = getattr(self._jira_client, "forget", None)
+        if forget:
+            forget(issues.keys())
@@ -0,0 +1,229 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import ssl
+import time
+import urllib.parse
+
+from flake8_jira_todo_checker.jira_client import (
+    MAX_ISSUES_PER_JIRA_QUERY,
+    SEARCH_FIELDS,
+    call_before_fork,
+    issue_batch_jql,
+    issue_batches,
+    issue_statuses_from_search_result,
+    rate_limited_delay,
+    remaining_page_starts,
+)
+from flake8_jira_todo_checker.stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+
+class JiraHttpError(Exception):
+    def __init__(self, status_code, body):
+        super().__init__(f"JIRA responded with HTTP {status_code}: {body[:200]!r}")
+        self.status_code = status_code
+        self.body = body
+
+
+class _Response:
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+
+class _ConnectionPool:
+    # A minimal HTTP/1.1 keep-alive connection pool.  We only ever talk to one JIRA server, and only need to POST JSON,
+    # so this avoids depending on a full HTTP client library.
+
+    def __init__(self, host, port, ssl_context, max_connections):
+        self._host = host
+        self._port = port
+        self._ssl_context = ssl_context
+        self._idle_connections = []
+        self._semaphore = asyncio.Semaphore(max_connections)
+
+    async def request(self, method, target, headers, body):
+        async with self._semaphore:
+            reused = bool(self._idle_connections)
+            reader, writer = self._idle_connections.pop() if reused else await self._connect()
+            try:
+                response, keep_alive = await self._send(reader, writer, method, target, headers, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if not reused:
+                    raise
+                # The server may have closed an idle connection, so try once more on a fresh one
+                logger.debug("Idle connection was closed, reconnecting")
+                reader, writer = await self._connect()
+                response, keep_alive = await self._send(reader, writer, method, target, headers, body)
+            except BaseException:
+                writer.close()
+                raise
+
+            if keep_alive:
+                self._idle_connections.append((reader, writer))
+            else:
+                writer.close()
+            return response
+
+    def close(self):
+        while self._idle_connections:
+            _, writer = self._idle_connections.pop()
+            writer.close()
+
+    async def _connect(self):
+        return await asyncio.open_connection(
+            self._host, self._port, ssl=self._ssl_context, server_hostname=self._host if self._ssl_context else None
+        )
+
+    async def _send(self, reader, writer, method, target, headers, body):
+        request_lines = [f"{method} {target} HTTP/1.1", f"Host: {self._host}:{self._port}", "Connection: keep-alive"]
+        request_lines.extend(f"{name}: {value}" for name, value in headers.items())
+        request_lines.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(request_lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+        status_line = await reader.readuntil(b"\r\n")
+        _, status_code, *_ = status_line.decode("latin-1").split(" ", 2)
+        response_headers = {}
+        while True:
+            header_line = await reader.readuntil(b"\r\n")
+            if header_line == b"\r\n":
+                break
+            name, _, value = header_line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            response_body = await _read_chunked(reader)
+        else:
+            response_body = await reader.readexactly(int(response_headers.get("content-length", 0)))
+
+        keep_alive = response_headers.get("connection", "").lower() != "close"
+        return _Response(int(status_code), response_headers, response_body), keep_alive
+
+
+async def _read_chunked(reader):
+    chunks = []
+    while True:
+        size_line = await reader.readuntil(b"\r\n")
+        chunk_size = int(size_line.split(b";", 1)[0], 16)
+        if chunk_size == 0:
+            # Skip any trailers
+            while await reader.readuntil(b"\r\n") != b"\r\n":
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(chunk_size))
+        await reader.readexactly(2)
+
+
+class AsyncJiraClient:
+    # Talks to JIRA's REST API directly with asyncio, running every batch of a lookup at once over a pool of keep-alive
+    # connections.  Exposes the same synchronous get_issues as JiraClient so Checker doesn't need to know about it.
+
+    def __init__(self, server, username, password, max_concurrency, timeout=None, stats=None):
+        url = urllib.parse.urlsplit(server)
+        if url.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported JIRA server URL: {server}")
+        self._host = url.hostname
+        self._port = url.port or (443 if url.scheme == "https" else 80)
+        self._ssl_context = ssl.create_default_context() if url.scheme == "https" else None
+        self._search_path = url.path.rstrip("/") + "/rest/api/2/search"
+        credentials = base64.b64encode(f"{username}:{password}".encode("utf-8")).decode("ascii")
+        self._headers = {
+            "Authorization": f"Basic {credentials}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+        self._max_concurrency = max_concurrency
+        self._timeout = timeout
+        self._stats = stats or RunStats()
+        self._loop = None
+        self._pool = None
+        self._loop_pid = None
+        call_before_fork(self, AsyncJiraClient._close_before_fork)
+
+    def get_issues(self, issue_ids):
+        if not issue_ids:
+            return {}
+        return self._run(self._get_issues(issue_ids))
+
+    def search_issues(self, jql):
+        return self._run(self._search_issues(jql))
+
+    def close(self):
+        if self._loop is not None and self._loop_pid == os.getpid():
+            if self._pool is not None:
+                self._pool.close()
+            self._loop.close()
+        self._loop = None
+        self._pool = None
+
+    def _close_before_fork(self):
+        # A forked process would share the event loop's selector and idle connections with its parent.  A loop which is
+        # still running, in a thread which gave up waiting on it, can't be closed, so see _run.
+        if self._loop is not None and not self._loop.is_running():
+            self.close()
+
+    def _run(self, coroutine):
+        if self._loop is None or self._loop_pid != os.getpid():
+            # The connection pool belongs to the event loop, so keep the same loop for as long as this client lives, or
+            # until it's closed before forking.  A loop inherited from our parent, because it was still running when
+            # we forked or because there's no os.register_at_fork, is left alone rather than closed from under it.
+            self._loop = asyncio.new_event_loop()
+            self._loop_pid = os.getpid()
+            self._pool = None
+        return self._loop.run_until_complete(coroutine)
+
+    def _get_pool(self):
+        if self._pool is None:
+            # Created inside the loop, as older versions of asyncio bind the semaphore to the current loop.
+            self._pool = _ConnectionPool(self._host, self._port, self._ssl_context, self._max_concurrency)
+        return self._pool
+
+    async def _get_issues(self, issue_ids):
+        issues = {}
+        for batch_issues in await asyncio.gather(*(self._get_issue_batch(batch) for batch in issue_batches(issue_ids))):
+            issues.update(batch_issues)
+        return issues
+
+    async def _search_issues(self, jql):
+        # Fetch the first page to find out how many issues there are, then all the remaining pages at once
+        first_page = await self._search(jql, start_at=0)
+        issues = issue_statuses_from_search_result(first_page)
+        for page in await asyncio.gather(
+            *(self._search(jql, start_at) for start_at in remaining_page_starts(first_page))
+        ):
+            issues.update(issue_statuses_from_search_result(page))
+        return issues
+
+    async def _get_issue_batch(self, issue_ids):
+        self._stats.count(jira_issue_batches=1, jira_keys_queried=len(issue_ids))
+        return issue_statuses_from_search_result(await self._search(issue_batch_jql(issue_ids), start_at=0))
+
+    async def _search(self, jql, start_at):
+        body = json.dumps(
+            {"jql": jql, "startAt": start_at, "maxResults": MAX_ISSUES_PER_JIRA_QUERY, "fields": SEARCH_FIELDS}
+        ).encode("utf-8")
+
+        attempt = 1
+        while True:
+            start = time.perf_counter()
+            response = await asyncio.wait_for(
+                self._get_pool().request("POST", self._search_path, self._headers, body), self._timeout
+            )
+            self._stats.record_jira_query(time.perf_counter() - start, len(response.body))
+            delay = rate_limited_delay(response.status_code, response.headers.get("retry-after"), attempt, self._stats)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if response.status_code != 200:
+            raise JiraHttpError(response.status_code, response.body)
+
+        return json.loads(response.body)
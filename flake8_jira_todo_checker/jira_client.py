@@ -1,36 +1,188 @@
+import collections
+import itertools
 import logging
+import os
 import pathlib
+import threading
+import time
+import weakref
 
-import jira
+from flake8_jira_todo_checker.stats import RunStats
+
+# jira (and everything it depends on) is only imported once we actually need to talk to JIRA, since flake8 imports
+# every plugin on every run.
 
 logger = logging.getLogger(__name__)
 MAX_ISSUES_PER_JIRA_QUERY = 100
+# We only ever look at these fields, and asking for them explicitly saves JIRA from sending every field of every issue
+SEARCH_FIELDS = ["status", "resolution"]
+_DEFAULT_MAX_CONCURRENCY = 4
+_MAX_ATTEMPTS_WHEN_RATE_LIMITED = 5
+_RATE_LIMITED_BASE_DELAY_SECONDS = 1
+
+IssueStatus = collections.namedtuple("IssueStatus", ["status", "resolution"])
 
 
 class JiraClient:
-    def __init__(self, jira_client):
+    def __init__(self, jira_client, max_concurrency=_DEFAULT_MAX_CONCURRENCY, stats=None):
         self._jira_client = jira_client
+        self._max_concurrency = max_concurrency
+        self._stats = stats or RunStats()
+        call_before_fork(self, JiraClient._close_idle_connections)
 
     def get_issues(self, issue_ids):
-        if len(issue_ids) > MAX_ISSUES_PER_JIRA_QUERY:
-            raise ValueError("Unable to query for more than 100 issues")
+        issues = {}
+        for batch_issues in self._map_concurrently(self._get_issue_batch, issue_batches(issue_ids)):
+            issues.update(batch_issues)
+        return issues
+
+    def search_issues(self, jql):
+        # Fetch the first page to find out how many issues there are, then all the remaining pages at once
+        first_page = self._search(jql, start_at=0)
+        issues = issue_statuses_from_search_result(first_page)
+        for page in self._map_concurrently(
+            lambda start_at: self._search(jql, start_at), remaining_page_starts(first_page)
+        ):
+            issues.update(issue_statuses_from_search_result(page))
+        return issues
+
+    def _map_concurrently(self, function, arguments):
+        arguments = list(arguments)
+        if len(arguments) <= 1 or self._max_concurrency <= 1:
+            return [function(argument) for argument in arguments]
+
+        # All the threads share the one HTTP session held by the jira client.  They're daemon threads, rather than a
+        # ThreadPoolExecutor's, which Python waits for before exiting, so that once JiraGuard gives up on a hanging
+        # JIRA the run can finish straight away.
+        remaining = iter(enumerate(arguments))
+        results = [None] * len(arguments)
+        errors = []
+        lock = threading.Lock()
+
+        def run():
+            while True:
+                with lock:
+                    if errors:
+                        return
+                    index, argument = next(remaining, (None, None))
+                if index is None:
+                    return
+                try:
+                    results[index] = function(argument)
+                except Exception as e:
+                    with lock:
+                        errors.append(e)
+
+        threads = [
+            threading.Thread(target=run, name="jira-client", daemon=True)
+            for _ in range(min(self._max_concurrency, len(arguments)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
 
-        def unpack_resolution_and_name(issue):
-            status = issue.fields.status.name
-            if issue.fields.resolution:
-                resolution = issue.fields.resolution.name
+    def _close_idle_connections(self):
+        # The jira client's HTTP session keeps connections open to reuse, which a forked process would share with its
+        # parent.  The session opens new ones as it needs them.
+        self._jira_client._session.close()
+
+    def _get_issue_batch(self, issue_ids):
+        self._stats.count(jira_issue_batches=1, jira_keys_queried=len(issue_ids))
+        return issue_statuses_from_search_result(self._search(issue_batch_jql(issue_ids), start_at=0))
+
+    def _search(self, jql, start_at):
+        import jira
+
+        for attempt in itertools.count(1):
+            start = time.perf_counter()
+            try:
+                search_result = self._jira_client.search_issues(
+                    jql,
+                    startAt=start_at,
+                    maxResults=MAX_ISSUES_PER_JIRA_QUERY,
+                    fields=SEARCH_FIELDS,
+                    # Skip building jira resource objects, we just need a couple of names out of the JSON
+                    json_result=True,
+                )
+            except jira.JIRAError as e:
+                self._stats.record_jira_query(time.perf_counter() - start)
+                retry_after = getattr(e.response, "headers", {}).get("Retry-After")
+                delay = rate_limited_delay(e.status_code, retry_after, attempt, self._stats)
+                if delay is None:
+                    raise
+                time.sleep(delay)
             else:
-                resolution = None
-            return status, resolution
-
-        return {
-            issue.key: unpack_resolution_and_name(issue)
-            # weirdly, this query will fail unless we pass the keys as lowercase
-            # https://community.atlassian.com/t5/Jira-questions/JQL-search-by-issueId-fails-if-issue-key-LIST-has-a-deleted/qaq-p/99570
-            for issue in self._jira_client.search_issues(
-                f'issuekey in ({",".join(issue.lower() for issue in issue_ids)})', maxResults=MAX_ISSUES_PER_JIRA_QUERY
-            )
-        }
+                self._stats.record_jira_query(time.perf_counter() - start)
+                return search_result
+
+
+def call_before_fork(instance, method):
+    # flake8 forks its workers after parsing options, by which time we may already have talked to JIRA, e.g. to preload
+    # open issues, so each client lets go of anything it mustn't share with another process beforehand.  Only holds a
+    # weak reference to instance, as there's no way to unregister.
+    if not hasattr(os, "register_at_fork"):
+        # Python 3.6
+        return
+    instance_ref = weakref.ref(instance)
+
+    def before_fork():
+        instance = instance_ref()
+        if instance is not None:
+            method(instance)
+
+    os.register_at_fork(before=before_fork)
+
+
+def issue_statuses_from_search_result(search_result):
+    issue_statuses = {}
+    for issue in search_result["issues"]:
+        fields = issue["fields"]
+        resolution = fields.get("resolution")
+        issue_statuses[issue["key"]] = IssueStatus(fields["status"]["name"], resolution["name"] if resolution else None)
+    return issue_statuses
+
+
+# Shared by both client backends, so that they batch, paginate and back off in exactly the same way
+
+
+def issue_batches(issue_ids):
+    issue_ids = sorted(issue_ids)
+    return [
+        issue_ids[batch_start : batch_start + MAX_ISSUES_PER_JIRA_QUERY]
+        for batch_start in range(0, len(issue_ids), MAX_ISSUES_PER_JIRA_QUERY)
+    ]
+
+
+def issue_batch_jql(issue_ids):
+    # weirdly, this query will fail unless we pass the keys as lowercase
+    # https://community.atlassian.com/t5/Jira-questions/JQL-search-by-issueId-fails-if-issue-key-LIST-has-a-deleted/qaq-p/99570
+    return f'issuekey in ({",".join(issue.lower() for issue in issue_ids)})'
+
+
+def remaining_page_starts(first_page):
+    # The startAt of every page of a search after the first
+    page_size = len(first_page["issues"])
+    if not page_size:
+        return range(0)
+    return range(page_size, first_page["total"], page_size)
+
+
+def rate_limited_delay(status_code, retry_after, attempt, stats):
+    # How long to wait before retrying a request which failed with this status, or None if it shouldn't be retried
+    if status_code != 429 or attempt >= _MAX_ATTEMPTS_WHEN_RATE_LIMITED:
+        return None
+    stats.count(jira_rate_limited=1)
+    # Prefer the server's suggestion if there is one, otherwise back off exponentially
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        delay = _RATE_LIMITED_BASE_DELAY_SECONDS * 2 ** (attempt - 1)
+    logger.debug("Rate limited by JIRA, retrying in %ss", delay)
+    return delay
 
 
 def add_jira_client_options(parser):
@@ -82,9 +234,45 @@ def add_jira_client_options(parser):
         "--jira-oauth-key-cert-file", action="store", parse_from_config=True, help="JIRA OAuth: Key Cert File"
     )
     parser.add_option("--jira-kerberos", action="store_true", parse_from_config=True, help="JIRA Kerberos Auth")
+    parser.add_option(
+        "--jira-max-concurrency",
+        action="store",
+        type=int,
+        parse_from_config=True,
+        help=f"Maximum number of JIRA queries to run at once.  Defaults to {_DEFAULT_MAX_CONCURRENCY}.",
+        default=_DEFAULT_MAX_CONCURRENCY,
+    )
+    parser.add_option(
+        "--jira-timeout",
+        action="store",
+        type=float,
+        parse_from_config=True,
+        help="How long in seconds to wait for JIRA to respond to each request.  Defaults to jira-time-budget if that's "
+        "set, and otherwise we wait for as long as it takes.",
+        default=None,
+    )
+    parser.add_option(
+        "--jira-client-backend",
+        action="store",
+        parse_from_config=True,
+        choices=["jira", "asyncio"],
+        help="How to talk to JIRA: 'jira' uses the jira library, 'asyncio' queries the REST API directly and only "
+        "supports HTTP Basic Auth.  Defaults to jira.",
+        default="jira",
+    )
+
+
+def jira_timeout_from_options(options):
+    if options.jira_timeout is not None and options.jira_timeout <= 0:
+        raise ValueError("jira-timeout must be positive")
+    if options.jira_timeout is None and options.jira_time_budget is not None and options.jira_time_budget > 0:
+        # No request can usefully take longer than the whole time budget, so don't leave one waiting on JIRA long after
+        # JiraGuard has given up on it
+        return options.jira_time_budget
+    return options.jira_timeout
 
 
-def jira_client_from_options(options):
+def jira_client_from_options(options, stats=None):
     kwargs = {}
 
     jira_server = options.jira_server
@@ -143,4 +331,30 @@ def jira_client_from_options(options):
     else:
         raise RuntimeError("Programmer error - unhandled case")
 
-    return JiraClient(jira.JIRA(**kwargs))
+    if options.jira_max_concurrency < 1:
+        raise ValueError("jira-max-concurrency must be at least 1")
+    timeout = jira_timeout_from_options(options)
+
+    if options.jira_client_backend == "asyncio":
+        if not is_basic_auth:
+            raise ValueError("The asyncio JIRA client backend only supports HTTP Basic Auth")
+        from flake8_jira_todo_checker.jira_async_client import AsyncJiraClient
+
+        return AsyncJiraClient(
+            jira_server,
+            jira_http_basic_username,
+            jira_http_basic_password,
+            max_concurrency=options.jira_max_concurrency,
+            timeout=timeout,
+            stats=stats,
+        )
+
+    import jira
+
+    jira_client = jira.JIRA(timeout=timeout, **kwargs)
+    if stats:
+        # We ask for json_result so never see the responses ourselves, but the session does
+        jira_client._session.hooks["response"].append(
+            lambda response, *args, **kwargs: stats.count(jira_bytes_received=len(response.content))
+        )
+    return JiraClient(jira_client, max_concurrency=options.jira_max_concurrency, stats=stats)
@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+
+from flake8_jira_todo_checker.stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+# Stop calling JIRA for the rest of the run after this many failures in a row
+_MAX_CONSECUTIVE_FAILURES = 3
+
+
+class JiraUnavailable(Exception):
+    pass
+
+
+# Stops a slow or broken JIRA server from holding up the run.  Every call to JIRA is given whatever is left of the time
+# budget, and once that's used up, or JIRA has failed too many times in a row, JiraUnavailable is raised straight away
+# instead.  Checker then skips the JIRA checks for the TODOs concerned, but still makes every check which doesn't need
+# JIRA.
+class JiraGuard:
+    def __init__(self, jira_client, time_budget=None, stats=None, clock=None):
+        self._jira_client = jira_client
+        self._time_budget = time_budget
+        self._stats = stats or RunStats()
+        self._clock = clock or time.monotonic
+        self._time_spent = 0
+        self._consecutive_failures = 0
+        self._unavailable_reason = None
+        self._warned = False
+        self._lock = threading.Lock()
+
+    def get_issues(self, issue_ids):
+        return self._call(self._jira_client.get_issues, issue_ids)
+
+    def search_issues(self, jql):
+        return self._call(self._jira_client.search_issues, jql)
+
+    def _call(self, function, argument):
+        with self._lock:
+            if self._unavailable_reason is None and self._time_budget is not None:
+                if self._time_spent >= self._time_budget:
+                    self._unavailable_reason = f"the JIRA time budget of {self._time_budget}s was used up"
+            if self._unavailable_reason is not None:
+                raise self._unavailable(self._unavailable_reason)
+            time_left = None if self._time_budget is None else self._time_budget - self._time_spent
+
+        # Wait in a daemon thread, so that we can give up on a hanging request without it keeping the process alive
+        outcome = {}
+
+        def call():
+            try:
+                outcome["result"] = function(argument)
+            except Exception as e:
+                outcome["error"] = e
+
+        start = self._clock()
+        thread = threading.Thread(target=call, name="jira-guard", daemon=True)
+        thread.start()
+        thread.join(time_left)
+
+        with self._lock:
+            self._time_spent += self._clock() - start
+            if "result" in outcome:
+                self._consecutive_failures = 0
+                return outcome["result"]
+
+            self._consecutive_failures += 1
+            self._stats.count(jira_failures=1)
+            if "error" in outcome:
+                reason = f"JIRA failed with {type(outcome['error']).__name__}: {outcome['error']}"
+            else:
+                reason = f"JIRA didn't respond within the time budget of {self._time_budget}s"
+                self._unavailable_reason = reason
+            if self._consecutive_failures >= _MAX_CONSECUTIVE_FAILURES:
+                self._unavailable_reason = f"JIRA failed {self._consecutive_failures} times in a row"
+            raise self._unavailable(reason)
+
+    def _unavailable(self, reason):
+        # Called with the lock held
+        self._stats.count(jira_unavailable=1)
+        if not self._warned:
+            self._warned = True
+            logger.warning("Unable to check some TODOs against JIRA, as %s", reason)
+        else:
+            logger.debug("Unable to check some TODOs against JIRA, as %s", reason)
+        return JiraUnavailable(reason)
+
+
+def add_jira_guard_options(parser):
+    parser.add_option(
+        "--jira-time-budget",
+        action="store",
+        type=float,
+        parse_from_config=True,
+        help="The most time in seconds each flake8 process may spend waiting for JIRA.  Once it's used up, or JIRA has "
+        f"failed {_MAX_CONSECUTIVE_FAILURES} times in a row, TODOs aren't checked against JIRA for the rest of the "
+        "run, but every other check still is.  Unset by default, in which case JIRA errors stop the run.",
+        default=None,
+    )
+
+
+def jira_guard_from_options(options, jira_client, stats=None):
+    if not jira_client or (options.jira_time_budget is None and options.jira_timeout is None):
+        return jira_client
+
+    if options.jira_time_budget is not None and options.jira_time_budget <= 0:
+        raise ValueError("jira-time-budget must be positive")
+
+    return JiraGuard(jira_client, time_budget=options.jira_time_budget, stats=stats)
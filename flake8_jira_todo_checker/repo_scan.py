@@ -0,0 +1,220 @@
+import argparse
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+
+from flake8_jira_todo_checker.checker import (
+    _DEFAULT_ALLOWED_TODO_SYNONYMS,
+    _DEFAULT_DISALLOWED_TODO_SYNONYMS,
+    _construct_todo_pattern,
+    _fold_todo_synonyms,
+    _scan_match,
+)
+
+logger = logging.getLogger(__name__)
+
+# Like git, treat any file with a NUL byte near the start as binary
+_BINARY_CHECK_BYTES = 8000
+_FILES_PER_TASK = 64
+# How much of a file is copied at a time to fold its case or count its lines, so that large files are never copied whole
+_WINDOW_BYTES = 1024 * 1024
+
+# Set in each worker process by _start_worker
+_scanner = None
+
+
+# Finds the TODOs in any text file, not just the Python files flake8 checks, and reports exactly what Checker would,
+# apart from anything which needs JIRA.
+#
+# Each file is memory-mapped and searched as raw bytes: first for the TODO synonyms, which is quick, a window at a
+# time, and then at each of those with the same pattern Checker uses for whole files.  Only the lines with a match are
+# decoded, and searched again the same way Checker searches lines, so that the results are identical.  Bytes patterns
+# only ignore the case of ASCII characters, which is all TODO synonyms and JIRA project IDs usually contain.
+class RepoScanner:
+    def __init__(self, jira_project_ids, allowed_todo_synonyms, disallowed_todo_synonyms):
+        self._jira_project_ids = jira_project_ids
+        self._allowed_todo_synonyms = set(allowed_todo_synonyms)
+        self._todo_pattern = _construct_todo_pattern(jira_project_ids, allowed_todo_synonyms, disallowed_todo_synonyms)
+        todo_buffer_pattern = _construct_todo_pattern(
+            jira_project_ids, allowed_todo_synonyms, disallowed_todo_synonyms, whole_file=True
+        )
+        self._todo_bytes_pattern = re.compile(todo_buffer_pattern.pattern.encode("utf-8"), re.VERBOSE | re.IGNORECASE)
+        self._folded_todo_synonyms = [
+            synonym.encode("utf-8") for synonym in _fold_todo_synonyms(allowed_todo_synonyms, disallowed_todo_synonyms)
+        ]
+
+    def scan_file(self, path):
+        # Returns one dict for every TODO in the file, in order
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return []
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+                    if b"\0" in contents[:_BINARY_CHECK_BYTES]:
+                        return []
+                    return self._scan_contents(path, contents)
+        except (IsADirectoryError, FileNotFoundError, PermissionError) as e:
+            # Submodules, and files which have been deleted but are still tracked by git
+            logger.debug("Skipping %s: %s", path, e)
+            return []
+
+    def _scan_contents(self, path, contents):
+        line_starts = set()
+        for offset in self._synonym_offsets(contents):
+            # Checker never finds a TODO right at the start of a line or file
+            if offset and self._todo_bytes_pattern.match(contents, offset - 1):
+                line_starts.add(contents.rfind(b"\n", 0, offset) + 1)
+        if not line_starts:
+            return []
+
+        results = []
+        line_number = 1
+        previous_line_start = 0
+        for line_start in sorted(line_starts):
+            line_number += _count_newlines(contents, previous_line_start, line_start)
+            previous_line_start = line_start
+            line_end = contents.find(b"\n", line_start)
+            line_end = len(contents) if line_end == -1 else line_end + 1
+            line = contents[line_start:line_end].decode("utf-8", errors="replace")
+            for match in self._todo_pattern.finditer(line):
+                todo_detail, errors, _ = _scan_match(
+                    match, line_number, line, match.start(1), self._allowed_todo_synonyms, self._jira_project_ids
+                )
+                results.append(
+                    {
+                        "path": path,
+                        "line": todo_detail.line_number,
+                        # 1-based, the same as flake8 reports
+                        "column": todo_detail.start_of_match + 1,
+                        "todo_word": todo_detail.todo_word,
+                        "jira_issue": todo_detail.jira_issue,
+                        "errors": [message for _, _, message, _ in errors],
+                    }
+                )
+        return results
+
+    def _synonym_offsets(self, contents):
+        # Yields the offset of every TODO synonym in contents, ignoring case.  Each window is extended by enough to
+        # include the end of any synonym which starts in it, and those which start in the extension are left to the
+        # next window.
+        overlap = max((len(synonym) for synonym in self._folded_todo_synonyms), default=1) - 1
+        for window_start in range(0, len(contents), _WINDOW_BYTES):
+            # bytes.lower only folds ASCII, so offsets line up with contents
+            window = contents[window_start : window_start + _WINDOW_BYTES + overlap].lower()
+            for synonym in self._folded_todo_synonyms:
+                offset = window.find(synonym, 0, _WINDOW_BYTES + len(synonym) - 1)
+                while offset != -1:
+                    yield window_start + offset
+                    offset = window.find(synonym, offset + 1, _WINDOW_BYTES + len(synonym) - 1)
+
+
+def _count_newlines(contents, start, end):
+    newlines = 0
+    for window_start in range(start, end, _WINDOW_BYTES):
+        newlines += contents[window_start : min(end, window_start + _WINDOW_BYTES)].count(b"\n")
+    return newlines
+
+
+def find_files(root):
+    # Every file under root which git doesn't ignore, or every file if root isn't in a git repository
+    if os.path.isfile(root):
+        return [root]
+    try:
+        listing = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=root,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.debug("Unable to list files with git, so walking %s instead: %s", root, getattr(e, "stderr", None) or e)
+        paths = []
+        for directory, directory_names, file_names in os.walk(root):
+            directory_names[:] = [name for name in directory_names if name != ".git"]
+            paths.extend(os.path.join(directory, name) for name in file_names)
+        return sorted(paths)
+    return [os.path.join(root, path) for path in os.fsdecode(listing).split("\0") if path]
+
+
+def _start_worker(jira_project_ids, allowed_todo_synonyms, disallowed_todo_synonyms):
+    global _scanner
+    _scanner = RepoScanner(jira_project_ids, allowed_todo_synonyms, disallowed_todo_synonyms)
+
+
+def _scan_files(paths):
+    return [result for path in paths for result in _scanner.scan_file(path)]
+
+
+def scan(paths, jira_project_ids, allowed_todo_synonyms, disallowed_todo_synonyms, jobs):
+    # Yields the results for each file as soon as it's scanned, so not in any particular order
+    scanner_args = (jira_project_ids, allowed_todo_synonyms, disallowed_todo_synonyms)
+    files = [path for root in paths for path in find_files(root)]
+    logger.debug("Scanning %s files", len(files))
+    tasks = [files[task_start : task_start + _FILES_PER_TASK] for task_start in range(0, len(files), _FILES_PER_TASK)]
+
+    if jobs == 1 or len(tasks) <= 1:
+        _start_worker(*scanner_args)
+        for task in tasks:
+            yield from _scan_files(task)
+        return
+
+    with multiprocessing.Pool(jobs, initializer=_start_worker, initargs=scanner_args) as pool:
+        for results in pool.imap_unordered(_scan_files, tasks):
+            yield from results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="flake8-jira-todo-scan",
+        description="Find every TODO in any kind of text file, in every file which git doesn't ignore, and write one "
+        "JSON object per TODO to stdout.  Reports the same errors as the flake8 plugin, apart from those which need "
+        "JIRA.",
+    )
+    parser.add_argument("paths", nargs="*", default=["."], help="Files or directories to scan.  Defaults to .")
+    parser.add_argument("--jira-project-ids", type=_comma_separated_list, default=[], help="Valid JIRA project IDs")
+    parser.add_argument(
+        "--allowed-todo-synonyms",
+        type=_comma_separated_list,
+        default=_DEFAULT_ALLOWED_TODO_SYNONYMS,
+        help="Allowed words which will be treated like a TODO.  Defaults to "
+        f"{','.join(_DEFAULT_ALLOWED_TODO_SYNONYMS)}",
+    )
+    parser.add_argument(
+        "--disallowed-todo-synonyms",
+        type=_comma_separated_list,
+        default=_DEFAULT_DISALLOWED_TODO_SYNONYMS,
+        help="Disallowed words which will be treated like a TODO.  Defaults to "
+        f"{','.join(_DEFAULT_DISALLOWED_TODO_SYNONYMS)}",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="How many processes to scan files with.  Defaults to the number of CPUs.",
+    )
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    found_errors = False
+    for result in scan(
+        args.paths, args.jira_project_ids, args.allowed_todo_synonyms, args.disallowed_todo_synonyms, args.jobs
+    ):
+        found_errors = found_errors or bool(result["errors"])
+        sys.stdout.write(json.dumps(result) + "\n")
+    return 1 if found_errors else 0
+
+
+def _comma_separated_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import contextlib
+import json
+import logging
+import pathlib
+import time
+
+from flake8_jira_todo_checker.sqlite_connection import ProcessLocalConnection
+
+logger = logging.getLogger(__name__)
+
+_CACHE_FILE_NAME = "scans.sqlite"
+_DEFAULT_MAX_ENTRIES = 50_000
+
+
+# Remembers what was found in each file, keyed by a hash of the file's contents and of everything in the configuration
+# which affects what we'd find, so that unchanged files don't need to be scanned again.
+class ScanCache:
+    def __init__(self, cache_dir, config, max_entries=_DEFAULT_MAX_ENTRIES, clock=None):
+        self._max_entries = max_entries
+        self._clock = clock or time.time
+        self.key = content_hasher(config)
+
+        cache_dir = pathlib.Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self._connection = ProcessLocalConnection(cache_dir / _CACHE_FILE_NAME, self._set_up)
+
+    def get(self, key):
+        connection = self._connection.get()
+        row = connection.execute("SELECT results FROM scans WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE scans SET last_used = ? WHERE key = ?", (self._clock(), key))
+        return json.loads(row[0])
+
+    def put(self, key, results):
+        self._connection.get().execute(
+            "INSERT OR REPLACE INTO scans (key, results, last_used) VALUES (?, ?, ?)",
+            (key, json.dumps(results, separators=(",", ":")), self._clock()),
+        )
+
+    def close(self):
+        self._connection.close()
+
+    def _set_up(self, connection):
+        # Every file checked writes to the cache, usually from several processes at once
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scans (
+                key TEXT PRIMARY KEY,
+                results TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS scans_last_used ON scans (last_used)")
+        self._evict(connection)
+
+    def _evict(self, connection):
+        # Evicting means walking the whole index, so only do it once per process rather than on every write.  The cache
+        # can therefore grow past max_entries by however many files one run adds.
+        with contextlib.closing(
+            connection.execute(
+                "DELETE FROM scans WHERE key IN (SELECT key FROM scans ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+        ) as cursor:
+            if cursor.rowcount > 0:
+                logger.debug("Evicted %s entries from the scan cache", cursor.rowcount)
+
+
+def content_hasher(config):
+    # Returns a function which hashes a file's lines together with config, which should be everything in the
+    # configuration which affects what we'd find in the file
+    import hashlib
+
+    config_hash = hashlib.blake2b(json.dumps(config, sort_keys=True).encode("utf-8"), digest_size=16)
+
+    def content_hash(lines):
+        file_hash = config_hash.copy()
+        file_hash.update("".join(lines).encode("utf-8", "surrogatepass"))
+        return file_hash.hexdigest()
+
+    return content_hash
+
+
+def add_scan_cache_options(parser):
+    parser.add_option(
+        "--jira-todo-scan-cache-max-entries",
+        action="store",
+        type=int,
+        parse_from_config=True,
+        help="Maximum number of files to remember the TODOs of in jira-cache-dir, so that unchanged files aren't "
+        f"scanned again.  0 disables the scan cache.  Defaults to {_DEFAULT_MAX_ENTRIES}.",
+        default=_DEFAULT_MAX_ENTRIES,
+    )
+
+
+def scan_cache_from_options(options, config):
+    if not options.jira_cache_dir or options.jira_todo_scan_cache_max_entries == 0:
+        logger.debug("Not using scan cache")
+        return None
+
+    if options.jira_todo_scan_cache_max_entries < 0:
+        raise ValueError("jira-todo-scan-cache-max-entries must not be negative")
+
+    return ScanCache(options.jira_cache_dir, config, max_entries=options.jira_todo_scan_cache_max_entries)
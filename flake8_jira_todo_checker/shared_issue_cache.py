@@ -0,0 +1,159 @@
+import atexit
+import contextlib
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+
+from flake8_jira_todo_checker.sqlite_connection import (
+    ProcessLocalConnection,
+    chunks,
+    connect,
+    placeholders,
+    transaction,
+)
+from flake8_jira_todo_checker.stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+_CACHE_FILE_NAME = "issues.sqlite"
+_POLL_INTERVAL_SECONDS = 0.01
+_MAX_POLL_INTERVAL_SECONDS = 0.2
+# Longer than JIRA could plausibly take to answer, even when rate limited.  After this, we assume whoever claimed an
+# issue has given up without saying so, and fetch it ourselves.
+_CLAIM_TIMEOUT_SECONDS = 5 * 60
+
+
+# Shares the issues looked up during one flake8 run between all of flake8's worker processes, through a SQLite database
+# in a temporary directory.  Before fetching an issue a worker claims it, and any other worker which wants the same
+# issue waits for the result rather than fetching it again.
+class SharedIssueCache:
+    def __init__(self, jira_client, path, stats=None, clock=None):
+        self._jira_client = jira_client
+        self._path = pathlib.Path(path)
+        self._stats = stats or RunStats()
+        self._clock = clock or time.time
+        self._connection = ProcessLocalConnection(self._path)
+
+        with contextlib.closing(connect(self._path)) as connection:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS issues (
+                    key TEXT PRIMARY KEY,
+                    found INTEGER NOT NULL,
+                    status TEXT,
+                    resolution TEXT
+                )
+                """
+            )
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS claims (
+                    key TEXT PRIMARY KEY,
+                    pid INTEGER NOT NULL,
+                    claimed_at REAL NOT NULL
+                )
+                """
+            )
+
+    def get_issues(self, issue_ids):
+        issues = {}
+        waiting = set(issue_ids)
+        poll_interval = _POLL_INTERVAL_SECONDS
+        while True:
+            found, claimed = self._find_or_claim(waiting)
+            issues.update(found)
+            waiting -= found.keys() | claimed
+            self._stats.count(shared_issue_cache_hits=len(found), shared_issue_cache_misses=len(claimed))
+
+            if claimed:
+                try:
+                    fetched = self._jira_client.get_issues(claimed)
+                except BaseException:
+                    # Let anyone waiting for these try for themselves
+                    self._release(claimed)
+                    raise
+                self._store(claimed, fetched)
+                issues.update((issue_id, fetched.get(issue_id)) for issue_id in claimed)
+
+            if not waiting:
+                break
+            logger.debug("Waiting for another process to fetch %s issues", len(waiting))
+            self._stats.count(shared_issue_cache_waits=1)
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, _MAX_POLL_INTERVAL_SECONDS)
+
+        # Issues which don't exist are stored as None, but callers expect them to be absent
+        return {issue_id: issue for issue_id, issue in issues.items() if issue is not None}
+
+    def _find_or_claim(self, issue_ids):
+        # Returns the issues which have already been fetched, and claims every other issue which nobody else has
+        found = {}
+        claimed = set()
+        if not issue_ids:
+            return found, claimed
+
+        now = self._clock()
+        connection = self._connection.get()
+        # IMMEDIATE, so that no other process can claim the same issues between us reading and writing the claims
+        with transaction(connection, "IMMEDIATE"):
+            for chunk in chunks(issue_ids):
+                for key, was_found, status, resolution in connection.execute(
+                    f"SELECT key, found, status, resolution FROM issues WHERE key IN ({placeholders(chunk)})", chunk
+                ):
+                    found[key] = (status, resolution) if was_found else None
+                claimed_by_others = {
+                    key
+                    for (key,) in connection.execute(
+                        f"SELECT key FROM claims WHERE claimed_at >= ? AND key IN ({placeholders(chunk)})",
+                        [now - _CLAIM_TIMEOUT_SECONDS, *chunk],
+                    )
+                }
+                claimed.update(key for key in chunk if key not in found and key not in claimed_by_others)
+            connection.executemany(
+                "INSERT OR REPLACE INTO claims (key, pid, claimed_at) VALUES (?, ?, ?)",
+                [(key, os.getpid(), now) for key in claimed],
+            )
+        return found, claimed
+
+    def _store(self, issue_ids, fetched):
+        rows = []
+        for issue_id in issue_ids:
+            try:
+                status, resolution = fetched[issue_id]
+            except KeyError:
+                rows.append((issue_id, False, None, None))
+            else:
+                rows.append((issue_id, True, status, resolution))
+
+        connection = self._connection.get()
+        with transaction(connection):
+            connection.executemany(
+                "INSERT OR REPLACE INTO issues (key, found, status, resolution) VALUES (?, ?, ?, ?)", rows
+            )
+            self._delete_claims(connection, issue_ids)
+
+    def _release(self, issue_ids):
+        connection = self._connection.get()
+        with transaction(connection):
+            self._delete_claims(connection, issue_ids)
+
+    def _delete_claims(self, connection, issue_ids):
+        for chunk in chunks(issue_ids):
+            connection.execute(
+                f"DELETE FROM claims WHERE pid = ? AND key IN ({placeholders(chunk)})", [os.getpid(), *chunk]
+            )
+
+
+def shared_issue_cache_from_options(options, jira_client, stats=None):
+    # Only worth it when flake8 is going to run more than one process
+    if not jira_client or str(options.jobs) in ("0", "1"):
+        return jira_client
+
+    directory = tempfile.mkdtemp(prefix="flake8-jira-todo-issues-")
+    # Only the process which parsed the options cleans up, as the workers inherit this atexit handler but don't run it
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return SharedIssueCache(jira_client, pathlib.Path(directory) / _CACHE_FILE_NAME, stats)
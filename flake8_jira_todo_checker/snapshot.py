@@ -0,0 +1,92 @@
+import logging
+import os
+import pathlib
+import tempfile
+
+from flake8_jira_todo_checker.jira_client import IssueStatus
+
+logger = logging.getLogger(__name__)
+
+# A snapshot is a text file with this header followed by one "KEY<tab>STATUS<tab>RESOLUTION" line per issue, sorted by
+# key.  Keeping it sorted means we can binary search the memory-mapped file for each issue, rather than parsing the
+# whole thing every time a flake8 worker starts.
+_HEADER = b"# flake8-jira-todo-checker snapshot v1\n"
+_SEPARATOR = b"\t"
+
+
+def write_snapshot(path, issues):
+    path = pathlib.Path(path)
+    lines = []
+    for issue_id, (status, resolution) in issues.items():
+        fields = [issue_id, status, resolution or ""]
+        if any(character in field for field in fields for character in "\t\n"):
+            raise ValueError(f"Unable to store issue in snapshot: {issue_id}")
+        lines.append(_SEPARATOR.join(field.encode("utf-8") for field in fields) + b"\n")
+    lines.sort()
+
+    # Write to a temporary file first so that nothing ever reads a half written snapshot
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.")
+    try:
+        with os.fdopen(file_descriptor, "wb") as f:
+            f.write(_HEADER)
+            f.writelines(lines)
+        os.replace(temporary_path, str(path))
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+    logger.debug("Wrote %s issues to snapshot %s", len(lines), path)
+
+
+class IssueSnapshot:
+    def __init__(self, path):
+        import mmap
+
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(_HEADER)] != _HEADER:
+            raise ValueError(f"Not a JIRA issue snapshot: {path}")
+
+    def get_issues(self, issue_ids):
+        issues = {}
+        for issue_id in issue_ids:
+            issue = self._find(issue_id.encode("utf-8"))
+            if issue:
+                issues[issue_id] = issue
+        return issues
+
+    def _find(self, issue_id):
+        # lo is always the start of a line, and every line before it has a smaller key.  Every line starting at or after
+        # hi has a larger key.
+        lo = len(_HEADER)
+        hi = len(self._mmap)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            line_start = self._mmap.rfind(b"\n", lo, mid) + 1 or lo
+            line_end = self._mmap.find(b"\n", line_start)
+            key_end = self._mmap.find(_SEPARATOR, line_start, line_end)
+            key = self._mmap[line_start:key_end]
+            if key == issue_id:
+                _, status, resolution = self._mmap[line_start:line_end].decode("utf-8").split("\t")
+                return IssueStatus(status, resolution or None)
+            elif key < issue_id:
+                lo = line_end + 1
+            else:
+                hi = line_start
+        return None
+
+
+def add_snapshot_options(parser):
+    parser.add_option(
+        "--jira-snapshot",
+        action="store",
+        parse_from_config=True,
+        help="Read the status of JIRA issues from this snapshot file, created by "
+        "`python -m flake8_jira_todo_checker export-snapshot`, instead of querying JIRA.",
+        default=None,
+    )
+
+
+def snapshot_from_options(options):
+    if not options.jira_snapshot:
+        return None
+    return IssueSnapshot(options.jira_snapshot)
@@ -0,0 +1,61 @@
+import contextlib
+import os
+
+# SQLite limits the number of host parameters in a single statement, stay well below it
+_MAX_KEYS_PER_STATEMENT = 500
+
+
+def connect(path):
+    # Only imported here, like everything else which isn't needed by a run without any caches, as flake8 imports every
+    # plugin on every run
+    import sqlite3
+
+    # Several processes may use the same database at once, so wait for each other's writes rather than failing, and
+    # leave it to us to begin and end transactions
+    return sqlite3.connect(str(path), timeout=30, isolation_level=None)
+
+
+# flake8 forks its workers after parsing options, and SQLite connections mustn't be shared between processes, so each
+# process opens its own the first time it needs one.  on_connect is called with each new connection, e.g. to create
+# tables.
+class ProcessLocalConnection:
+    def __init__(self, path, on_connect=None):
+        self._path = path
+        self._on_connect = on_connect
+        self._connection = None
+        self._connection_pid = None
+
+    def get(self):
+        if self._connection is None or self._connection_pid != os.getpid():
+            self._connection = connect(self._path)
+            self._connection_pid = os.getpid()
+            if self._on_connect:
+                self._on_connect(self._connection)
+        return self._connection
+
+    def close(self):
+        if self._connection and self._connection_pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+
+@contextlib.contextmanager
+def transaction(connection, mode="DEFERRED"):
+    connection.execute(f"BEGIN {mode}")
+    try:
+        yield
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+def chunks(keys):
+    # Splits keys into sorted lists which are each small enough to look up with "IN (...)"
+    keys = sorted(keys)
+    for chunk_start in range(0, len(keys), _MAX_KEYS_PER_STATEMENT):
+        yield keys[chunk_start : chunk_start + _MAX_KEYS_PER_STATEMENT]
+
+
+def placeholders(chunk):
+    return ",".join("?" * len(chunk))
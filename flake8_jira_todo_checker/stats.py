@@ -0,0 +1,163 @@
+import atexit
+import bisect
+import collections
+import json
+import logging
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the buckets in the JIRA query latency histogram, in seconds.  There's one more bucket for anything
+# slower than the last of these.
+LATENCY_BUCKETS_SECONDS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+# Counts what happened during a run, e.g. how many lines were scanned and how long JIRA took to answer, so that we can
+# tell where the time went.  Every Checker and JIRA client in a process shares one of these.
+#
+# flake8 forks its workers after parsing options, so each worker starts counting from zero the first time it counts
+# anything, and writes its counts to a file when it exits.  The main process adds them all up when reporting.
+class RunStats:
+    def __init__(self, print_summary=False, json_path=None):
+        self._print_summary = print_summary
+        self._json_path = json_path
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._counters = collections.Counter()
+        self._latency_histogram = [0] * (len(LATENCY_BUCKETS_SECONDS) + 1)
+        self._reported = False
+        self._worker_stats_dir = (
+            tempfile.mkdtemp(prefix="flake8-jira-todo-stats-") if print_summary or json_path else None
+        )
+
+    def count(self, **increments):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start_worker()
+            self._counters.update(increments)
+
+    def record_jira_query(self, seconds, bytes_received=0):
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_SECONDS, seconds)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start_worker()
+            self._counters.update(jira_queries=1, jira_query_seconds=seconds, jira_bytes_received=bytes_received)
+            self._latency_histogram[bucket] += 1
+
+    def to_dict(self):
+        with self._lock:
+            return {"counters": dict(self._counters), "jira_query_latency_histogram": list(self._latency_histogram)}
+
+    def report(self):
+        # Only the process which parsed the options reports, and only once, even if both the check command and atexit
+        # ask it to.
+        if not self._worker_stats_dir or self._reported or self._pid != os.getpid():
+            return
+        self._reported = True
+
+        totals = self.to_dict()
+        worker_stats_dir = pathlib.Path(self._worker_stats_dir)
+        for worker_stats_file in worker_stats_dir.glob("*.json"):
+            _add_stats(totals, json.loads(worker_stats_file.read_text()))
+        shutil.rmtree(str(worker_stats_dir), ignore_errors=True)
+        totals["jira_query_latency_histogram"] = dict(
+            zip([*(str(bound) for bound in LATENCY_BUCKETS_SECONDS), "+Inf"], totals["jira_query_latency_histogram"])
+        )
+
+        if self._json_path:
+            pathlib.Path(self._json_path).write_text(json.dumps(totals, indent=2, sort_keys=True))
+        if self._print_summary:
+            print(format_summary(totals), file=sys.stderr)
+
+    def _start_worker(self):
+        # We've been forked, so forget anything counted by the parent, which it'll report itself
+        self._pid = os.getpid()
+        self._counters.clear()
+        self._latency_histogram = [0] * len(self._latency_histogram)
+        if self._worker_stats_dir:
+            # multiprocessing's workers don't run atexit handlers, but do run its own finalizers when they exit cleanly
+            import multiprocessing.util
+
+            multiprocessing.util.Finalize(None, self._write_worker_stats, exitpriority=0)
+
+    def _write_worker_stats(self):
+        path = pathlib.Path(self._worker_stats_dir) / f"{os.getpid()}.json"
+        path.write_text(json.dumps(self.to_dict()))
+        logger.debug("Wrote stats for worker to %s", path)
+
+
+def _add_stats(totals, stats):
+    for name, value in stats["counters"].items():
+        totals["counters"][name] = totals["counters"].get(name, 0) + value
+    totals["jira_query_latency_histogram"] = [
+        total + count
+        for total, count in zip(totals["jira_query_latency_histogram"], stats["jira_query_latency_histogram"])
+    ]
+
+
+def format_summary(totals):
+    counters = collections.Counter(totals["counters"])
+    lines = [
+        "flake8-jira-todo-checker stats:",
+        f"  Files checked: {counters['files_checked']} ({counters['lines_checked']} lines), "
+        f"{counters['files_skipped']} skipped as unchanged",
+        f"  Files scanned: {counters['files_scanned']} ({counters['lines_scanned']} lines), "
+        f"{counters['todo_matches']} TODOs found",
+        f"  Scan cache: {counters['scan_cache_hits']} hits, {counters['scan_cache_misses']} misses",
+        f"  Issue registry: {counters['issue_registry_hits']} hits, {counters['issue_registry_misses']} misses",
+        f"  Shared issue cache: {counters['shared_issue_cache_hits']} hits, "
+        f"{counters['shared_issue_cache_misses']} misses, {counters['shared_issue_cache_waits']} waits",
+        f"  Issue cache: {counters['issue_cache_hits']} hits, {counters['issue_cache_misses']} misses, "
+        f"{counters['issues_synced']} issues synced",
+        f"  Issue preload: {counters['issues_preloaded']} open issues, {counters['issue_preload_hits']} hits, "
+        f"{counters['issue_preload_misses']} misses",
+        f"  Daemon lookups: {counters['daemon_lookups']} ({counters['daemon_keys_looked_up']} issues), "
+        f"{counters['daemon_failures']} failed",
+        f"  JIRA queries: {counters['jira_queries']}, {counters['jira_bytes_received']} bytes received, "
+        f"{counters['jira_rate_limited']} rate limited, {counters['jira_failures']} failed, "
+        f"{counters['jira_unavailable']} lookups skipped as JIRA was unavailable",
+    ]
+    if counters["jira_issue_batches"]:
+        lines.append(
+            f"  JIRA issue batches: {counters['jira_issue_batches']}, "
+            f"{counters['jira_keys_queried'] / counters['jira_issue_batches']:.1f} keys per batch on average"
+        )
+    if counters["jira_queries"]:
+        lines.append(
+            f"  JIRA query latency: {counters['jira_query_seconds'] / counters['jira_queries'] * 1000:.1f}ms on average"
+        )
+        for bucket, count in totals["jira_query_latency_histogram"].items():
+            label = f"> {LATENCY_BUCKETS_SECONDS[-1]}s" if bucket == "+Inf" else f"<= {bucket}s"
+            lines.append(f"    {label}: {count}")
+    return "\n".join(lines)
+
+
+def add_stats_options(parser):
+    parser.add_option(
+        "--jira-todo-stats",
+        action="store_true",
+        parse_from_config=True,
+        help="Print statistics about the run, such as how many lines were scanned and how long JIRA took to respond, "
+        "to stderr at the end.",
+        default=False,
+    )
+    parser.add_option(
+        "--jira-todo-stats-file",
+        action="store",
+        parse_from_config=True,
+        help="Write statistics about the run to this file as JSON at the end.  Unset by default.",
+        default=None,
+    )
+
+
+def stats_from_options(options):
+    stats = RunStats(print_summary=options.jira_todo_stats, json_path=options.jira_todo_stats_file)
+    if options.jira_todo_stats or options.jira_todo_stats_file:
+        # flake8 doesn't tell plugins when a run has finished
+        atexit.register(stats.report)
+    return stats
@@ -0,0 +1,115 @@
+import logging
+import os
+import pathlib
+
+from flake8_jira_todo_checker.scan_cache import content_hasher
+from flake8_jira_todo_checker.sqlite_connection import chunks, connect, placeholders, transaction
+
+logger = logging.getLogger(__name__)
+
+_INDEX_FILE_NAME = "todo_index.sqlite"
+
+
+# An index from each JIRA issue to every TODO which references it, so that questions like "which TODOs reference the
+# issues closed today?" can be answered without checking the whole repository again.  Each file's entry is keyed by a
+# hash of its contents and of everything in the configuration which affects what we'd find, so only files which have
+# changed since they were last indexed are scanned again.
+class TodoIndex:
+    def __init__(self, path, config):
+        self.content_hash = content_hasher(config)
+        self._connection = connect(path)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.execute(
+            """
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL
+                )
+            """
+        )
+        self._connection.execute(
+            """
+                CREATE TABLE IF NOT EXISTS todos (
+                    jira_issue TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    line_number INTEGER NOT NULL,
+                    start_of_match INTEGER NOT NULL,
+                    todo_word TEXT NOT NULL
+                )
+            """
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS todos_jira_issue ON todos (jira_issue)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS todos_path ON todos (path)")
+
+    def is_current(self, path, content_hash):
+        row = self._connection.execute("SELECT content_hash FROM files WHERE path = ?", (path,)).fetchone()
+        return row is not None and row[0] == content_hash
+
+    def update_file(self, path, content_hash, todo_details):
+        with transaction(self._connection):
+            self._connection.execute("DELETE FROM todos WHERE path = ?", (path,))
+            self._connection.executemany(
+                "INSERT INTO todos (jira_issue, path, line_number, start_of_match, todo_word) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        todo_detail.jira_issue,
+                        path,
+                        todo_detail.line_number,
+                        todo_detail.start_of_match,
+                        todo_detail.todo_word,
+                    )
+                    for todo_detail in todo_details
+                ],
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO files (path, content_hash) VALUES (?, ?)", (path, content_hash)
+            )
+
+    def remove_missing_files(self):
+        missing = [path for (path,) in self._connection.execute("SELECT path FROM files") if not os.path.exists(path)]
+        with transaction(self._connection):
+            for path in missing:
+                self._connection.execute("DELETE FROM todos WHERE path = ?", (path,))
+                self._connection.execute("DELETE FROM files WHERE path = ?", (path,))
+        return len(missing)
+
+    def find(self, jira_issues):
+        # Returns (path, line_number, start_of_match, todo_word, jira_issue) for every TODO referencing these issues,
+        # sorted by path and line
+        locations = []
+        for chunk in chunks(jira_issues):
+            locations.extend(
+                self._connection.execute(
+                    f"SELECT path, line_number, start_of_match, todo_word, jira_issue FROM todos "
+                    f"WHERE jira_issue IN ({placeholders(chunk)})",
+                    chunk,
+                )
+            )
+        return sorted(locations)
+
+    def close(self):
+        self._connection.close()
+
+
+def add_todo_index_options(parser):
+    parser.add_option(
+        "--jira-todo-index",
+        action="store",
+        parse_from_config=True,
+        help="Where to keep the index of which TODOs reference each JIRA issue, used by "
+        "`python -m flake8_jira_todo_checker index` and `python -m flake8_jira_todo_checker query-index`.  Defaults to "
+        f"{_INDEX_FILE_NAME} in jira-cache-dir.",
+        default=None,
+    )
+
+
+def todo_index_from_options(options, config):
+    if options.jira_todo_index:
+        path = pathlib.Path(options.jira_todo_index)
+    elif options.jira_cache_dir:
+        path = pathlib.Path(options.jira_cache_dir) / _INDEX_FILE_NAME
+    else:
+        raise ValueError("jira-todo-index or jira-cache-dir must be set to use the TODO index")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return TodoIndex(path, config)
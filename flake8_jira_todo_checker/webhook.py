@@ -0,0 +1,95 @@
+import hashlib
+import hmac
+import http.server
+import json
+import logging
+import socketserver
+import threading
+import urllib.parse
+
+from flake8_jira_todo_checker.jira_client import issue_statuses_from_search_result
+
+logger = logging.getLogger(__name__)
+
+# Created issues matter too, as we remember which issues don't exist
+_UPDATE_EVENTS = {"jira:issue_created", "jira:issue_updated"}
+_DELETE_EVENT = "jira:issue_deleted"
+
+
+# Receives JIRA's webhooks for issues being created, updated or deleted, and passes the new status of each issue to
+# on_issues straight away, with None for issues which have been deleted, along with the old keys of any issues which
+# have moved to another project.  Runs alongside the daemon, so that it can trust the issues it remembers for as long as
+# it runs, rather than forgetting them after a TTL.
+#
+# Only webhooks which prove they know secret are accepted, either by giving it as the token in the URL, or by signing
+# the payload with it in X-Hub-Signature, as JIRA does when the webhook is registered with a secret.
+class WebhookServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, secret, on_issues):
+        if not secret:
+            raise ValueError("A secret is needed to listen for JIRA webhooks")
+        self.secret = secret
+        self.on_issues = on_issues
+        super().__init__(address, _WebhookRequestHandler)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name="jira-webhook", daemon=True)
+        thread.start()
+        logger.info("Listening for JIRA webhooks on %s:%s", *self.server_address[:2])
+        return thread
+
+
+def issues_from_webhook(payload):
+    # Returns the new status of every issue in a JIRA webhook payload, with None for deleted issues, or nothing if it's
+    # not an event we care about
+    event = payload.get("webhookEvent")
+    if event in _UPDATE_EVENTS:
+        return issue_statuses_from_search_result({"issues": [payload["issue"]]})
+    if event == _DELETE_EVENT:
+        return {payload["issue"]["key"]: None}
+    return {}
+
+
+def moved_issue_ids(payload):
+    # Returns the old keys of any issues which a JIRA webhook payload says have moved to another project
+    changelog = payload.get("changelog") or {}
+    return {item["fromString"] for item in changelog.get("items", []) if item.get("field") == "Key"}
+
+
+def is_authentic(secret, path, headers, body):
+    token = urllib.parse.parse_qs(urllib.parse.urlsplit(path).query).get("token", [""])[0]
+    if hmac.compare_digest(token.encode("utf-8"), secret.encode("utf-8")):
+        return True
+    signature = headers.get("X-Hub-Signature", "")
+    expected_signature = "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature.encode("utf-8"), expected_signature.encode("utf-8"))
+
+
+class _WebhookRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not is_authentic(self.server.secret, self.path, self.headers, body):
+            logger.warning("Ignoring JIRA webhook from %s without the secret", self.client_address[0])
+            self.send_response(403)
+            self.end_headers()
+            return
+
+        try:
+            payload = json.loads(body.decode("utf-8"))
+            issues = issues_from_webhook(payload)
+            old_issue_ids = moved_issue_ids(payload) - issues.keys()
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            logger.warning("Ignoring invalid JIRA webhook: %s", e)
+            self.send_response(400)
+            self.end_headers()
+            return
+
+        if issues or old_issue_ids:
+            logger.debug("JIRA webhook %s: %s, moved from %s", payload["webhookEvent"], issues, old_issue_ids)
+            self.server.on_issues(issues, old_issue_ids)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
@@ -0,0 +1,250 @@
+import argparse
+import json
+import pathlib
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import flake8.main.application
+
+from flake8_jira_todo_checker.checker import Checker, ErrorCode, TodoDetail, _format_error
+from flake8_jira_todo_checker.issue_registry import IssueRegistry
+from flake8_jira_todo_checker.jira_client import MAX_ISSUES_PER_JIRA_QUERY, JiraClient
+from flake8_jira_todo_checker.version import __version__
+
+# Measures how quickly we find TODOs, format errors, check JIRA issues and run flake8 end to end over a synthetic source
+# tree, and writes the results to a JSON file which CI can compare with a baseline, e.g.
+#
+#   python -m test.benchmark_suite --output benchmark.json
+#   python -m test.benchmark_suite --output benchmark.json --baseline baseline.json
+#
+# Metrics ending in _per_second are better when higher, and metrics ending in _seconds are better when lower.
+
+_SCAN_MODES = ["lines", "buffer", "comments"]
+
+
+class FakeJira:
+    # Stands in for jira.JIRA, answering searches for "issuekey in (...)" after a fixed delay
+
+    def __init__(self, issues, latency_seconds):
+        self._issues = issues
+        self._latency_seconds = latency_seconds
+        self.searches = 0
+
+    def search_issues(self, jql, startAt, maxResults, fields, json_result):
+        self.searches += 1
+        time.sleep(self._latency_seconds)
+        keys = re.fullmatch(r"issuekey in \((.*)\)", jql).group(1).upper().split(",")
+        issues = [
+            {"key": key, "fields": {"status": {"name": self._issues[key]}, "resolution": None}}
+            for key in keys
+            if key in self._issues
+        ]
+        return {"startAt": startAt, "maxResults": maxResults, "total": len(issues), "issues": issues}
+
+
+def generate_source_tree(directory, files, lines_per_file, todo_every_n_lines, distinct_issues):
+    directory = pathlib.Path(directory)
+    for file_number in range(files):
+        lines = []
+        for line_number in range(lines_per_file):
+            if line_number % todo_every_n_lines == 0:
+                issue_number = (file_number * lines_per_file + line_number) % distinct_issues
+                lines.append(f"    x_{line_number} = compute(x)  # TODO ABC-{issue_number} reticulate fewer splines\n")
+            elif line_number % todo_every_n_lines == todo_every_n_lines // 2:
+                lines.append(f"    x_{line_number} = compute(x)  # FIXME: missing a JIRA issue\n")
+            else:
+                lines.append(f"    x_{line_number} = some_function(argument_one, argument_two, keyword=[1, 2, 3])\n")
+        package_directory = directory / f"package_{file_number // 100}"
+        package_directory.mkdir(parents=True, exist_ok=True)
+        (package_directory / f"module_{file_number}.py").write_text(f"def main(x):\n{''.join(lines)}")
+
+
+def benchmark_scanning(files_lines, repeat):
+    results = {}
+    total_lines = sum(len(lines) for lines in files_lines)
+    for scan_mode in _SCAN_MODES:
+        configure_checker("--jira-project-ids=ABC", f"--jira-todo-scan-mode={scan_mode}")
+        scan_time = best_time(lambda: [list(Checker(None, lines)._check_lines()) for lines in files_lines], repeat)
+        results[f"scan_{scan_mode}_lines_per_second"] = total_lines / scan_time
+    return results
+
+
+def benchmark_error_formatting(files_lines, repeat):
+    configure_checker("--jira-project-ids=ABC")
+    todo_details_and_lines = [
+        (todo_detail, lines[todo_detail.line_number - 1])
+        for lines in files_lines
+        for _, todo_detail in Checker(None, lines)._check_lines()
+        if todo_detail
+    ]
+    # Include some long lines, which have to be truncated
+    todo_details_and_lines += [
+        (TodoDetail("TODO", None, todo_detail.line_number, 2), f"# TODO {'x' * 100}\n")
+        for todo_detail, _ in todo_details_and_lines
+    ]
+
+    def format_errors():
+        return [
+            _format_error(ErrorCode.JIR003, todo_detail, line, "Status=Done")
+            for todo_detail, line in todo_details_and_lines
+        ]
+
+    return {"format_error_errors_per_second": len(todo_details_and_lines) / best_time(format_errors, repeat)}
+
+
+def benchmark_jira_checks(files_lines, distinct_issues, latency_seconds, max_concurrency, repeat):
+    configure_checker("--jira-project-ids=ABC")
+    checkers = [Checker(None, lines) for lines in files_lines]
+    todo_details_by_checker = [
+        (checker, [todo_detail for _, todo_detail in checker._check_lines() if todo_detail]) for checker in checkers
+    ]
+    total_issues = sum(len(todo_details) for _, todo_details in todo_details_by_checker)
+    # Every other issue is Done, and a tenth of them don't exist
+    issues = {
+        f"ABC-{issue_number}": "Done" if issue_number % 2 else "In Progress"
+        for issue_number in range(distinct_issues)
+        if issue_number % 10
+    }
+
+    def check_jira_issues():
+        fake_jira = FakeJira(issues, latency_seconds)
+        # A new registry each time, otherwise only the first repeat would ever reach JIRA
+        Checker.jira_client = IssueRegistry(JiraClient(fake_jira, max_concurrency=max_concurrency))
+        # Batched in the same way as Checker.run
+        for checker, todo_details in todo_details_by_checker:
+            for batch_start in range(0, len(todo_details), MAX_ISSUES_PER_JIRA_QUERY):
+                list(checker._check_jira_issues(todo_details[batch_start : batch_start + MAX_ISSUES_PER_JIRA_QUERY]))
+        return fake_jira.searches
+
+    try:
+        searches = check_jira_issues()
+        check_time = best_time(check_jira_issues, repeat)
+    finally:
+        Checker.jira_client = None
+    return {"jira_check_issues_per_second": total_issues / check_time, "jira_check_searches": searches}
+
+
+def benchmark_flake8(directory, repeat):
+    # A separate process, so that this includes flake8 starting up, importing the plugin and forking its workers.
+    # There's no JIRA server to talk to, so this only covers finding the TODOs.
+    def run_flake8():
+        subprocess.run(
+            [sys.executable, "-m", "flake8", "--isolated", "--select=JIR", "--jira-project-ids=ABC", str(directory)],
+            stdout=subprocess.DEVNULL,
+            check=False,
+        )
+
+    return {"flake8_wall_seconds": best_time(run_flake8, repeat)}
+
+
+def run_benchmarks(
+    files, lines_per_file, todo_every_n_lines, distinct_issues, latency_seconds, max_concurrency, repeat
+):
+    with tempfile.TemporaryDirectory() as directory:
+        generate_source_tree(directory, files, lines_per_file, todo_every_n_lines, distinct_issues)
+        files_lines = [
+            path.read_text().splitlines(keepends=True) for path in sorted(pathlib.Path(directory).rglob("*.py"))
+        ]
+
+        metrics = {}
+        metrics.update(benchmark_scanning(files_lines, repeat))
+        metrics.update(benchmark_error_formatting(files_lines, repeat))
+        metrics.update(benchmark_jira_checks(files_lines, distinct_issues, latency_seconds, max_concurrency, repeat))
+        metrics.update(benchmark_flake8(directory, repeat))
+
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "flake8": flake8.__version__,
+        "parameters": {
+            "files": files,
+            "lines_per_file": lines_per_file,
+            "todo_every_n_lines": todo_every_n_lines,
+            "distinct_issues": distinct_issues,
+            "latency_seconds": latency_seconds,
+            "max_concurrency": max_concurrency,
+            "repeat": repeat,
+        },
+        "metrics": metrics,
+    }
+
+
+def compare_with_baseline(metrics, baseline_metrics, tolerance):
+    # Returns a description of every metric which is more than tolerance worse than the baseline
+    regressions = []
+    for name, baseline_value in baseline_metrics.items():
+        value = metrics.get(name)
+        if value is None:
+            continue
+        if name.endswith("_per_second") and value < baseline_value * (1 - tolerance):
+            regressions.append(f"{name}: {value:,.2f} is slower than the baseline of {baseline_value:,.2f}")
+        elif name.endswith("_seconds") and value > baseline_value * (1 + tolerance):
+            regressions.append(f"{name}: {value:,.4f} is slower than the baseline of {baseline_value:,.4f}")
+    return regressions
+
+
+def configure_checker(*flake8_args):
+    # Let flake8 parse the options and call Checker.parse_options, as it would in a real run
+    flake8.main.application.Application().initialize(["--isolated", *flake8_args])
+
+
+def best_time(function, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m test.benchmark_suite")
+    parser.add_argument("--output", required=True, help="Where to write the results, as JSON")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare with")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="How much worse than the baseline a metric can be.  Default 0.2"
+    )
+    parser.add_argument("--files", type=int, default=200, help="Number of files to generate.  Default 200")
+    parser.add_argument("--lines-per-file", type=int, default=500, help="Lines in each file.  Default 500")
+    parser.add_argument(
+        "--todo-every-n-lines", type=int, default=20, help="How often a TODO with a JIRA issue appears.  Default 20"
+    )
+    parser.add_argument(
+        "--distinct-issues", type=int, default=1000, help="Number of different JIRA issues to mention.  Default 1000"
+    )
+    parser.add_argument(
+        "--jira-latency", type=float, default=0.05, help="Seconds each fake JIRA search takes.  Default 0.05"
+    )
+    parser.add_argument("--jira-max-concurrency", type=int, default=4, help="JIRA searches to run at once.  Default 4")
+    parser.add_argument("--repeat", type=int, default=3, help="Take the best of this many runs.  Default 3")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        files=args.files,
+        lines_per_file=args.lines_per_file,
+        todo_every_n_lines=args.todo_every_n_lines,
+        distinct_issues=args.distinct_issues,
+        latency_seconds=args.jira_latency,
+        max_concurrency=args.jira_max_concurrency,
+        repeat=args.repeat,
+    )
+    pathlib.Path(args.output).write_text(json.dumps(results, indent=2, sort_keys=True))
+    for name, value in sorted(results["metrics"].items()):
+        print(f"{name}: {value:,.4f}")
+
+    if args.baseline:
+        baseline = json.loads(pathlib.Path(args.baseline).read_text())
+        regressions = compare_with_baseline(results["metrics"], baseline["metrics"], args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+import pytest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def jira_issues():
+    # What the jira_client fixture returns for every lookup.  Override this in a test module to return something else.
+    return {"ABC-1": ("In Progress", None)}
+
+
+@pytest.fixture
+def jira_search_results():
+    # What the jira_client fixture returns for every search
+    return {}
+
+
+@pytest.fixture
+def jira_client(mocker, jira_issues, jira_search_results):
+    mock_client = mocker.MagicMock()
+    mock_client.get_issues.return_value = jira_issues
+    mock_client.search_issues.return_value = jira_search_results
+    return mock_client
@@ -0,0 +1,152 @@
+import contextlib
+import http.server
+import json
+import re
+import socketserver
+import threading
+import time
+import urllib.parse
+
+
+class JiraStubServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    # Just enough of JIRA's search API to test our clients against, without any network access.
+
+    daemon_threads = True
+
+    def __init__(self, issues):
+        super().__init__(("127.0.0.1", 0), _JiraStubRequestHandler)
+        # Map of issue key to (status, resolution)
+        self.issues = issues
+        # Map of issue key to when it was last updated, as returned by time.time().  Anything missing was updated long
+        # ago.
+        self.updated_at = {}
+        self.delay_seconds = 0
+        self.responses_to_rate_limit = 0
+        self.requests = []
+        self.authorization_headers = []
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def search(self, request):
+        with self._lock:
+            self.requests.append(request)
+            if self.responses_to_rate_limit:
+                self.responses_to_rate_limit -= 1
+                return 429, {"errorMessages": ["Rate limited"]}
+
+        matching_keys = sorted(
+            key
+            for key, (status, _) in self.issues.items()
+            if _matches(request["jql"], key, status, self.updated_at.get(key, 0))
+        )
+        start_at = request.get("startAt", 0)
+        max_results = request.get("maxResults", 50)
+        issues = []
+        for key in matching_keys[start_at : start_at + max_results]:
+            status, resolution = self.issues[key]
+            issues.append(
+                {
+                    "key": key,
+                    "fields": {
+                        "status": {"name": status},
+                        "resolution": {"name": resolution} if resolution else None,
+                    },
+                }
+            )
+        return 200, {"startAt": start_at, "maxResults": max_results, "total": len(matching_keys), "issues": issues}
+
+
+def _matches(jql, key, status, updated_at):
+    # Only understands the handful of JQL clauses our clients send.  The only status in the Done category is Done.
+    jql = re.sub(r" ORDER BY .*$", "", jql)
+    for clause in jql.split(" AND "):
+        if clause == "statusCategory != Done":
+            if status == "Done":
+                return False
+            continue
+        updated_within = re.fullmatch(r"updated >= -(\d+)m", clause)
+        if updated_within:
+            if updated_at < time.time() - int(updated_within.group(1)) * 60:
+                return False
+            continue
+        field, values = re.fullmatch(r"(\w+) in \((.*)\)", clause).groups()
+        values = {value.upper() for value in values.split(",")}
+        if field == "issuekey" and key not in values:
+            return False
+        if field == "project" and key.split("-")[0] not in values:
+            return False
+    return True
+
+
+class _JiraStubRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.authorization_headers.append(self.headers["Authorization"])
+        if self.server.delay_seconds:
+            time.sleep(self.server.delay_seconds)
+        if self.path != "/rest/api/2/search":
+            self._send_json(404, {"errorMessages": ["Not found"]})
+        else:
+            self._send_json(*self.server.search(body))
+
+    def do_GET(self):
+        # The jira library asks about the server when it's created, and about its fields before searching
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == "/rest/api/2/serverInfo":
+            self._send_json(200, {"version": "8.20.0", "versionNumbers": [8, 20, 0], "deploymentType": "Server"})
+            return
+        if url.path == "/rest/api/2/field":
+            self._send_json(200, [])
+            return
+
+        self.server.authorization_headers.append(self.headers["Authorization"])
+        if self.server.delay_seconds:
+            time.sleep(self.server.delay_seconds)
+        if url.path != "/rest/api/2/search":
+            self._send_json(404, {"errorMessages": ["Not found"]})
+            return
+        query = urllib.parse.parse_qs(url.query)
+        request = {
+            "jql": query["jql"][0],
+            "startAt": int(query.get("startAt", [0])[0]),
+            "maxResults": int(query.get("maxResults", [50])[0]),
+            "fields": ",".join(query.get("fields", [])).split(","),
+        }
+        self._send_json(*self.server.search(request))
+
+    def _send_json(self, status_code, body):
+        encoded_body = json.dumps(body).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded_body)))
+        if status_code == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(encoded_body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def running_jira_stub_server(issues):
+    server = JiraStubServer(issues)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -0,0 +1,428 @@
+import ast
+import contextlib
+import copy
+import io
+import itertools
+import json
+import pathlib
+import string
+import subprocess
+import sys
+import tracemalloc
+
+import jira.resources
+import pytest
+
+from flake8_jira_todo_checker import repo_scan
+from flake8_jira_todo_checker.checker import Checker, ErrorCode, _format_error
+from flake8_jira_todo_checker.jira_client import SEARCH_FIELDS, issue_statuses_from_search_result
+from flake8_jira_todo_checker.snapshot import IssueSnapshot, write_snapshot
+
+from . import benchmark_suite
+from .benchmark_suite import best_time, configure_checker
+
+_FIXTURES_DIRECTORY = pathlib.Path(__file__).parent / "fixtures"
+# Relative to how long flake8 itself takes to import, so that it's the same on fast and slow machines.  Currently around
+# half, leaving some headroom for noise.
+_IMPORT_TIME_BUDGET = 1.0
+# Slow to import, and only needed by runs which use the options which need them, so flake8 mustn't import them when it
+# loads the plugin
+_LAZILY_IMPORTED_MODULES = ["jira", "sqlite3", "hashlib", "mmap", "socketserver", "http.server", "concurrent.futures"]
+
+# Every comparison of timings is marked as a benchmark, and only runs with -m benchmark, e.g. tox -e benchmark, as they
+# can't be relied on when the machine is busy.  What each benchmark measures is checked for correctness by the unmarked
+# tests alongside it, which run with the rest of the tests.
+
+
+def _search_response(issue, number_of_issues):
+    issues = []
+    for issue_number in range(number_of_issues):
+        issue = copy.deepcopy(issue)
+        issue["key"] = f"ABC-{issue_number}"
+        issues.append(issue)
+    return json.dumps({"startAt": 0, "maxResults": 100, "total": number_of_issues, "issues": issues})
+
+
+def _search_responses():
+    # A real response for a single issue with all fields, as returned when search_issues isn't given any fields
+    recorded_issue = json.loads((_FIXTURES_DIRECTORY / "jira_search_issue.json").read_text())
+    restricted_issue = {
+        **recorded_issue,
+        "fields": {field: recorded_issue["fields"][field] for field in SEARCH_FIELDS},
+    }
+    all_fields_response = _search_response(recorded_issue, 100)
+    restricted_fields_response = _search_response(restricted_issue, 100)
+
+    def parse_all_fields():
+        return [jira.resources.Issue({}, None, raw=issue) for issue in json.loads(all_fields_response)["issues"]]
+
+    def parse_restricted_fields():
+        return issue_statuses_from_search_result(json.loads(restricted_fields_response))
+
+    return all_fields_response, restricted_fields_response, parse_all_fields, parse_restricted_fields
+
+
+def test_search_with_restricted_fields():
+    all_fields_response, restricted_fields_response, parse_all_fields, parse_restricted_fields = _search_responses()
+
+    assert len(parse_all_fields()) == len(parse_restricted_fields()) == 100
+    assert len(restricted_fields_response) * 10 < len(all_fields_response)
+
+
+@pytest.mark.benchmark
+def test_benchmark_search_with_restricted_fields():
+    all_fields_response, restricted_fields_response, parse_all_fields, parse_restricted_fields = _search_responses()
+
+    all_fields_time = best_time(parse_all_fields)
+    restricted_fields_time = best_time(parse_restricted_fields)
+    print(
+        f"100 issues, all fields: {len(all_fields_response)} bytes, parsed in {all_fields_time * 1000:.2f}ms.  "
+        f"Restricted fields: {len(restricted_fields_response)} bytes, parsed in {restricted_fields_time * 1000:.2f}ms."
+    )
+
+    assert restricted_fields_time * 10 < all_fields_time
+
+
+@pytest.mark.benchmark
+def test_benchmark_snapshot_lookup(tmp_path):
+    issues = {f"ABC-{issue_number}": ("In Progress", None) for issue_number in range(200_000)}
+    write_snapshot(tmp_path / "snapshot", issues)
+    issue_ids = {f"ABC-{issue_number}" for issue_number in range(0, 200_000, 2000)}
+
+    def load_and_look_up():
+        return IssueSnapshot(tmp_path / "snapshot").get_issues(issue_ids)
+
+    assert len(load_and_look_up()) == 100
+    lookup_time = best_time(load_and_look_up)
+    print(f"Opened 200k issue snapshot and looked up 100 issues in {lookup_time * 1000:.2f}ms")
+
+    assert lookup_time < 0.05
+
+
+def _import_plugin():
+    # flake8 is always imported before the plugin, so only count the modules and the time spent importing the plugin
+    # itself.  Returns the modules only the plugin imported, and how long it and flake8 took to import in microseconds.
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import flake8.main.application, sys; flake8_modules = set(sys.modules); import flake8_jira_todo_checker; "
+            "print(sorted(set(sys.modules) - flake8_modules))",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+        cwd=str(pathlib.Path(__file__).parent.parent),
+    )
+    imported_modules = ast.literal_eval(result.stdout)
+    cumulative_import_times_us = {
+        line.split("|")[-1].strip(): int(line.split("|")[1])
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and line.split("|")[1].strip().isdigit()
+    }
+    return (
+        imported_modules,
+        cumulative_import_times_us["flake8_jira_todo_checker"],
+        cumulative_import_times_us["flake8.main.application"],
+    )
+
+
+def test_import_does_not_import_slow_modules():
+    imported_modules, _, _ = _import_plugin()
+
+    assert not [
+        module
+        for module in imported_modules
+        for slow_module in _LAZILY_IMPORTED_MODULES
+        if module == slow_module or module.startswith(f"{slow_module}.")
+    ]
+
+
+@pytest.mark.benchmark
+def test_benchmark_import_time():
+    _, cumulative_import_time_us, flake8_import_time_us = _import_plugin()
+    print(
+        f"Imported flake8_jira_todo_checker in {cumulative_import_time_us / 1000:.2f}ms, "
+        f"flake8 in {flake8_import_time_us / 1000:.2f}ms"
+    )
+
+    assert cumulative_import_time_us < flake8_import_time_us * _IMPORT_TIME_BUDGET
+
+
+def _synthetic_lines(number_of_lines, todo_every_n_lines):
+    lines = []
+    for line_number in range(number_of_lines):
+        if line_number % todo_every_n_lines == 0:
+            lines.append(f"    x_{line_number} = compute(x)  # TODO ABC-{line_number} reticulate fewer splines\n")
+        else:
+            lines.append(f"    x_{line_number} = some_function(argument_one, argument_two, keyword=[1, 2, 3])\n")
+    return lines
+
+
+def _line_prefilter(lines):
+    configure_checker("--jira-project-ids=ABC")
+
+    def check_lines():
+        return list(Checker(None, lines)._check_lines())
+
+    def check_lines_without_prefilter():
+        return [
+            match for line_number, line in enumerate(lines, start=1) for match in Checker.todo_pattern.finditer(line)
+        ]
+
+    return check_lines, check_lines_without_prefilter
+
+
+def test_line_prefilter():
+    check_lines, check_lines_without_prefilter = _line_prefilter(_synthetic_lines(10_000, todo_every_n_lines=1000))
+
+    assert len(check_lines()) == len(check_lines_without_prefilter()) == 10
+
+
+@pytest.mark.benchmark
+def test_benchmark_line_prefilter():
+    lines = _synthetic_lines(100_000, todo_every_n_lines=1000)
+    check_lines, check_lines_without_prefilter = _line_prefilter(lines)
+
+    prefiltered_time = best_time(check_lines, repeat=3)
+    unfiltered_time = best_time(check_lines_without_prefilter, repeat=3)
+    print(
+        f"Scanned {len(lines) / prefiltered_time:,.0f} lines/s with prefilter, "
+        f"{len(lines) / unfiltered_time:,.0f} lines/s without"
+    )
+
+    assert prefiltered_time < unfiltered_time
+
+
+def _scan(lines, scan_mode, repeat=3):
+    # Returns what was found in lines in this scan mode, and the best time taken to find it
+    configure_checker("--jira-project-ids=ABC", f"--jira-todo-scan-mode={scan_mode}")
+    checker = Checker(None, lines)
+    return list(checker._check_lines()), best_time(lambda: list(checker._find_matches()), repeat=repeat)
+
+
+def test_scan_modes_find_the_same_todos():
+    lines = _synthetic_lines(2000, todo_every_n_lines=5)
+
+    lines_mode_results, _ = _scan(lines, "lines", repeat=1)
+    assert len(lines_mode_results) == 400
+    assert _scan(lines, "buffer", repeat=1)[0] == lines_mode_results
+    assert _scan(lines, "comments", repeat=1)[0] == lines_mode_results
+
+
+@pytest.mark.benchmark
+def test_benchmark_buffer_scan_mode():
+    lines = _synthetic_lines(50_000, todo_every_n_lines=5)
+
+    _, lines_mode_time = _scan(lines, "lines")
+    _, buffer_mode_time = _scan(lines, "buffer")
+    print(
+        f"Scanned {len(lines) / lines_mode_time:,.0f} lines/s in lines mode, "
+        f"{len(lines) / buffer_mode_time:,.0f} lines/s in buffer mode"
+    )
+
+    assert buffer_mode_time < lines_mode_time
+
+
+@pytest.mark.benchmark
+def test_benchmark_comments_scan_mode():
+    lines = _synthetic_lines(50_000, todo_every_n_lines=100)
+
+    _, lines_mode_time = _scan(lines, "lines")
+    _, comments_mode_time = _scan(lines, "comments")
+    # Tokenizing costs far more than it saves in searching, so comments mode is about avoiding false positives rather
+    # than speed.  This keeps track of how much it costs.
+    print(
+        f"Scanned {len(lines) / lines_mode_time:,.0f} lines/s in lines mode, "
+        f"{len(lines) / comments_mode_time:,.0f} lines/s in comments mode"
+    )
+
+
+def _check_every_file_with_and_without_scan_cache(files, cache_dir, repeat=3):
+    # Returns what was found without the scan cache and once every file's cached, and the best time taken for each
+    def check_every_file():
+        return [list(Checker(None, lines)._check_lines()) for lines in files]
+
+    configure_checker("--jira-project-ids=ABC")
+    uncached_results = check_every_file()
+    uncached_time = best_time(check_every_file, repeat=repeat)
+
+    configure_checker("--jira-project-ids=ABC", f"--jira-cache-dir={cache_dir}")
+    check_every_file()
+    cached_results = check_every_file()
+    cached_time = best_time(check_every_file, repeat=repeat)
+    Checker.scan_cache.close()
+    return uncached_results, uncached_time, cached_results, cached_time
+
+
+def test_scan_cache_finds_the_same_todos(tmp_path):
+    files = [_synthetic_lines(100, todo_every_n_lines=5 + file_number) for file_number in range(10)]
+
+    uncached_results, _, cached_results, _ = _check_every_file_with_and_without_scan_cache(files, tmp_path, repeat=1)
+
+    assert cached_results == uncached_results
+
+
+@pytest.mark.benchmark
+def test_benchmark_scan_cache(tmp_path):
+    files = [_synthetic_lines(500, todo_every_n_lines=5 + file_number % 50) for file_number in range(200)]
+
+    uncached_results, uncached_time, cached_results, cached_time = _check_every_file_with_and_without_scan_cache(
+        files, tmp_path
+    )
+    print(
+        f"Checked {len(files) / uncached_time:,.0f} files/s without the scan cache, "
+        f"{len(files) / cached_time:,.0f} files/s when every file is cached"
+    )
+
+    assert cached_time < uncached_time
+
+
+def test_benchmark_suite(tmp_path):
+    # Only checks that the suite runs and compares with a baseline, on a tree too small for the numbers to mean anything
+    arguments = [
+        "--files=3",
+        "--lines-per-file=50",
+        "--distinct-issues=20",
+        "--jira-latency=0",
+        "--repeat=1",
+    ]
+    assert benchmark_suite.main([f"--output={tmp_path / 'baseline.json'}", *arguments]) == 0
+    baseline = json.loads((tmp_path / "baseline.json").read_text())
+    assert baseline["metrics"]["jira_check_searches"] > 0
+    assert baseline["metrics"]["scan_lines_lines_per_second"] > 0
+
+    metrics = {"scan_lines_lines_per_second": 70, "flake8_wall_seconds": 1.1}
+    baseline_metrics = {"scan_lines_lines_per_second": 100, "flake8_wall_seconds": 1}
+    assert benchmark_suite.compare_with_baseline(metrics, baseline_metrics, 0.2) == [
+        "scan_lines_lines_per_second: 70.00 is slower than the baseline of 100.00"
+    ]
+
+
+def _todo_details_and_error_formatting(number_of_lines):
+    # Returns the lines, the TODOs found in them, how much memory finding them used, and two ways of formatting errors
+    configure_checker("--jira-project-ids=ABC")
+    lines = [
+        f"    x_{line_number} = compute(x)  # TODO ABC-{line_number} {'reticulate splines ' * (line_number % 5)}\n"
+        for line_number in range(number_of_lines)
+    ]
+
+    tracemalloc.start()
+    try:
+        todo_details = [todo_detail for _, todo_detail in Checker(None, lines)._check_lines()]
+        retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    def format_errors():
+        return [
+            _format_error(ErrorCode.JIR003, todo_detail, lines[todo_detail.line_number - 1], "Status=Done")
+            for todo_detail in todo_details
+        ]
+
+    def format_errors_with_string_io():
+        # How errors used to be formatted, from the whole line
+        messages = []
+        for todo_detail in todo_details:
+            line = lines[todo_detail.line_number - 1]
+            with contextlib.closing(io.StringIO()) as error_message:
+                error_message.write(f"{ErrorCode.JIR003.value} (Status=Done): ")
+                end_of_excerpt = todo_detail.start_of_match + 60
+                error_message.write(line.rstrip()[todo_detail.start_of_match : end_of_excerpt])
+                if len(line.rstrip()) > end_of_excerpt:
+                    error_message.write("...")
+                messages.append(error_message.getvalue())
+        return messages
+
+    return todo_details, retained_bytes, peak_bytes, format_errors, format_errors_with_string_io
+
+
+def test_todo_details_and_error_formatting():
+    todo_details, _, _, format_errors, format_errors_with_string_io = _todo_details_and_error_formatting(1000)
+
+    assert len(todo_details) == 1000
+    assert not hasattr(todo_details[0], "__dict__")
+    assert [message for _, _, message, _ in format_errors()] == format_errors_with_string_io()
+
+
+@pytest.mark.benchmark
+def test_benchmark_todo_details_and_error_formatting():
+    (
+        todo_details,
+        retained_bytes,
+        peak_bytes,
+        format_errors,
+        format_errors_with_string_io,
+    ) = _todo_details_and_error_formatting(50_000)
+
+    format_time = best_time(format_errors, repeat=3)
+    string_io_time = best_time(format_errors_with_string_io, repeat=3)
+    print(
+        f"50k TODOs retained {retained_bytes / len(todo_details):.0f} bytes each, peaking at "
+        f"{peak_bytes / 1_000_000:.1f}MB while scanning.  Formatted {len(todo_details) / format_time:,.0f} errors/s, "
+        f"{len(todo_details) / string_io_time:,.0f} errors/s with StringIO"
+    )
+
+    assert format_time < string_io_time
+
+
+@pytest.mark.benchmark
+def test_benchmark_many_project_ids():
+    # Spread out over the alphabet, like real project IDs, rather than all sharing a long prefix
+    all_project_ids = ["".join(letters) for letters in itertools.product(string.ascii_uppercase, repeat=3)][::17]
+
+    lines_per_second = {}
+    for number_of_project_ids in (1, 10, 100, 1000):
+        project_ids = all_project_ids[:number_of_project_ids]
+        configure_checker(f"--jira-project-ids={','.join(project_ids)}")
+        lines = [
+            f"    x_{line_number} = compute(x)  # TODO {project_ids[line_number % len(project_ids)]}-{line_number}\n"
+            for line_number in range(20_000)
+        ]
+
+        def check_lines():
+            return list(Checker(None, lines)._check_lines())
+
+        assert len(check_lines()) == len(lines)
+        lines_per_second[number_of_project_ids] = len(lines) / best_time(check_lines, repeat=3)
+
+    print(
+        ", ".join(
+            f"{number_of_project_ids} project IDs: {rate:,.0f} lines/s"
+            for number_of_project_ids, rate in lines_per_second.items()
+        )
+    )
+
+    # Joining the project IDs into a plain alternation made this about 100x slower with 1000 of them
+    assert lines_per_second[1000] * 2 > lines_per_second[1]
+
+
+@pytest.mark.benchmark
+def test_benchmark_repo_scan(tmp_path):
+    # Most lines of a real repository don't have a TODO on them
+    benchmark_suite.generate_source_tree(
+        tmp_path, files=200, lines_per_file=500, todo_every_n_lines=500, distinct_issues=1000
+    )
+    paths = sorted(tmp_path.rglob("*.py"))
+    megabytes = sum(path.stat().st_size for path in paths) / 1e6
+
+    def scan():
+        return list(repo_scan.scan([str(tmp_path)], ["ABC"], ["TODO"], ["FIXME", "QQ"], jobs=1))
+
+    def check_files():
+        return [list(Checker(None, path.read_text().splitlines(keepends=True))._check_lines()) for path in paths]
+
+    configure_checker("--jira-project-ids=ABC")
+    results = scan()
+    scan_time = best_time(scan, repeat=3)
+    check_files_time = best_time(check_files, repeat=3)
+    print(
+        f"Scanned {megabytes / scan_time:,.1f}MB/s with flake8-jira-todo-scan in one process, "
+        f"{megabytes / check_files_time:,.1f}MB/s with Checker"
+    )
+
+    assert len(results) == 200 * 2
+    assert scan_time < check_files_time
@@ -0,0 +1,205 @@
+import json
+
+import pytest
+
+import flake8_jira_todo_checker.checker
+import flake8_jira_todo_checker.cli
+from flake8_jira_todo_checker.cli import main
+
+from .test_flake8_jira_todo_checker import run_flake8
+
+
+@pytest.fixture
+def mock_jira_client(mocker):
+    mock_client = mocker.MagicMock()
+    mock_client.get_issues.return_value = {}
+    for module in (flake8_jira_todo_checker.checker, flake8_jira_todo_checker.cli):
+        mocker.patch.object(module, "jira_client_from_options", lambda *args, **kwargs: mock_client)
+    return mock_client
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    config_file = tmp_path / "setup.cfg"
+    config_file.write_text(
+        """
+[flake8]
+jira-project-ids = ABC
+jira-server=http://example.example/
+jira-cookie-username=test
+jira-cookie-password=test
+"""
+    )
+    return config_file
+
+
+def test_check_reports_errors_per_file(tmp_path, config_file, mock_jira_client, capsys):
+    (tmp_path / "a.py").write_text("# TODO ABC-1\n# FIXME ABC-2\n")
+    (tmp_path / "b.py").write_text("x = 1\n\n# TODO ABC-1\n")
+    mock_jira_client.get_issues.return_value = {"ABC-1": ("Done", None), "ABC-2": ("In Progress", None)}
+
+    assert main(["check", "--config", str(config_file), str(tmp_path)]) == 1
+
+    assert sorted(capsys.readouterr().out.splitlines()) == [
+        f"{tmp_path / 'a.py'}:1:3: JIR003 TODO with JIRA card in invalid state (Status=Done): TODO ABC-1",
+        f"{tmp_path / 'a.py'}:2:3: JIR004 Invalid word used instead of TODO: FIXME ABC-2",
+        f"{tmp_path / 'b.py'}:3:3: JIR003 TODO with JIRA card in invalid state (Status=Done): TODO ABC-1",
+    ]
+
+
+def test_check_looks_up_all_issues_at_once(tmp_path, config_file, mock_jira_client, capsys):
+    for file_number in range(15):
+        (tmp_path / f"file_{file_number}.py").write_text(
+            "".join(f"# TODO ABC-{issue_number}\n" for issue_number in range(file_number * 10, file_number * 10 + 20))
+        )
+
+    main(["check", "--config", str(config_file), str(tmp_path)])
+
+    mock_jira_client.get_issues.assert_called_once_with({f"ABC-{issue_number}" for issue_number in range(160)})
+    assert len(capsys.readouterr().out.splitlines()) == 15 * 20
+
+
+def test_check_without_errors(tmp_path, config_file, mock_jira_client, capsys):
+    (tmp_path / "a.py").write_text("# TODO ABC-1\n")
+    mock_jira_client.get_issues.return_value = {"ABC-1": ("In Progress", None)}
+
+    assert main(["check", "--config", str(config_file), str(tmp_path)]) == 0
+    assert capsys.readouterr().out == ""
+
+
+def test_export_snapshot(tmp_path, config_file, mock_jira_client):
+    mock_jira_client.search_issues.return_value = {"ABC-1": ("Done", "Fixed"), "ABC-2": ("To Do", None)}
+    (tmp_path / "a.py").write_text("# TODO ABC-1\n# TODO ABC-2\n# TODO ABC-3\n")
+
+    assert main(["export-snapshot", str(tmp_path / "snapshot"), "--config", str(config_file)]) == 0
+    mock_jira_client.search_issues.assert_called_once_with("project in (ABC) ORDER BY key")
+
+    assert set(
+        run_flake8(
+            f"""
+            [flake8]
+            jira-project-ids = ABC
+            jira-snapshot = {tmp_path / "snapshot"}
+            """,
+            "# TODO ABC-1\n# TODO ABC-2\n# TODO ABC-3\n",
+        )
+    ) == {
+        "1:3: JIR003 TODO with JIRA card in invalid state (Status=Done): TODO ABC-1",
+        "3:3: JIR002 TODO with invalid JIRA card: TODO ABC-3",
+    }
+
+
+def test_check_writes_stats(tmp_path, config_file, mock_jira_client):
+    (tmp_path / "a.py").write_text("# TODO ABC-1\n# TODO ABC-2\n")
+    (tmp_path / "b.py").write_text("x = 1\n\n# TODO ABC-1\n")
+
+    main(["check", "--config", str(config_file), f"--jira-todo-stats-file={tmp_path / 'stats.json'}", str(tmp_path)])
+
+    counters = json.loads((tmp_path / "stats.json").read_text())["counters"]
+    assert counters["files_checked"] == 2
+    assert counters["lines_checked"] == 5
+    assert counters["todo_matches"] == 3
+    assert counters["issue_registry_misses"] == 2
+
+
+def test_index_and_query_index(tmp_path, config_file, mock_jira_client, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.py").write_text("# TODO ABC-1\n# FIXME ABC-2\n")
+    (tmp_path / "b.py").write_text("x = 1\n\n# TODO ABC-1\n")
+    index_path = tmp_path / "index.sqlite"
+
+    assert main(["index", "--config", str(config_file), f"--jira-todo-index={index_path}", str(tmp_path)]) == 0
+    query_args = ["query-index", "--issues", "abc-1", "--config", str(config_file), f"--jira-todo-index={index_path}"]
+    assert main(query_args) == 0
+
+    assert capsys.readouterr().out.splitlines() == ["a.py:1:3: TODO ABC-1", "b.py:3:3: TODO ABC-1"]
+    mock_jira_client.get_issues.assert_not_called()
+
+
+def test_index_only_scans_changed_files(tmp_path, config_file, mock_jira_client, mocker, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.py").write_text("# TODO ABC-1\n")
+    (tmp_path / "b.py").write_text("# TODO ABC-2\n")
+    index_args = ["index", "--config", str(config_file), "--jira-todo-index=index.sqlite", str(tmp_path)]
+    query_args = ["query-index", "--issues", "ABC-1,ABC-2,ABC-3", "--config", str(config_file)]
+    main(index_args)
+
+    (tmp_path / "b.py").write_text("# TODO ABC-3\n")
+    check_all_lines = mocker.spy(flake8_jira_todo_checker.checker.Checker, "_check_all_lines")
+    main(index_args)
+    assert check_all_lines.call_count == 1
+
+    (tmp_path / "a.py").unlink()
+    main(index_args)
+    capsys.readouterr()
+    main(query_args + ["--jira-todo-index=index.sqlite"])
+    assert capsys.readouterr().out.splitlines() == ["b.py:1:3: TODO ABC-3"]
+
+
+def test_query_index_with_jql(tmp_path, config_file, mock_jira_client, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.py").write_text("# TODO ABC-1\n# TODO ABC-2\n# TODO ABC-3\n")
+    index_path = tmp_path / "index.sqlite"
+    mock_jira_client.search_issues.return_value = {"ABC-2": ("Done", "Fixed")}
+    main(["index", "--config", str(config_file), f"--jira-todo-index={index_path}", str(tmp_path)])
+
+    assert (
+        main(
+            [
+                "query-index",
+                "--jql",
+                "status CHANGED TO Done AFTER -1d",
+                "--issues",
+                "ABC-3",
+                "--config",
+                str(config_file),
+                f"--jira-todo-index={index_path}",
+            ]
+        )
+        == 0
+    )
+
+    mock_jira_client.search_issues.assert_called_once_with("project in (ABC) AND (status CHANGED TO Done AFTER -1d)")
+    assert capsys.readouterr().out.splitlines() == ["a.py:2:3: TODO ABC-2", "a.py:3:3: TODO ABC-3"]
+
+
+def test_daemon_picks_up_jira_recovery(tmp_path, config_file, mock_jira_client, mocker):
+    serve = mocker.patch.object(flake8_jira_todo_checker.cli, "serve")
+    # Otherwise the daemon's SIGTERM handler would outlive the test, and be inherited by any process it forks
+    mocker.patch.object(flake8_jira_todo_checker.cli.signal, "signal")
+    main(
+        [
+            "daemon",
+            "--config",
+            str(config_file),
+            f"--jira-daemon-socket={tmp_path / 'd.sock'}",
+            "--jira-time-budget=1",
+        ]
+    )
+    jira_client = serve.call_args.args[1]
+    mock_jira_client.get_issues.side_effect = [ConnectionError("JIRA is down")] * 5 + [{"ABC-1": ("Done", None)}]
+
+    for _ in range(5):
+        with pytest.raises(ConnectionError):
+            jira_client.get_issues({"ABC-1"})
+
+    assert jira_client.get_issues({"ABC-1"}) == {"ABC-1": ("Done", None)}
+
+
+def test_daemon_does_not_preload_open_issues(tmp_path, config_file, mock_jira_client, mocker):
+    serve = mocker.patch.object(flake8_jira_todo_checker.cli, "serve")
+    mocker.patch.object(flake8_jira_todo_checker.cli.signal, "signal")
+    mock_jira_client.search_issues.return_value = {"ABC-1": ("In Progress", None)}
+    main(
+        [
+            "daemon",
+            "--config",
+            str(config_file),
+            f"--jira-daemon-socket={tmp_path / 'd.sock'}",
+            "--jira-preload-open-issues",
+        ]
+    )
+    jira_client = serve.call_args.args[1]
+    mock_jira_client.get_issues.return_value = {"ABC-1": ("Done", None)}
+
+    assert jira_client.get_issues({"ABC-1"}) == {"ABC-1": ("Done", None)}
@@ -0,0 +1,199 @@
+import argparse
+import contextlib
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from flake8_jira_todo_checker.daemon import DaemonClient, DaemonError, daemon_client_from_options, receive_message
+from flake8_jira_todo_checker.daemon_server import DaemonServer
+from flake8_jira_todo_checker.issue_registry import IssueRegistry
+from flake8_jira_todo_checker.jira_guard import JiraUnavailable
+
+from .jira_stub_server import running_jira_stub_server
+
+_JIRA_SERVER = "http://example.example/"
+
+
+@contextlib.contextmanager
+def running_daemon(socket_path, jira_client, ttl=60, clock=None):
+    server = DaemonServer(socket_path, IssueRegistry(jira_client), _JIRA_SERVER, ttl, clock)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_looks_up_issues_through_daemon(tmp_path, jira_client):
+    with running_daemon(tmp_path / "d.sock", jira_client):
+        daemon_client = DaemonClient(tmp_path / "d.sock", _JIRA_SERVER)
+
+        assert daemon_client.get_issues({"ABC-1", "ABC-2"}) == {"ABC-1": ("In Progress", None)}
+        assert daemon_client.get_issues({"ABC-1", "ABC-2"}) == {"ABC-1": ("In Progress", None)}
+
+    jira_client.get_issues.assert_called_once_with({"ABC-1", "ABC-2"})
+
+
+def test_forgets_issues_after_ttl(tmp_path, jira_client):
+    now = [0]
+    with running_daemon(tmp_path / "d.sock", jira_client, ttl=60, clock=lambda: now[0]):
+        daemon_client = DaemonClient(tmp_path / "d.sock", _JIRA_SERVER)
+        daemon_client.get_issues({"ABC-1"})
+        now[0] = 30
+        daemon_client.get_issues({"ABC-1", "ABC-2"})
+        now[0] = 61
+        daemon_client.get_issues({"ABC-1", "ABC-2"})
+
+    assert [call.args[0] for call in jira_client.get_issues.call_args_list] == [{"ABC-1"}, {"ABC-2"}, {"ABC-1"}]
+
+
+def test_rejects_other_jira_servers(tmp_path, jira_client):
+    with running_daemon(tmp_path / "d.sock", jira_client):
+        with pytest.raises(DaemonError, match="not http://other.example/"):
+            DaemonClient(tmp_path / "d.sock", "http://other.example/").ping()
+
+    jira_client.get_issues.assert_not_called()
+
+
+def test_falls_back_to_jira_when_daemon_stops(tmp_path, jira_client, mocker):
+    fallback_client = mocker.MagicMock()
+    fallback_client.get_issues.return_value = {"ABC-2": ("Done", None)}
+    fallback = mocker.Mock(return_value=fallback_client)
+    daemon_client = DaemonClient(tmp_path / "d.sock", _JIRA_SERVER, fallback=fallback)
+    with running_daemon(tmp_path / "d.sock", jira_client):
+        assert daemon_client.get_issues({"ABC-1"}) == {"ABC-1": ("In Progress", None)}
+
+    assert daemon_client.get_issues({"ABC-2"}) == {"ABC-2": ("Done", None)}
+    assert daemon_client.get_issues({"ABC-2"}) == {"ABC-2": ("Done", None)}
+    fallback.assert_called_once_with()
+
+
+def test_skips_jira_checks_when_daemon_stops_without_fallback(tmp_path, jira_client):
+    daemon_client = DaemonClient(tmp_path / "d.sock", _JIRA_SERVER)
+    with running_daemon(tmp_path / "d.sock", jira_client):
+        daemon_client.get_issues({"ABC-1"})
+
+    with pytest.raises(JiraUnavailable, match="the daemon failed"):
+        daemon_client.get_issues({"ABC-1"})
+
+
+def test_gives_up_on_clients_which_hang(tmp_path, jira_client):
+    with running_daemon(tmp_path / "d.sock", jira_client) as server:
+        server.request_timeout = 0.1
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as hanging_connection:
+            hanging_connection.settimeout(5)
+            hanging_connection.connect(str(tmp_path / "d.sock"))
+
+            assert "timed out" in receive_message(hanging_connection)["error"]
+
+        assert DaemonClient(tmp_path / "d.sock", _JIRA_SERVER).get_issues({"ABC-1"}) == {"ABC-1": ("In Progress", None)}
+
+
+@pytest.fixture
+def slow_jira_client(jira_client):
+    # Doesn't answer about ABC-2 until told to
+    jira_answers = threading.Event()
+
+    def get_issues(issue_ids):
+        if "ABC-2" in issue_ids:
+            assert jira_answers.wait(timeout=30)
+        return {"ABC-1": ("In Progress", None), "ABC-2": ("To Do", None)}
+
+    jira_client.get_issues.side_effect = get_issues
+    jira_client.answer = jira_answers.set
+    return jira_client
+
+
+def test_answers_from_memory_while_fetching_from_jira(tmp_path, slow_jira_client):
+    with running_daemon(tmp_path / "d.sock", slow_jira_client):
+        daemon_client = DaemonClient(tmp_path / "d.sock", _JIRA_SERVER, timeout=5)
+        daemon_client.get_issues({"ABC-1"})
+        fetch = threading.Thread(target=daemon_client.get_issues, args=({"ABC-2"},))
+        fetch.start()
+        try:
+            assert daemon_client.get_issues({"ABC-1"}) == {"ABC-1": ("In Progress", None)}
+        finally:
+            slow_jira_client.answer()
+            fetch.join()
+
+
+def test_updates_while_fetching_are_not_overwritten(tmp_path, slow_jira_client):
+    with running_daemon(tmp_path / "d.sock", slow_jira_client) as server:
+        daemon_client = DaemonClient(tmp_path / "d.sock", _JIRA_SERVER, timeout=5)
+        fetched = []
+        fetch = threading.Thread(target=lambda: fetched.append(daemon_client.get_issues({"ABC-2"})))
+        fetch.start()
+        while not slow_jira_client.get_issues.called:
+            time.sleep(0.01)
+        server.update_issues({"ABC-2": ("Done", "Fixed")})
+        slow_jira_client.answer()
+        fetch.join()
+
+        assert fetched == [{"ABC-2": ("Done", "Fixed")}]
+        assert daemon_client.get_issues({"ABC-2"}) == {"ABC-2": ("Done", "Fixed")}
+
+
+def test_falls_back_to_jira_when_daemon_is_too_slow(tmp_path, slow_jira_client, mocker):
+    fallback_client = mocker.MagicMock()
+    fallback_client.get_issues.return_value = {"ABC-2": ("Done", None)}
+    with running_daemon(tmp_path / "d.sock", slow_jira_client):
+        daemon_client = DaemonClient(tmp_path / "d.sock", _JIRA_SERVER, fallback=lambda: fallback_client, timeout=0.1)
+        try:
+            assert daemon_client.get_issues({"ABC-2"}) == {"ABC-2": ("Done", None)}
+        finally:
+            slow_jira_client.answer()
+
+
+def test_falls_back_when_daemon_is_not_running(tmp_path):
+    options = argparse.Namespace(
+        jira_daemon_socket=str(tmp_path / "d.sock"), jira_server=_JIRA_SERVER, jira_timeout=None, jira_time_budget=None
+    )
+
+    assert daemon_client_from_options(options) is None
+
+
+def test_flake8_with_daemon(tmp_path):
+    (tmp_path / "a.py").write_text("# TODO ABC-1\n# TODO ABC-2\n")
+    socket_path = tmp_path / "d.sock"
+
+    with running_jira_stub_server({"ABC-1": ("Done", None), "ABC-2": ("In Progress", None)}) as jira_server:
+        options = [
+            "--isolated",
+            "--jira-project-ids=ABC",
+            f"--jira-server={jira_server.url}",
+            "--jira-http-basic-username=test",
+            "--jira-http-basic-password=test",
+            "--jira-client-backend=asyncio",
+            f"--jira-daemon-socket={socket_path}",
+        ]
+        daemon = subprocess.Popen([sys.executable, "-m", "flake8_jira_todo_checker", "daemon", *options])
+        try:
+            deadline = time.monotonic() + 30
+            while not socket_path.exists():
+                assert daemon.poll() is None and time.monotonic() < deadline
+                time.sleep(0.01)
+
+            for _ in range(2):
+                result = subprocess.run(
+                    [sys.executable, "-m", "flake8", "--select=JIR", *options, str(tmp_path / "a.py")],
+                    stdout=subprocess.PIPE,
+                    universal_newlines=True,
+                    check=False,
+                )
+                assert result.stdout.splitlines() == [
+                    f"{tmp_path / 'a.py'}:1:3: JIR003 TODO with JIRA card in invalid state (Status=Done): TODO ABC-1"
+                ]
+        finally:
+            daemon.terminate()
+            assert daemon.wait(timeout=30) == 0
+
+        # Both runs were answered by the daemon, which only asked JIRA once
+        assert len(jira_server.requests) == 1
+    assert not socket_path.exists()
@@ -1,14 +1,18 @@
 import contextlib
 import io
 import os
+import subprocess
 import sys
 import tempfile
+import time
 
 import flake8.main.application
 import pytest
 
 import flake8_jira_todo_checker
 
+from .jira_stub_server import running_jira_stub_server
+
 
 def _strip_indent(s: str):
     lines = s.splitlines(keepends=True)
@@ -41,36 +45,40 @@ def as_temporary_file(text, suffix):
 
 def run_flake8(config, code):
     with as_temporary_file(code, ".py") as code_file:
-        with as_temporary_file(config, ".ini") as config_file:
-            try:
-                actual_stdout = sys.stdout
-                actual_stderr = sys.stderr
+        yield from run_flake8_on_file(config, code_file)
+
+
+def run_flake8_on_file(config, code_file):
+    with as_temporary_file(config, ".ini") as config_file:
+        try:
+            actual_stdout = sys.stdout
+            actual_stderr = sys.stderr
 
-                # One of the flake8 maintainers "suggests" using TextIOWrapper when monkeypatching sys.stdout
-                # https://github.com/PyCQA/flake8/issues/1419
-                new_stdout_buffer = io.BytesIO()
-                sys.stdout = io.TextIOWrapper(new_stdout_buffer, write_through=True)
+            # One of the flake8 maintainers "suggests" using TextIOWrapper when monkeypatching sys.stdout
+            # https://github.com/PyCQA/flake8/issues/1419
+            new_stdout_buffer = io.BytesIO()
+            sys.stdout = io.TextIOWrapper(new_stdout_buffer, write_through=True)
 
-                new_stderr_buffer = io.BytesIO()
-                sys.stderr = io.TextIOWrapper(new_stderr_buffer, write_through=True)
+            new_stderr_buffer = io.BytesIO()
+            sys.stderr = io.TextIOWrapper(new_stderr_buffer, write_through=True)
 
-                app = flake8.main.application.Application()
-                app.run(["--config", config_file, code_file])
+            app = flake8.main.application.Application()
+            app.run(["--config", config_file, code_file])
 
-                flake8_stdout = new_stdout_buffer.getvalue().decode("utf-8")
-                flake8_stderr = new_stderr_buffer.getvalue().decode("utf-8")
-            finally:
-                sys.stdout.close()
-                sys.stderr.close()
-                sys.stdout = actual_stdout
-                sys.stderr = actual_stderr
+            flake8_stdout = new_stdout_buffer.getvalue().decode("utf-8")
+            flake8_stderr = new_stderr_buffer.getvalue().decode("utf-8")
+        finally:
+            sys.stdout.close()
+            sys.stderr.close()
+            sys.stdout = actual_stdout
+            sys.stderr = actual_stderr
 
-            if flake8_stderr:
-                raise ValueError(f"Error while running flake8: {flake8_stderr}")
+        if flake8_stderr:
+            raise ValueError(f"Error while running flake8: {flake8_stderr}")
 
-            if flake8_stdout:
-                for line in flake8_stdout.splitlines():
-                    yield line.split(":", maxsplit=1)[1]
+        if flake8_stdout:
+            for line in flake8_stdout.splitlines():
+                yield line.split(":", maxsplit=1)[1]
 
 
 @pytest.fixture
@@ -194,18 +202,71 @@ def mock_jira_client(mocker):
             ["2:7: JIR005 Bad capitalisation of JIRA ticket ID: TODO AbC-1"],
             id="Valid TODO with bad capitalisation",
         ),
+        pytest.param(
+            """
+            def main():
+                # Straße TODO
+                pass
+            """,
+            ["2:14: JIR001 TODO with missing or malformed JIRA card: TODO"],
+            id="Characters which casefold to more than one character",
+        ),
+        pytest.param(
+            """
+            x = '''
+            TODO at the start of a line
+            FIXME: also at the start of a line
+            '''
+            """,
+            [],
+            id="TODO at the start of a line",
+        ),
+        pytest.param(
+            """
+            def main():
+                # TODO TODO
+                pass
+            """,
+            ["2:7: JIR001 TODO with missing or malformed JIRA card: TODO TODO"],
+            id="Adjacent TODOs",
+        ),
     ],
 )
-def test_todo_recognition(code, expected_errors):
-    config = """
+@pytest.mark.parametrize("scan_mode", ["lines", "buffer", "comments"])
+def test_todo_recognition(code, expected_errors, scan_mode):
+    config = f"""
         [flake8]
         allowed-todo-synonyms = TODO
         disallowed-todo-synonyms=FIX,FIXME,QQ
         jira-project-ids = ABC
+        jira-todo-scan-mode = {scan_mode}
     """
     assert set(run_flake8(config, code)) == set(expected_errors)
 
 
+@pytest.mark.parametrize("scan_mode", ["lines", "buffer", "comments"])
+def test_project_ids_with_common_prefixes_and_regex_characters(scan_mode):
+    config = f"""
+        [flake8]
+        jira-project-ids = ABC,AB,A.C,ABCD
+        jira-todo-scan-mode = {scan_mode}
+    """
+    code = """
+        def main():
+            # TODO AB-1
+            # TODO ABC-2
+            # TODO ABCD-3
+            # TODO A.C-4
+            # TODO AXC-5
+            # TODO ABCDE-6
+            pass
+    """
+    assert set(run_flake8(config, code)) == {
+        "6:7: JIR001 TODO with missing or malformed JIRA card: TODO AXC-5",
+        "7:7: JIR001 TODO with missing or malformed JIRA card: TODO ABCDE-6",
+    }
+
+
 @pytest.mark.parametrize(
     "code,expected_errors",
     [
@@ -256,11 +317,42 @@ def test_todo_recognition(code, expected_errors):
         ),
     ],
 )
-def test_no_jira_project_ids(code, expected_errors):
-    config = """
+@pytest.mark.parametrize("scan_mode", ["lines", "buffer", "comments"])
+def test_no_jira_project_ids(code, expected_errors, scan_mode):
+    config = f"""
         [flake8]
         allowed-todo-synonyms = TODO
         disallowed-todo-synonyms=FIX,FIXME,QQ
+        jira-todo-scan-mode = {scan_mode}
+    """
+    assert set(run_flake8(config, code)) == set(expected_errors)
+
+
+@pytest.mark.parametrize(
+    "scan_mode,expected_errors",
+    [
+        pytest.param(
+            "lines",
+            [
+                "1:14: JIR001 TODO with missing or malformed JIRA card: TODO in a string'",
+                "2:3: JIR001 TODO with missing or malformed JIRA card: TODO in a comment",
+            ],
+            id="lines",
+        ),
+        pytest.param(
+            "comments", ["2:3: JIR001 TODO with missing or malformed JIRA card: TODO in a comment"], id="comments"
+        ),
+    ],
+)
+def test_todos_outside_comments(scan_mode, expected_errors):
+    config = f"""
+        [flake8]
+        jira-project-ids = ABC
+        jira-todo-scan-mode = {scan_mode}
+    """
+    code = """
+        message = 'a TODO in a string'
+        # TODO in a comment
     """
     assert set(run_flake8(config, code)) == set(expected_errors)
 
@@ -355,3 +447,261 @@ def test_jira_integration_no_jira_project_ids(mock_jira_client):
     mock_jira_client.get_issues.side_effect = raise_runtime_exception
 
     assert set(run_flake8(config, code)) == {"2:7: JIR001 TODO with missing or malformed JIRA card: TODO ABC-123"}
+
+
+def test_jira_integration_with_cache(mock_jira_client, tmp_path):
+    config = f"""
+        [flake8]
+        jira-project-ids = ABC
+        jira-server=http://example.example/
+        jira-cookie-username=test
+        jira-cookie-password=test
+        jira-cache-dir={tmp_path}
+    """
+    code = """
+        def main():
+            # TODO ABC-123
+            pass
+    """
+    mock_jira_client.get_issues.return_value = {"ABC-123": ("Done", None)}
+
+    for _ in range(2):
+        assert set(run_flake8(config, code)) == {
+            "2:7: JIR003 TODO with JIRA card in invalid state (Status=Done): TODO ABC-123"
+        }
+    mock_jira_client.get_issues.assert_called_once_with({"ABC-123"})
+
+
+def test_jira_integration_with_asyncio_backend():
+    code = """
+        def main():
+            # TODO ABC-123
+            # TODO ABC-456
+            # TODO ABC-789
+            pass
+    """
+    with running_jira_stub_server({"ABC-123": ("In Progress", None), "ABC-456": ("Done", None)}) as jira_server:
+        config = f"""
+            [flake8]
+            jira-project-ids = ABC
+            jira-server={jira_server.url}
+            jira-http-basic-username=test
+            jira-http-basic-password=test
+            jira-client-backend=asyncio
+        """
+
+        assert set(run_flake8(config, code)) == {
+            "3:7: JIR003 TODO with JIRA card in invalid state (Status=Done): TODO ABC-456",
+            "4:7: JIR002 TODO with invalid JIRA card: TODO ABC-789",
+        }
+
+
+def test_jira_integration_with_preload():
+    code = """
+        def main():
+            # TODO ABC-1
+            # TODO ABC-2
+            # TODO ABC-3
+            # TODO ABC-4
+            pass
+    """
+    issues = {f"ABC-{issue_number}": ("In Progress", None) for issue_number in range(1, 250)}
+    issues["ABC-3"] = ("Done", None)
+    with running_jira_stub_server(issues) as jira_server:
+        config = f"""
+            [flake8]
+            jira-project-ids = ABC
+            jira-server={jira_server.url}
+            jira-http-basic-username=test
+            jira-http-basic-password=test
+            jira-client-backend=asyncio
+            jira-preload-open-issues=true
+        """
+
+        assert set(run_flake8(config, code)) == {
+            "4:7: JIR003 TODO with JIRA card in invalid state (Status=Done): TODO ABC-3",
+        }
+        # Three pages of open issues, and then one lookup for the issue which wasn't open
+        assert [request["jql"] for request in jira_server.requests] == [
+            "project in (ABC) AND statusCategory != Done",
+            "project in (ABC) AND statusCategory != Done",
+            "project in (ABC) AND statusCategory != Done",
+            "issuekey in (abc-3)",
+        ]
+
+
+@pytest.mark.parametrize("backend", ["jira", "asyncio"])
+def test_jira_integration_with_preload_and_several_jobs(tmp_path, backend):
+    # Open issues are preloaded before flake8 forks its workers, which then look up the rest themselves
+    for file_number in range(8):
+        (tmp_path / f"file_{file_number}.py").write_text(
+            "".join(f"# TODO ABC-{issue_number}\n" for issue_number in range(file_number * 20, file_number * 20 + 30))
+        )
+    issues = {f"ABC-{issue_number}": ("In Progress", None) for issue_number in range(0, 170, 2)}
+    issues.update({f"ABC-{issue_number}": ("Done", None) for issue_number in range(1, 170, 2)})
+
+    with running_jira_stub_server(issues) as jira_server:
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "flake8",
+                "--isolated",
+                "--select=JIR",
+                "--jobs=2",
+                "--jira-project-ids=ABC",
+                f"--jira-server={jira_server.url}",
+                "--jira-http-basic-username=test",
+                "--jira-http-basic-password=test",
+                f"--jira-client-backend={backend}",
+                "--jira-preload-open-issues",
+                str(tmp_path),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            timeout=60,
+            check=False,
+        )
+
+    assert result.stderr == ""
+    assert len(result.stdout.splitlines()) == 8 * 15
+    assert all("JIR003" in line for line in result.stdout.splitlines())
+
+
+def test_scan_cache(mocker, tmp_path):
+    config = f"""
+        [flake8]
+        jira-project-ids = ABC
+        jira-cache-dir={tmp_path}
+    """
+    code = """
+        def main():
+            # TODO ABC-123
+            # FIXME ABC-456
+            # TODO
+            pass
+    """
+    scan_lines = mocker.spy(flake8_jira_todo_checker.Checker, "_scan_lines")
+
+    for _ in range(2):
+        assert set(run_flake8(config, code)) == {
+            "3:7: JIR004 Invalid word used instead of TODO: FIXME ABC-456",
+            "4:7: JIR001 TODO with missing or malformed JIRA card: TODO",
+        }
+    assert scan_lines.call_count == 1
+
+    # Changing the configuration means the file has to be scanned again
+    assert set(run_flake8(config.replace("ABC", "XYZ"), code)) == {
+        "2:7: JIR001 TODO with missing or malformed JIRA card: TODO ABC-123",
+        "3:7: JIR001 TODO with missing or malformed JIRA card: FIXME ABC-456",
+        "3:7: JIR004 Invalid word used instead of TODO: FIXME ABC-456",
+        "4:7: JIR001 TODO with missing or malformed JIRA card: TODO",
+    }
+    assert scan_lines.call_count == 2
+
+
+def test_scan_cache_still_checks_jira(mock_jira_client, tmp_path):
+    config = f"""
+        [flake8]
+        jira-project-ids = ABC
+        jira-server=http://example.example/
+        jira-cookie-username=test
+        jira-cookie-password=test
+        jira-cache-dir={tmp_path}
+        jira-cache-ttl=0
+    """
+    code = """
+        def main():
+            # TODO ABC-123
+            pass
+    """
+
+    mock_jira_client.get_issues.return_value = {"ABC-123": ("In Progress", None)}
+    assert set(run_flake8(config, code)) == set()
+
+    mock_jira_client.get_issues.return_value = {"ABC-123": ("Done", None)}
+    assert set(run_flake8(config, code)) == {
+        "2:7: JIR003 TODO with JIRA card in invalid state (Status=Done): TODO ABC-123"
+    }
+
+
+def test_diff_base(mock_jira_client, tmp_path, monkeypatch):
+    def git(*args):
+        subprocess.run(["git", *args], check=True, stdout=subprocess.DEVNULL)
+
+    monkeypatch.chdir(tmp_path)
+    git("init", "--quiet")
+    git("config", "user.name", "Test")
+    git("config", "user.email", "test@example.com")
+    (tmp_path / "changed.py").write_text("# TODO ABC-1\n# TODO ABC-2\n")
+    (tmp_path / "unchanged.py").write_text("# TODO ABC-3\n")
+    git("add", ".")
+    git("commit", "--quiet", "-m", "Initial commit")
+    (tmp_path / "changed.py").write_text("# TODO ABC-1\n# TODO ABC-20\n# TODO\n")
+
+    config = """
+        [flake8]
+        jira-project-ids = ABC
+        jira-server=http://example.example/
+        jira-cookie-username=test
+        jira-cookie-password=test
+        jira-todo-diff-base=HEAD
+    """
+
+    assert set(run_flake8_on_file(config, "changed.py")) == {
+        "2:3: JIR002 TODO with invalid JIRA card: TODO ABC-20",
+        "3:3: JIR001 TODO with missing or malformed JIRA card: TODO",
+    }
+    mock_jira_client.get_issues.assert_called_once_with({"ABC-20"})
+    assert set(run_flake8_on_file(config, "unchanged.py")) == set()
+    mock_jira_client.get_issues.assert_called_once()
+
+
+def test_diff_base_with_untracked_file(mock_jira_client, tmp_path, monkeypatch):
+    def git(*args):
+        subprocess.run(["git", *args], check=True, stdout=subprocess.DEVNULL)
+
+    monkeypatch.chdir(tmp_path)
+    git("init", "--quiet")
+    git("config", "user.name", "Test")
+    git("config", "user.email", "test@example.com")
+    git("commit", "--quiet", "--allow-empty", "-m", "Initial commit")
+    (tmp_path / "new.py").write_text("x = 1\n# TODO\n")
+
+    config = """
+        [flake8]
+        jira-project-ids = ABC
+        jira-todo-diff-base=HEAD
+    """
+
+    assert set(run_flake8_on_file(config, "new.py")) == {"2:3: JIR001 TODO with missing or malformed JIRA card: TODO"}
+
+
+def test_jira_integration_with_cache_sync(tmp_path):
+    config = f"""
+[flake8]
+select = JIR
+jira-project-ids = ABC
+jira-server = {{url}}
+jira-http-basic-username = test
+jira-http-basic-password = test
+jira-client-backend = asyncio
+jira-cache-dir = {tmp_path / "cache"}
+jira-cache-sync = true
+"""
+    code = "# TODO ABC-1\n# TODO ABC-2\n"
+
+    with running_jira_stub_server({"ABC-1": ("In Progress", None), "ABC-2": ("In Progress", None)}) as jira_server:
+        assert list(run_flake8(config.format(url=jira_server.url), code)) == []
+        # The first run syncs the whole project
+        assert [request["jql"] for request in jira_server.requests] == ["project in (ABC)"]
+
+        jira_server.issues["ABC-2"] = ("Done", None)
+        jira_server.updated_at["ABC-2"] = time.time()
+        assert list(run_flake8(config.format(url=jira_server.url), code)) == [
+            "2:3: JIR003 TODO with JIRA card in invalid state (Status=Done): TODO ABC-2"
+        ]
+        # Later runs only ask for what's changed, and don't look up any issues themselves
+        assert len(jira_server.requests) == 2
+        assert jira_server.requests[1]["jql"].startswith("project in (ABC) AND updated >= -")
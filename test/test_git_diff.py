@@ -0,0 +1,97 @@
+import subprocess
+
+import pytest
+
+from flake8_jira_todo_checker.git_diff import ALL_LINES, changed_lines
+
+
+def _git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), *args], check=True, stdout=subprocess.DEVNULL)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, "init", "--quiet")
+    _git(tmp_path, "config", "user.name", "Test")
+    _git(tmp_path, "config", "user.email", "test@example.com")
+    (tmp_path / "unchanged.py").write_text("a = 1\n")
+    (tmp_path / "changed.py").write_text("a = 1\nb = 2\nc = 3\nd = 4\n")
+    (tmp_path / "deleted.py").write_text("a = 1\n")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "--quiet", "-m", "Initial commit")
+    return tmp_path
+
+
+def test_changed_lines(repo):
+    (repo / "changed.py").write_text("a = 1\nb = 20\nc = 3\nd = 4\ne = 5\nf = 6\n")
+    (repo / "deleted.py").unlink()
+    (repo / "added.py").write_text("x = 1\ny = 2\n")
+    _git(repo, "add", "added.py")
+
+    assert changed_lines("HEAD", cwd=repo) == {
+        str((repo / "changed.py").resolve()): {2, 5, 6},
+        str((repo / "added.py").resolve()): {1, 2},
+    }
+
+
+def test_deleting_lines_changes_nothing(repo):
+    (repo / "changed.py").write_text("a = 1\nd = 4\n")
+
+    assert changed_lines("HEAD", cwd=repo) == {str((repo / "changed.py").resolve()): set()}
+
+
+def test_changed_lines_from_a_subdirectory(repo):
+    (repo / "subdirectory").mkdir()
+    (repo / "subdirectory" / "added.py").write_text("a = 1\n")
+    _git(repo, "add", ".")
+
+    assert changed_lines("HEAD", cwd=repo / "subdirectory") == {
+        str((repo / "subdirectory" / "added.py").resolve()): {1}
+    }
+
+
+def test_untracked_files_are_new_in_full(repo):
+    (repo / "subdirectory").mkdir()
+    (repo / "subdirectory" / "untracked.py").write_text("a = 1\n")
+    (repo / "ignored.py").write_text("a = 1\n")
+    (repo / ".gitignore").write_text("ignored.py\n")
+
+    assert changed_lines("HEAD", cwd=repo / "subdirectory") == {
+        str((repo / "subdirectory" / "untracked.py").resolve()): ALL_LINES,
+        str((repo / ".gitignore").resolve()): ALL_LINES,
+    }
+    assert 1_000_000 in ALL_LINES
+
+
+def test_changes_are_counted_from_the_merge_base(repo):
+    _git(repo, "branch", "main")
+    _git(repo, "checkout", "--quiet", "-b", "feature")
+    (repo / "changed.py").write_text("a = 1\nb = 2\nc = 3\nd = 40\n")
+    _git(repo, "commit", "--quiet", "-am", "Change on the feature branch")
+    _git(repo, "checkout", "--quiet", "main")
+    (repo / "unchanged.py").write_text("a = 10\n")
+    _git(repo, "commit", "--quiet", "-am", "Change on main")
+    _git(repo, "checkout", "--quiet", "feature")
+
+    assert changed_lines("main", cwd=repo) == {str((repo / "changed.py").resolve()): {4}}
+
+
+@pytest.mark.parametrize(
+    "file_name", ["with space.py", 'with "quotes".py', "with\ttab.py", "with\\backslash.py", "ñ.py"]
+)
+def test_unusual_file_names(repo, file_name):
+    (repo / file_name).write_text("a = 1\n")
+    _git(repo, "add", ".")
+
+    assert changed_lines("HEAD", cwd=repo) == {str((repo / file_name).resolve()): {1}}
+
+
+def test_added_lines_which_look_like_headers(repo):
+    (repo / "changed.py").write_text("a = 1\n++ b/unchanged.py\n@@ -1 +1,100 @@\nd = 4\n")
+
+    assert changed_lines("HEAD", cwd=repo) == {str((repo / "changed.py").resolve()): {2, 3}}
+
+
+def test_unknown_diff_base(repo):
+    with pytest.raises(ValueError, match="Unable to run git"):
+        changed_lines("no-such-ref", cwd=repo)
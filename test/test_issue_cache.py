@@ -0,0 +1,158 @@
+import argparse
+
+import pytest
+
+from flake8_jira_todo_checker.issue_cache import IssueCache, issue_cache_from_options
+
+
+@pytest.fixture
+def jira_issues():
+    return {"ABC-1": ("In Progress", None), "ABC-2": ("Done", "Fixed")}
+
+
+def test_fresh_issues_are_not_refetched(tmp_path, clock, jira_client):
+    cache = IssueCache(jira_client, tmp_path, ttl=60, clock=clock)
+
+    assert cache.get_issues({"ABC-1", "ABC-2"}) == {"ABC-1": ("In Progress", None), "ABC-2": ("Done", "Fixed")}
+    clock.now += 59
+    assert cache.get_issues({"ABC-1", "ABC-2"}) == {"ABC-1": ("In Progress", None), "ABC-2": ("Done", "Fixed")}
+
+    jira_client.get_issues.assert_called_once_with({"ABC-1", "ABC-2"})
+
+
+def test_cache_persists_between_instances(tmp_path, clock, jira_client):
+    IssueCache(jira_client, tmp_path, ttl=60, clock=clock).get_issues({"ABC-1"})
+    jira_client.get_issues.reset_mock()
+
+    assert IssueCache(jira_client, tmp_path, ttl=60, clock=clock).get_issues({"ABC-1"}) == {
+        "ABC-1": ("In Progress", None)
+    }
+    jira_client.get_issues.assert_not_called()
+
+
+def test_only_stale_or_missing_issues_are_fetched(tmp_path, clock, jira_client):
+    cache = IssueCache(jira_client, tmp_path, ttl=60, clock=clock)
+    cache.get_issues({"ABC-1"})
+    clock.now += 30
+    cache.get_issues({"ABC-2"})
+    clock.now += 31
+
+    cache.get_issues({"ABC-1", "ABC-2"})
+
+    assert jira_client.get_issues.call_args_list[-1] == (({"ABC-1"},),)
+
+
+def test_missing_issues_are_negatively_cached(tmp_path, clock, jira_client):
+    cache = IssueCache(jira_client, tmp_path, ttl=60, clock=clock)
+
+    assert cache.get_issues({"ABC-3"}) == {}
+    assert cache.get_issues({"ABC-3"}) == {}
+
+    jira_client.get_issues.assert_called_once_with({"ABC-3"})
+
+
+def test_eviction_keeps_most_recent_entries(tmp_path, clock, jira_client):
+    cache = IssueCache(jira_client, tmp_path, ttl=60, max_entries=1, clock=clock)
+    cache.get_issues({"ABC-1"})
+    clock.now += 1
+    cache.get_issues({"ABC-2"})
+    jira_client.get_issues.reset_mock()
+
+    cache.get_issues({"ABC-2"})
+    jira_client.get_issues.assert_not_called()
+    cache.get_issues({"ABC-1"})
+    jira_client.get_issues.assert_called_once_with({"ABC-1"})
+
+
+def test_sync_fetches_every_issue_the_first_time(tmp_path, clock, jira_client):
+    jira_client.search_issues.return_value = {"ABC-1": ("In Progress", None)}
+    cache = IssueCache(jira_client, tmp_path, ttl=60, clock=clock)
+
+    cache.sync(["ABC"])
+
+    jira_client.search_issues.assert_called_once_with("project in (ABC)")
+    assert cache.get_issues({"ABC-1"}) == {"ABC-1": ("In Progress", None)}
+    jira_client.get_issues.assert_not_called()
+
+
+def test_sync_only_fetches_updated_issues(tmp_path, clock, jira_client):
+    jira_client.search_issues.return_value = {}
+    cache = IssueCache(jira_client, tmp_path, ttl=60, clock=clock)
+    cache.sync(["ABC", "DEF"])
+    cache.get_issues({"ABC-1", "ABC-2", "DEF-1"})
+    clock.now += 50
+    jira_client.search_issues.side_effect = lambda jql: {"ABC-2": ("In Progress", None)} if "ABC" in jql else {}
+
+    cache.sync(["ABC", "DEF"])
+
+    assert [call.args[0] for call in jira_client.search_issues.call_args_list[-2:]] == [
+        "project in (ABC) AND updated >= -6m",
+        "project in (DEF) AND updated >= -6m",
+    ]
+    # Everything synced is trusted for another TTL
+    clock.now += 50
+    jira_client.get_issues.reset_mock()
+    assert cache.get_issues({"ABC-1", "ABC-2", "DEF-1"}) == {
+        "ABC-1": ("In Progress", None),
+        "ABC-2": ("In Progress", None),
+    }
+    jira_client.get_issues.assert_not_called()
+
+
+def test_sync_leaves_other_projects_to_expire(tmp_path, clock, jira_client):
+    jira_client.search_issues.return_value = {}
+    cache = IssueCache(jira_client, tmp_path, ttl=60, clock=clock)
+    cache.get_issues({"ABC-1", "ABCD-1"})
+    clock.now += 50
+
+    cache.sync(["ABC"])
+    clock.now += 50
+
+    cache.get_issues({"ABC-1", "ABCD-1"})
+    assert jira_client.get_issues.call_args_list[-1] == (({"ABCD-1"},),)
+
+
+def test_sync_normalises_project_ids(tmp_path, clock, jira_client):
+    jira_client.search_issues.return_value = {}
+    cache = IssueCache(jira_client, tmp_path, ttl=60, clock=clock)
+    cache.get_issues({"ABC-1"})
+    clock.now += 50
+
+    cache.sync(["abc"])
+    clock.now += 50
+
+    jira_client.get_issues.reset_mock()
+    assert cache.get_issues({"ABC-1"}) == {"ABC-1": ("In Progress", None)}
+    jira_client.get_issues.assert_not_called()
+
+
+@pytest.mark.parametrize("sync", [True, False])
+def test_issue_cache_from_options_only_syncs_when_asked(tmp_path, jira_client, sync):
+    jira_client.search_issues.return_value = {}
+    options = argparse.Namespace(
+        jira_cache_dir=str(tmp_path),
+        jira_cache_ttl=60,
+        jira_cache_max_entries=100,
+        jira_cache_sync=True,
+        jira_project_ids=["ABC"],
+    )
+
+    issue_cache_from_options(options, jira_client, sync=sync)
+
+    assert jira_client.search_issues.called == sync
+
+
+def test_updates_and_forgets_issues(tmp_path, clock, jira_client):
+    cache = IssueCache(jira_client, tmp_path, ttl=60, clock=clock)
+    cache.get_issues({"ABC-1", "ABC-2"})
+    jira_client.get_issues.reset_mock()
+
+    cache.update({"ABC-1": ("Done", "Fixed"), "ABC-2": None})
+
+    assert cache.get_issues({"ABC-1", "ABC-2"}) == {"ABC-1": ("Done", "Fixed")}
+    jira_client.get_issues.assert_not_called()
+
+    cache.forget({"ABC-1"})
+
+    assert cache.get_issues({"ABC-1", "ABC-2"}) == {"ABC-1": ("In Progress", None)}
+    jira_client.get_issues.assert_called_once_with({"ABC-1"})
@@ -0,0 +1,72 @@
+import types
+
+import pytest
+
+from flake8_jira_todo_checker.issue_preload import IssuePreload, issue_preload_from_options
+
+
+@pytest.fixture
+def jira_issues():
+    return {"ABC-3": ("Done", "Fixed")}
+
+
+@pytest.fixture
+def jira_search_results():
+    return {"ABC-1": ("In Progress", None), "ABC-2": ("To Do", None)}
+
+
+def _options(**kwargs):
+    return types.SimpleNamespace(**{"jira_preload_open_issues": True, "jira_project_ids": ["ABC", "DEF"], **kwargs})
+
+
+def test_open_issues_are_not_looked_up(jira_client):
+    preload = IssuePreload({"ABC-1": ("In Progress", None)}, jira_client)
+
+    assert preload.get_issues({"ABC-1"}) == {"ABC-1": ("In Progress", None)}
+    jira_client.get_issues.assert_not_called()
+
+
+def test_other_issues_are_looked_up(jira_client):
+    preload = IssuePreload({"ABC-1": ("In Progress", None)}, jira_client)
+
+    assert preload.get_issues({"ABC-1", "ABC-3", "ABC-4"}) == {
+        "ABC-1": ("In Progress", None),
+        "ABC-3": ("Done", "Fixed"),
+    }
+    jira_client.get_issues.assert_called_once_with({"ABC-3", "ABC-4"})
+
+
+def test_from_options_searches_once(jira_client, mocker):
+    fallback_jira_client = mocker.MagicMock()
+
+    preload = issue_preload_from_options(_options(), jira_client, fallback_jira_client)
+
+    jira_client.search_issues.assert_called_once_with("project in (ABC,DEF) AND statusCategory != Done")
+    assert preload.get_issues({"ABC-1", "ABC-2"}) == {"ABC-1": ("In Progress", None), "ABC-2": ("To Do", None)}
+    fallback_jira_client.get_issues.assert_not_called()
+
+
+def test_from_options_when_disabled(jira_client, mocker):
+    fallback_jira_client = mocker.MagicMock()
+
+    assert issue_preload_from_options(_options(jira_preload_open_issues=False), jira_client, fallback_jira_client) is (
+        fallback_jira_client
+    )
+    jira_client.search_issues.assert_not_called()
+
+
+def test_from_options_without_project_ids(jira_client):
+    with pytest.raises(ValueError):
+        issue_preload_from_options(_options(jira_project_ids=None), jira_client, jira_client)
+
+
+def test_updated_and_forgotten_issues_are_passed_on(jira_client):
+    preload = IssuePreload({"ABC-1": ("In Progress", None), "ABC-2": ("To Do", None)}, jira_client)
+
+    preload.update({"ABC-1": ("Done", "Fixed")})
+    preload.forget({"ABC-2"})
+
+    assert preload.get_issues({"ABC-1", "ABC-2"}) == {"ABC-3": ("Done", "Fixed")}
+    jira_client.update.assert_called_once_with({"ABC-1": ("Done", "Fixed")})
+    jira_client.forget.assert_called_once_with({"ABC-2"})
+    jira_client.get_issues.assert_called_once_with({"ABC-1", "ABC-2"})
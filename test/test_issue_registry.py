@@ -0,0 +1,41 @@
+from flake8_jira_todo_checker.issue_registry import IssueRegistry
+
+
+def test_each_issue_is_fetched_once(jira_client):
+    registry = IssueRegistry(jira_client)
+
+    assert registry.get_issues({"ABC-1", "ABC-2"}) == {"ABC-1": ("In Progress", None)}
+    assert registry.get_issues({"ABC-1"}) == {"ABC-1": ("In Progress", None)}
+    assert registry.get_issues({"ABC-2"}) == {}
+
+    jira_client.get_issues.assert_called_once_with({"ABC-1", "ABC-2"})
+    assert (registry.hits, registry.misses) == (2, 2)
+
+
+def test_only_unknown_issues_are_fetched(jira_client):
+    registry = IssueRegistry(jira_client)
+    registry.get_issues({"ABC-1"})
+
+    registry.get_issues({"ABC-1", "ABC-3"})
+
+    assert jira_client.get_issues.call_args_list[-1] == (({"ABC-3"},),)
+    assert (registry.hits, registry.misses) == (1, 2)
+
+
+def test_updates_are_passed_on(jira_client):
+    registry = IssueRegistry(jira_client)
+    registry.get_issues({"ABC-1"})
+
+    registry.update({"ABC-1": ("Done", None), "ABC-2": None})
+
+    assert registry.get_issues({"ABC-1", "ABC-2"}) == {"ABC-1": ("Done", None)}
+    jira_client.update.assert_called_once_with({"ABC-1": ("Done", None), "ABC-2": None})
+    jira_client.get_issues.assert_called_once_with({"ABC-1"})
+
+
+def test_issues_are_forgotten_by_clients_which_cannot_be_updated(mocker):
+    jira_client = mocker.Mock(spec=["get_issues", "forget"])
+
+    IssueRegistry(jira_client).update({"ABC-1": ("Done", None)})
+
+    jira_client.forget.assert_called_once_with({"ABC-1": ("Done", None)}.keys())
@@ -0,0 +1,101 @@
+import base64
+import os
+
+import pytest
+
+from flake8_jira_todo_checker.jira_async_client import AsyncJiraClient, JiraHttpError
+
+from .jira_stub_server import running_jira_stub_server
+
+
+@pytest.fixture
+def jira_server():
+    with running_jira_stub_server({"ABC-1": ("In Progress", None), "ABC-2": ("Done", "Fixed")}) as server:
+        yield server
+
+
+@pytest.fixture
+def client(jira_server):
+    client = AsyncJiraClient(jira_server.url, "user", "password", max_concurrency=4)
+    yield client
+    client.close()
+
+
+def test_get_issues(jira_server, client):
+    assert client.get_issues({"ABC-1", "ABC-2", "ABC-3"}) == {
+        "ABC-1": ("In Progress", None),
+        "ABC-2": ("Done", "Fixed"),
+    }
+    assert jira_server.requests == [
+        {
+            "jql": "issuekey in (abc-1,abc-2,abc-3)",
+            "startAt": 0,
+            "maxResults": 100,
+            "fields": ["status", "resolution"],
+        }
+    ]
+
+
+def test_get_issues_sends_basic_auth(jira_server, client):
+    client.get_issues({"ABC-1"})
+
+    assert jira_server.authorization_headers == [f"Basic {base64.b64encode(b'user:password').decode('ascii')}"]
+
+
+def test_get_issues_runs_batches_concurrently_over_pooled_connections(jira_server, client):
+    jira_server.issues = {f"ABC-{issue_number}": ("To Do", None) for issue_number in range(1000)}
+
+    assert len(client.get_issues(set(jira_server.issues))) == 1000
+    assert len(client.get_issues(set(jira_server.issues))) == 1000
+
+    assert len(jira_server.requests) == 20
+    assert jira_server.connections <= 4
+
+
+def test_get_issues_retries_when_rate_limited(jira_server, client):
+    jira_server.responses_to_rate_limit = 2
+
+    assert client.get_issues({"ABC-1"}) == {"ABC-1": ("In Progress", None)}
+    assert len(jira_server.requests) == 3
+
+
+def test_get_issues_raises_on_http_errors(jira_server):
+    client = AsyncJiraClient(f"{jira_server.url}/not-jira", "user", "password", max_concurrency=1)
+    try:
+        with pytest.raises(JiraHttpError) as exc_info:
+            client.get_issues({"ABC-1"})
+    finally:
+        client.close()
+    assert exc_info.value.status_code == 404
+
+
+def test_search_issues_fetches_every_page(jira_server, client):
+    jira_server.issues = {
+        f"{project}-{issue_number}": ("To Do", None) for project in "AB" for issue_number in range(250)
+    }
+
+    issues = client.search_issues("project in (A)")
+
+    assert issues == {f"A-{issue_number}": ("To Do", None) for issue_number in range(250)}
+    assert sorted(request["startAt"] for request in jira_server.requests) == [0, 100, 200]
+
+
+def test_get_issues_after_fork(jira_server, client):
+    expected = {"ABC-1": ("In Progress", None), "ABC-2": ("Done", "Fixed")}
+    # Leaves an idle connection in the pool, which the children mustn't use
+    assert client.get_issues({"ABC-1", "ABC-2"}) == expected
+
+    child_pids = []
+    for _ in range(2):
+        child_pid = os.fork()
+        if child_pid == 0:
+            try:
+                all_found = all(client.get_issues({"ABC-1", "ABC-2"}) == expected for _ in range(20))
+                os._exit(0 if all_found else 1)
+            except BaseException:
+                os._exit(2)
+        child_pids.append(child_pid)
+
+    for _ in range(20):
+        assert client.get_issues({"ABC-1", "ABC-2"}) == expected
+    assert [os.waitpid(child_pid, 0)[1] for child_pid in child_pids] == [0, 0]
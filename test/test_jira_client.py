@@ -0,0 +1,102 @@
+import argparse
+
+import jira
+import pytest
+
+from flake8_jira_todo_checker.jira_client import JiraClient, jira_client_from_options
+
+
+def _fake_issue(key, status, resolution=None):
+    return {
+        "key": key,
+        "fields": {"status": {"name": status}, "resolution": {"name": resolution} if resolution else None},
+    }
+
+
+def _fake_search_result(issues):
+    return {"startAt": 0, "maxResults": 100, "total": len(issues), "issues": issues}
+
+
+def _fake_search_issues(jql, startAt, maxResults, fields, json_result):
+    keys = jql[len("issuekey in (") : -1].split(",")
+    return _fake_search_result([_fake_issue(key.upper(), "In Progress") for key in keys])
+
+
+@pytest.fixture
+def jira_api(mocker):
+    jira_api = mocker.MagicMock()
+    jira_api.search_issues.side_effect = _fake_search_issues
+    return jira_api
+
+
+def test_get_issues_single_batch(jira_api):
+    jira_api.search_issues.side_effect = None
+    jira_api.search_issues.return_value = _fake_search_result(
+        [_fake_issue("ABC-1", "Done", "Fixed"), _fake_issue("ABC-2", "To Do")]
+    )
+
+    assert JiraClient(jira_api).get_issues({"ABC-1", "ABC-2", "ABC-3"}) == {
+        "ABC-1": ("Done", "Fixed"),
+        "ABC-2": ("To Do", None),
+    }
+    jira_api.search_issues.assert_called_once_with(
+        "issuekey in (abc-1,abc-2,abc-3)", startAt=0, maxResults=100, fields=["status", "resolution"], json_result=True
+    )
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 4])
+def test_get_issues_splits_into_batches(jira_api, max_concurrency):
+    issue_ids = {f"ABC-{issue_number}" for issue_number in range(250)}
+
+    issues = JiraClient(jira_api, max_concurrency=max_concurrency).get_issues(issue_ids)
+
+    assert issues == {issue_id: ("In Progress", None) for issue_id in issue_ids}
+    assert jira_api.search_issues.call_count == 3
+
+
+def test_get_issues_retries_when_rate_limited(jira_api, mocker):
+    sleep = mocker.patch("time.sleep")
+    rate_limited = jira.JIRAError(status_code=429)
+    jira_api.search_issues.side_effect = [
+        rate_limited,
+        rate_limited,
+        _fake_search_result([_fake_issue("ABC-1", "To Do")]),
+    ]
+
+    assert JiraClient(jira_api).get_issues({"ABC-1"}) == {"ABC-1": ("To Do", None)}
+    assert [call[0][0] for call in sleep.call_args_list] == [1, 2]
+
+
+def test_get_issues_does_not_retry_other_errors(jira_api):
+    jira_api.search_issues.side_effect = jira.JIRAError(status_code=500)
+
+    with pytest.raises(jira.JIRAError):
+        JiraClient(jira_api).get_issues({"ABC-1"})
+    assert jira_api.search_issues.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "jira_timeout, jira_time_budget, expected_timeout", [(None, None, None), (5, 60, 5), (None, 60, 60), (5, None, 5)]
+)
+def test_timeout_defaults_to_time_budget(mocker, jira_timeout, jira_time_budget, expected_timeout):
+    jira_constructor = mocker.patch("jira.JIRA")
+    options = argparse.Namespace(
+        jira_server="http://example.example/",
+        jira_cookie_username=None,
+        jira_cookie_password=None,
+        jira_http_basic_username="test",
+        jira_http_basic_password="test",
+        jira_oauth_access_token=None,
+        jira_oauth_access_token_secret=None,
+        jira_oauth_consumer_key=None,
+        jira_oauth_key_cert_file=None,
+        jira_kerberos=False,
+        jira_max_concurrency=4,
+        jira_timeout=jira_timeout,
+        jira_time_budget=jira_time_budget,
+        jira_client_backend="jira",
+    )
+
+    jira_client_from_options(options)
+
+    assert jira_constructor.call_args[1]["timeout"] == expected_timeout
@@ -0,0 +1,133 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from flake8_jira_todo_checker.jira_guard import JiraGuard, JiraUnavailable
+
+from .jira_stub_server import running_jira_stub_server
+
+
+def test_passes_through(jira_client):
+    guard = JiraGuard(jira_client, time_budget=10)
+
+    assert guard.get_issues({"ABC-1"}) == {"ABC-1": ("In Progress", None)}
+    jira_client.get_issues.assert_called_once_with({"ABC-1"})
+
+
+def test_gives_up_on_hanging_requests(jira_client):
+    release = threading.Event()
+    jira_client.get_issues.side_effect = lambda issue_ids: release.wait()
+    guard = JiraGuard(jira_client, time_budget=0.1)
+
+    start = time.monotonic()
+    with pytest.raises(JiraUnavailable):
+        guard.get_issues({"ABC-1"})
+    assert time.monotonic() - start < 1
+
+    # The budget's used up, so JIRA isn't called again
+    with pytest.raises(JiraUnavailable):
+        guard.get_issues({"ABC-2"})
+    assert jira_client.get_issues.call_count == 1
+    release.set()
+
+
+def test_stops_after_repeated_failures(jira_client):
+    jira_client.get_issues.side_effect = ConnectionError("Connection refused")
+    guard = JiraGuard(jira_client)
+
+    for _ in range(4):
+        with pytest.raises(JiraUnavailable):
+            guard.get_issues({"ABC-1"})
+
+    assert jira_client.get_issues.call_count == 3
+
+
+def test_successes_reset_failures(jira_client):
+    jira_client.get_issues.side_effect = [ConnectionError(), ConnectionError(), {}, ConnectionError(), {}]
+    guard = JiraGuard(jira_client)
+
+    for expected_to_fail in (True, True, False, True, False):
+        if expected_to_fail:
+            with pytest.raises(JiraUnavailable):
+                guard.get_issues({"ABC-1"})
+        else:
+            assert guard.get_issues({"ABC-1"}) == {}
+
+
+def test_warns_once(jira_client, caplog):
+    jira_client.get_issues.side_effect = ConnectionError("Connection refused")
+    guard = JiraGuard(jira_client)
+
+    for _ in range(5):
+        with pytest.raises(JiraUnavailable):
+            guard.get_issues({"ABC-1"})
+
+    assert [record.getMessage() for record in caplog.records if record.levelname == "WARNING"] == [
+        "Unable to check some TODOs against JIRA, as JIRA failed with ConnectionError: Connection refused"
+    ]
+
+
+def test_gives_up_on_hanging_jira_without_waiting_for_its_threads():
+    # Several batches are looked up at once, in threads which are still waiting on JIRA when the guard gives up
+    script = """
+import sys
+import jira
+from flake8_jira_todo_checker.jira_client import JiraClient
+from flake8_jira_todo_checker.jira_guard import JiraGuard, JiraUnavailable
+
+guard = JiraGuard(JiraClient(jira.JIRA(server=sys.argv[1], basic_auth=("test", "test")), max_concurrency=4), 0.5)
+try:
+    guard.get_issues({f"ABC-{issue_number}" for issue_number in range(300)})
+except JiraUnavailable:
+    sys.exit(0)
+sys.exit(1)
+"""
+    with running_jira_stub_server({}) as jira_server:
+        jira_server.delay_seconds = 10
+        start = time.monotonic()
+        result = subprocess.run([sys.executable, "-c", script, jira_server.url], check=False)
+        elapsed = time.monotonic() - start
+
+    assert result.returncode == 0
+    assert elapsed < 5
+
+
+@pytest.mark.parametrize("backend", ["jira", "asyncio"])
+def test_flake8_with_slow_jira(tmp_path, backend):
+    for file_number in range(4):
+        (tmp_path / f"file_{file_number}.py").write_text("# TODO ABC-1\n# FIXME ABC-2\n")
+
+    with running_jira_stub_server({"ABC-1": ("Done", None)}) as jira_server:
+        jira_server.delay_seconds = 10
+        start = time.monotonic()
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "flake8",
+                "--isolated",
+                "--select=JIR",
+                "--jobs=1",
+                "--jira-project-ids=ABC",
+                f"--jira-server={jira_server.url}",
+                "--jira-http-basic-username=test",
+                "--jira-http-basic-password=test",
+                f"--jira-client-backend={backend}",
+                "--jira-time-budget=0.5",
+                str(tmp_path),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=False,
+        )
+        elapsed = time.monotonic() - start
+
+    assert elapsed < 5
+    # Only the checks which don't need JIRA
+    assert len(result.stdout.splitlines()) == 4
+    assert all("JIR004" in line for line in result.stdout.splitlines())
+    assert result.stderr.count("Unable to check some TODOs against JIRA") == 1
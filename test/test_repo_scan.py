@@ -0,0 +1,129 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from flake8_jira_todo_checker import repo_scan
+from flake8_jira_todo_checker.repo_scan import RepoScanner, find_files, main
+
+
+@pytest.fixture
+def scanner():
+    return RepoScanner(["ABC"], ["TODO"], ["FIXME", "QQ"])
+
+
+def test_scans_any_text_file(tmp_path, scanner):
+    (tmp_path / "a.js").write_text("let x = 1;\n// todo: no issue\nlet y; // TODO ABC-3\n")
+
+    assert scanner.scan_file(str(tmp_path / "a.js")) == [
+        {
+            "path": str(tmp_path / "a.js"),
+            "line": 2,
+            "column": 4,
+            "todo_word": "todo",
+            "jira_issue": None,
+            "errors": [
+                "JIR004 Invalid word used instead of TODO: todo: no issue",
+                "JIR001 TODO with missing or malformed JIRA card: todo: no issue",
+            ],
+        },
+        {
+            "path": str(tmp_path / "a.js"),
+            "line": 3,
+            "column": 11,
+            "todo_word": "TODO",
+            "jira_issue": "ABC-3",
+            "errors": [],
+        },
+    ]
+
+
+def test_skips_binary_and_empty_files(tmp_path, scanner):
+    (tmp_path / "a.bin").write_bytes(b"\0\1 TODO ABC-1\n")
+    (tmp_path / "b.txt").write_bytes(b"")
+
+    assert scanner.scan_file(str(tmp_path / "a.bin")) == []
+    assert scanner.scan_file(str(tmp_path / "b.txt")) == []
+
+
+def test_finds_the_same_todos_as_flake8(tmp_path, scanner):
+    lines = [
+        "x = 1  # TODO ABC-1 something\n",
+        "# FIXME abc-2\n",
+        "TODO = 'at the start of the line'\n",
+        "y = 'todo'  # QQ\n",
+        "# TODO ABC-12345TODO ABC-1 twice\n",
+        "# Ünïcödé TODO ABC-4 ✓\n",
+        "# mastodon, TODOs and todoist aren't TODOs\n",
+        "    # TODO: ABC-5\r\n",
+        "# TODO ABC-6",
+    ]
+    (tmp_path / "a.py").write_bytes("".join(lines).encode("utf-8"))
+
+    flake8 = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "flake8",
+            "--isolated",
+            "--select=JIR",
+            "--jira-project-ids=ABC",
+            str(tmp_path / "a.py"),
+        ],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=False,
+    )
+
+    assert sorted(
+        f"{result['path']}:{result['line']}:{result['column']}: {error}"
+        for result in scanner.scan_file(str(tmp_path / "a.py"))
+        for error in result["errors"]
+    ) == sorted(flake8.stdout.splitlines())
+
+
+@pytest.mark.parametrize("window_bytes", [1, 3, 7, 64])
+def test_finds_todos_across_windows(tmp_path, scanner, monkeypatch, window_bytes):
+    contents = "x = 1  # TODO ABC-1\n# fixme ABC-2 QQ\n\n# todo\n" * 20 + "# TODO ABC-3"
+    (tmp_path / "a.txt").write_text(contents)
+    expected = scanner.scan_file(str(tmp_path / "a.txt"))
+    monkeypatch.setattr(repo_scan, "_WINDOW_BYTES", window_bytes)
+
+    assert scanner.scan_file(str(tmp_path / "a.txt")) == expected
+    assert len(expected) == 61
+
+
+def test_find_files_honours_gitignore(tmp_path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    (tmp_path / ".gitignore").write_text("build/\n*.log\n")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "a.py").write_text("# TODO\n")
+    (tmp_path / "b.log").write_text("# TODO\n")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "c.md").write_text("TODO\n")
+
+    assert sorted(find_files(str(tmp_path))) == [str(tmp_path / ".gitignore"), str(tmp_path / "src" / "c.md")]
+
+
+def test_find_files_outside_git(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "b.sql").write_text("-- TODO\n")
+
+    # tmp_path itself mustn't be inside a git repository for this to mean anything
+    if subprocess.run(["git", "rev-parse"], cwd=str(tmp_path), stderr=subprocess.DEVNULL).returncode == 0:
+        pytest.skip("tmp_path is inside a git repository")
+    assert find_files(str(tmp_path)) == [str(tmp_path / "a" / "b.sql")]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_main(tmp_path, capsys, jobs):
+    for file_number in range(200):
+        (tmp_path / f"file_{file_number}.yaml").write_text(f"key: value  # TODO ABC-{file_number}\n# FIXME\n")
+
+    assert main(["--jira-project-ids=ABC", f"--jobs={jobs}", str(tmp_path)]) == 1
+
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(results) == 400
+    assert {result["jira_issue"] for result in results} == {None, *(f"ABC-{number}" for number in range(200))}
+    assert sum(1 for result in results if result["errors"]) == 200
@@ -0,0 +1,55 @@
+import pytest
+
+from flake8_jira_todo_checker.scan_cache import ScanCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_missing_files_are_not_found(tmp_path, clock):
+    cache = ScanCache(tmp_path, {"scan_mode": "lines"}, clock=clock)
+
+    assert cache.get(cache.key(["# TODO\n"])) is None
+
+
+def test_results_persist_between_instances(tmp_path, clock):
+    cache = ScanCache(tmp_path, {"scan_mode": "lines"}, clock=clock)
+    cache.put(cache.key(["# TODO\n"]), [["error", 1, 2, "JIR001"]])
+    cache.close()
+
+    cache = ScanCache(tmp_path, {"scan_mode": "lines"}, clock=clock)
+    assert cache.get(cache.key(["# TODO\n"])) == [["error", 1, 2, "JIR001"]]
+
+
+def test_key_depends_on_contents_and_config(tmp_path, clock):
+    cache = ScanCache(tmp_path, {"scan_mode": "lines"}, clock=clock)
+    other_config_cache = ScanCache(tmp_path, {"scan_mode": "buffer"}, clock=clock)
+
+    assert cache.key(["# TODO\n"]) == cache.key(["# TO", "DO\n"])
+    assert cache.key(["# TODO\n"]) != cache.key(["# FIXME\n"])
+    assert cache.key(["# TODO\n"]) != other_config_cache.key(["# TODO\n"])
+
+
+def test_least_recently_used_files_are_evicted(tmp_path, clock):
+    cache = ScanCache(tmp_path, {}, max_entries=2, clock=clock)
+    for key in ["a", "b", "c"]:
+        cache.put(key, [])
+    cache.get("a")
+    cache.close()
+
+    cache = ScanCache(tmp_path, {}, max_entries=2, clock=clock)
+
+    assert cache.get("a") == []
+    assert cache.get("b") is None
+    assert cache.get("c") == []
@@ -0,0 +1,105 @@
+import multiprocessing
+import subprocess
+import sys
+import time
+
+import pytest
+
+from flake8_jira_todo_checker.shared_issue_cache import SharedIssueCache
+
+from .jira_stub_server import running_jira_stub_server
+
+
+class SlowJiraClient:
+    # Records every issue it's asked for in a file, so that we can see what forked processes fetched
+
+    def __init__(self, log_path):
+        self._log_path = log_path
+
+    def get_issues(self, issue_ids):
+        with open(self._log_path, "a") as f:
+            f.writelines(f"{issue_id}\n" for issue_id in issue_ids)
+        time.sleep(0.2)
+        return {issue_id: ("In Progress", None) for issue_id in issue_ids if issue_id != "ABC-0"}
+
+
+_shared_issue_cache = None
+
+
+def _get_issues_in_worker(issue_ids):
+    return _shared_issue_cache.get_issues(issue_ids)
+
+
+def test_issues_are_fetched_once(tmp_path, jira_client):
+    cache = SharedIssueCache(jira_client, tmp_path / "issues.sqlite")
+
+    assert cache.get_issues({"ABC-1", "ABC-2"}) == {"ABC-1": ("In Progress", None)}
+    assert cache.get_issues({"ABC-1", "ABC-2"}) == {"ABC-1": ("In Progress", None)}
+
+    jira_client.get_issues.assert_called_once_with({"ABC-1", "ABC-2"})
+
+
+def test_claims_are_released_on_error(tmp_path, jira_client):
+    cache = SharedIssueCache(jira_client, tmp_path / "issues.sqlite")
+    jira_client.get_issues.side_effect = RuntimeError()
+    with pytest.raises(RuntimeError):
+        cache.get_issues({"ABC-1"})
+
+    jira_client.get_issues.side_effect = None
+
+    assert cache.get_issues({"ABC-1"}) == {"ABC-1": ("In Progress", None)}
+
+
+def test_abandoned_claims_expire(tmp_path, clock, jira_client):
+    cache = SharedIssueCache(jira_client, tmp_path / "issues.sqlite", clock=clock)
+    # Claimed by someone who never fetched it
+    assert cache._find_or_claim({"ABC-1"}) == ({}, {"ABC-1"})
+    assert cache._find_or_claim({"ABC-1"}) == ({}, set())
+
+    clock.now += 301
+
+    assert cache.get_issues({"ABC-1"}) == {"ABC-1": ("In Progress", None)}
+
+
+def test_processes_share_issues(tmp_path):
+    global _shared_issue_cache
+    _shared_issue_cache = SharedIssueCache(SlowJiraClient(tmp_path / "fetched"), tmp_path / "issues.sqlite")
+    issue_ids = {f"ABC-{issue_number}" for issue_number in range(10)}
+
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        results = pool.map(_get_issues_in_worker, [issue_ids] * 8, chunksize=1)
+
+    assert all(result == {issue_id: ("In Progress", None) for issue_id in issue_ids - {"ABC-0"}} for result in results)
+    assert sorted((tmp_path / "fetched").read_text().splitlines()) == sorted(issue_ids)
+
+
+def test_flake8_with_jobs(tmp_path):
+    for file_number in range(8):
+        (tmp_path / f"file_{file_number}.py").write_text(
+            "".join(f"# TODO ABC-{issue_number}\n" for issue_number in range(20))
+        )
+
+    with running_jira_stub_server({f"ABC-{issue_number}": ("In Progress", None) for issue_number in range(20)}) as jira:
+        jira.delay_seconds = 0.2
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "flake8",
+                "--isolated",
+                "--select=JIR",
+                "--jobs=4",
+                "--jira-project-ids=ABC",
+                f"--jira-server={jira.url}",
+                "--jira-http-basic-username=test",
+                "--jira-http-basic-password=test",
+                "--jira-client-backend=asyncio",
+                str(tmp_path),
+            ],
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=False,
+        )
+
+    assert result.returncode == 0, result.stdout
+    assert len(jira.requests) == 1
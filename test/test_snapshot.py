@@ -0,0 +1,28 @@
+import pytest
+
+from flake8_jira_todo_checker.snapshot import IssueSnapshot, write_snapshot
+
+
+def test_snapshot_round_trip(tmp_path):
+    issues = {f"ABC-{issue_number}": ("In Progress", None) for issue_number in range(1000)}
+    issues["ABC-7"] = ("Done", "Won't Do")
+    issues["DEF-1"] = ("To Do", None)
+    write_snapshot(tmp_path / "snapshot", issues)
+
+    snapshot = IssueSnapshot(tmp_path / "snapshot")
+
+    assert snapshot.get_issues(set(issues)) == issues
+    assert snapshot.get_issues({"ABC-1000", "AAA-1", "ZZZ-1", "ABC-", "ABC-10000"}) == {}
+
+
+def test_empty_snapshot(tmp_path):
+    write_snapshot(tmp_path / "snapshot", {})
+
+    assert IssueSnapshot(tmp_path / "snapshot").get_issues({"ABC-1"}) == {}
+
+
+def test_not_a_snapshot(tmp_path):
+    (tmp_path / "snapshot").write_text("ABC-1\tDone\t\n")
+
+    with pytest.raises(ValueError):
+        IssueSnapshot(tmp_path / "snapshot")
@@ -0,0 +1,48 @@
+import pytest
+
+from flake8_jira_todo_checker import sqlite_connection
+from flake8_jira_todo_checker.sqlite_connection import (
+    ProcessLocalConnection,
+    chunks,
+    connect,
+    placeholders,
+    transaction,
+)
+
+
+def test_chunks():
+    keys = {f"ABC-{issue_number:04}" for issue_number in range(1200)}
+
+    assert [len(chunk) for chunk in chunks(keys)] == [500, 500, 200]
+    assert [key for chunk in chunks(keys) for key in chunk] == sorted(keys)
+    assert list(chunks(set())) == []
+    assert placeholders(["ABC-1", "ABC-2"]) == "?,?"
+
+
+def test_transaction_rolls_back_on_error(tmp_path):
+    connection = connect(tmp_path / "test.sqlite")
+    connection.execute("CREATE TABLE t (x INTEGER)")
+
+    with transaction(connection):
+        connection.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(ValueError):
+        with transaction(connection, "IMMEDIATE"):
+            connection.execute("INSERT INTO t VALUES (2)")
+            raise ValueError()
+
+    assert connection.execute("SELECT x FROM t").fetchall() == [(1,)]
+
+
+def test_process_local_connection(tmp_path, mocker):
+    on_connect = mocker.Mock()
+    connection = ProcessLocalConnection(tmp_path / "test.sqlite", on_connect)
+
+    first = connection.get()
+    assert connection.get() is first
+    on_connect.assert_called_once_with(first)
+
+    # As if flake8 had forked a worker
+    mocker.patch.object(sqlite_connection.os, "getpid", return_value=-1)
+    assert connection.get() is not first
+    assert on_connect.call_count == 2
+    connection.close()
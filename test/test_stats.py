@@ -0,0 +1,109 @@
+import json
+import multiprocessing
+import subprocess
+import sys
+
+from flake8_jira_todo_checker.stats import RunStats
+
+from .jira_stub_server import running_jira_stub_server
+
+_worker_stats = None
+
+
+def _count_in_worker(lines):
+    _worker_stats.count(files_checked=1, lines_checked=lines)
+    _worker_stats.record_jira_query(0.02, bytes_received=100)
+    return lines
+
+
+def test_report(tmp_path):
+    stats = RunStats(json_path=tmp_path / "stats.json")
+    stats.count(files_checked=1, lines_checked=10)
+    stats.count(files_checked=1, lines_checked=5, todo_matches=2)
+    stats.record_jira_query(0.005, bytes_received=300)
+    stats.record_jira_query(20, bytes_received=200)
+
+    stats.report()
+
+    result = json.loads((tmp_path / "stats.json").read_text())
+    assert result["counters"] == {
+        "files_checked": 2,
+        "lines_checked": 15,
+        "todo_matches": 2,
+        "jira_queries": 2,
+        "jira_query_seconds": 20.005,
+        "jira_bytes_received": 500,
+    }
+    assert result["jira_query_latency_histogram"]["0.01"] == 1
+    assert result["jira_query_latency_histogram"]["+Inf"] == 1
+    assert sum(result["jira_query_latency_histogram"].values()) == 2
+
+
+def test_report_adds_up_workers(tmp_path):
+    global _worker_stats
+    _worker_stats = RunStats(json_path=tmp_path / "stats.json")
+    # Anything counted before forking is only reported once, by the parent
+    _worker_stats.count(files_checked=1, lines_checked=1)
+
+    with multiprocessing.get_context("fork").Pool(2) as pool:
+        assert sum(pool.map(_count_in_worker, [10, 20, 30, 40], chunksize=1)) == 100
+        pool.close()
+        pool.join()
+    _worker_stats.report()
+
+    result = json.loads((tmp_path / "stats.json").read_text())
+    assert result["counters"]["files_checked"] == 5
+    assert result["counters"]["lines_checked"] == 101
+    assert result["counters"]["jira_bytes_received"] == 400
+    assert result["jira_query_latency_histogram"]["0.025"] == 4
+
+
+def test_report_is_only_written_once(tmp_path):
+    stats = RunStats(json_path=tmp_path / "stats.json")
+    stats.report()
+    (tmp_path / "stats.json").unlink()
+
+    stats.report()
+
+    assert not (tmp_path / "stats.json").exists()
+
+
+def test_flake8_with_jobs(tmp_path):
+    for file_number in range(4):
+        (tmp_path / f"file_{file_number}.py").write_text(
+            "".join(f"# TODO ABC-{issue_number}\n" for issue_number in range(file_number * 10, file_number * 10 + 10))
+        )
+
+    with running_jira_stub_server({"ABC-1": ("In Progress", None)}) as jira_server:
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "flake8",
+                "--isolated",
+                "--select=JIR",
+                "--jobs=2",
+                "--jira-project-ids=ABC",
+                f"--jira-server={jira_server.url}",
+                "--jira-http-basic-username=test",
+                "--jira-http-basic-password=test",
+                "--jira-client-backend=asyncio",
+                "--jira-todo-stats",
+                f"--jira-todo-stats-file={tmp_path / 'stats.json'}",
+                str(tmp_path),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=False,
+        )
+
+    assert len(result.stdout.splitlines()) == 39
+    assert "flake8-jira-todo-checker stats:" in result.stderr
+    assert "Files checked: 4 (40 lines), 0 skipped as unchanged" in result.stderr
+    counters = json.loads((tmp_path / "stats.json").read_text())["counters"]
+    assert counters["files_checked"] == 4
+    assert counters["todo_matches"] == 40
+    assert counters["jira_keys_queried"] == 40
+    assert counters["jira_queries"] == len(jira_server.requests)
+    assert counters["jira_bytes_received"] > 0
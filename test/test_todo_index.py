@@ -0,0 +1,74 @@
+from flake8_jira_todo_checker.checker import TodoDetail
+from flake8_jira_todo_checker.todo_index import TodoIndex
+
+
+def _todo_detail(jira_issue, line_number, todo_word="TODO"):
+    return TodoDetail(todo_word=todo_word, jira_issue=jira_issue, line_number=line_number, start_of_match=2)
+
+
+def test_find(tmp_path):
+    todo_index = TodoIndex(tmp_path / "index.sqlite", {})
+    todo_index.update_file("b.py", "1", [_todo_detail("ABC-1", 3), _todo_detail("ABC-2", 4, "FIXME")])
+    todo_index.update_file("a.py", "2", [_todo_detail("ABC-1", 7)])
+
+    assert todo_index.find({"ABC-1", "ABC-2", "ABC-3"}) == [
+        ("a.py", 7, 2, "TODO", "ABC-1"),
+        ("b.py", 3, 2, "TODO", "ABC-1"),
+        ("b.py", 4, 2, "FIXME", "ABC-2"),
+    ]
+    assert todo_index.find(set()) == []
+
+
+def test_find_many_issues(tmp_path):
+    todo_index = TodoIndex(tmp_path / "index.sqlite", {})
+    todo_index.update_file("a.py", "1", [_todo_detail(f"ABC-{number}", number) for number in range(1, 1201)])
+
+    assert len(todo_index.find({f"ABC-{number}" for number in range(1, 2001)})) == 1200
+
+
+def test_update_file_replaces_its_todos(tmp_path):
+    todo_index = TodoIndex(tmp_path / "index.sqlite", {})
+    todo_index.update_file("a.py", "1", [_todo_detail("ABC-1", 1)])
+    todo_index.update_file("a.py", "2", [_todo_detail("ABC-2", 1)])
+
+    assert todo_index.find({"ABC-1"}) == []
+    assert todo_index.find({"ABC-2"}) == [("a.py", 1, 2, "TODO", "ABC-2")]
+
+
+def test_persists(tmp_path):
+    todo_index = TodoIndex(tmp_path / "index.sqlite", {})
+    todo_index.update_file("a.py", "1", [_todo_detail("ABC-1", 1)])
+    todo_index.close()
+
+    todo_index = TodoIndex(tmp_path / "index.sqlite", {})
+    assert todo_index.is_current("a.py", "1")
+    assert todo_index.find({"ABC-1"}) == [("a.py", 1, 2, "TODO", "ABC-1")]
+
+
+def test_is_current(tmp_path):
+    todo_index = TodoIndex(tmp_path / "index.sqlite", {})
+    content_hash = todo_index.content_hash(["# TODO ABC-1\n"])
+    todo_index.update_file("a.py", content_hash, [])
+
+    assert todo_index.is_current("a.py", todo_index.content_hash(["# TODO ABC-1\n"]))
+    assert not todo_index.is_current("a.py", todo_index.content_hash(["# TODO ABC-2\n"]))
+    assert not todo_index.is_current("b.py", content_hash)
+
+
+def test_config_changes_content_hash(tmp_path):
+    lines = ["# TODO ABC-1\n"]
+    content_hash = TodoIndex(tmp_path / "index.sqlite", {"jira_project_ids": ["ABC"]}).content_hash(lines)
+
+    assert TodoIndex(tmp_path / "index.sqlite", {"jira_project_ids": ["ABC"]}).content_hash(lines) == content_hash
+    assert TodoIndex(tmp_path / "index.sqlite", {"jira_project_ids": ["XYZ"]}).content_hash(lines) != content_hash
+
+
+def test_remove_missing_files(tmp_path):
+    (tmp_path / "a.py").write_text("")
+    todo_index = TodoIndex(tmp_path / "index.sqlite", {})
+    todo_index.update_file(str(tmp_path / "a.py"), "1", [_todo_detail("ABC-1", 1)])
+    todo_index.update_file(str(tmp_path / "b.py"), "2", [_todo_detail("ABC-1", 2)])
+
+    assert todo_index.remove_missing_files() == 1
+    assert todo_index.find({"ABC-1"}) == [(str(tmp_path / "a.py"), 1, 2, "TODO", "ABC-1")]
+    assert not todo_index.is_current(str(tmp_path / "b.py"), "2")
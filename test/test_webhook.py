@@ -0,0 +1,148 @@
+import hashlib
+import hmac
+import json
+import pathlib
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+from flake8_jira_todo_checker.daemon import DaemonClient
+from flake8_jira_todo_checker.issue_cache import IssueCache
+from flake8_jira_todo_checker.webhook import WebhookServer, issues_from_webhook, moved_issue_ids
+
+from .test_daemon import running_daemon
+
+_FIXTURES_DIRECTORY = pathlib.Path(__file__).parent / "fixtures"
+_SECRET = "correct horse battery staple"
+
+
+def _fixture(name):
+    return json.loads((_FIXTURES_DIRECTORY / name).read_text())
+
+
+def _post(server, payload, query=f"?token={urllib.parse.quote(_SECRET)}", headers=None):
+    request = urllib.request.Request(
+        f"http://{server.server_address[0]}:{server.server_address[1]}/{query}",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json", **(headers or {})},
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.status
+
+
+@pytest.fixture
+def webhook_server():
+    received = []
+    server = WebhookServer(("127.0.0.1", 0), _SECRET, lambda *args: received.append(args))
+    thread = server.start()
+    server.received = received
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_issues_from_webhook():
+    assert issues_from_webhook(_fixture("jira_webhook_issue_updated.json")) == {"ABC-123": ("Done", "Done")}
+    assert issues_from_webhook(_fixture("jira_webhook_issue_deleted.json")) == {"ABC-124": None}
+    assert issues_from_webhook({"webhookEvent": "comment_created", "comment": {}}) == {}
+
+
+def test_moved_issue_ids():
+    assert moved_issue_ids(_fixture("jira_webhook_issue_moved.json")) == {"ABC-123"}
+    assert moved_issue_ids(_fixture("jira_webhook_issue_updated.json")) == set()
+    assert moved_issue_ids(_fixture("jira_webhook_issue_deleted.json")) == set()
+
+
+def test_receives_webhooks(webhook_server):
+    assert _post(webhook_server, _fixture("jira_webhook_issue_updated.json")) == 204
+    assert _post(webhook_server, _fixture("jira_webhook_issue_deleted.json")) == 204
+    assert _post(webhook_server, {"webhookEvent": "comment_created", "comment": {}}) == 204
+
+    assert _post(webhook_server, _fixture("jira_webhook_issue_moved.json")) == 204
+
+    assert webhook_server.received == [
+        ({"ABC-123": ("Done", "Done")}, set()),
+        ({"ABC-124": None}, set()),
+        ({"XYZ-7": ("Done", "Done")}, {"ABC-123"}),
+    ]
+
+
+def test_accepts_signed_webhooks(webhook_server):
+    payload = _fixture("jira_webhook_issue_deleted.json")
+    signature = hmac.new(_SECRET.encode("utf-8"), json.dumps(payload).encode("utf-8"), hashlib.sha256).hexdigest()
+
+    assert _post(webhook_server, payload, query="", headers={"X-Hub-Signature": f"sha256={signature}"}) == 204
+    assert webhook_server.received == [({"ABC-124": None}, set())]
+
+
+@pytest.mark.parametrize(
+    "query, headers",
+    [
+        ("", {}),
+        ("?token=wrong", {}),
+        ("", {"X-Hub-Signature": "sha256=0123456789abcdef"}),
+    ],
+)
+def test_rejects_webhooks_without_the_secret(webhook_server, query, headers):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _post(webhook_server, _fixture("jira_webhook_issue_deleted.json"), query=query, headers=headers)
+
+    assert e.value.code == 403
+    assert webhook_server.received == []
+
+
+def test_needs_a_secret():
+    with pytest.raises(ValueError, match="secret"):
+        WebhookServer(("127.0.0.1", 0), None, lambda *args: None)
+
+
+def test_rejects_invalid_webhooks(webhook_server):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _post(webhook_server, {"webhookEvent": "jira:issue_updated"})
+
+    assert e.value.code == 400
+    assert webhook_server.received == []
+
+
+def test_daemon_trusts_issues_until_told_they_have_changed(tmp_path, mocker):
+    jira_client = mocker.MagicMock()
+    jira_client.get_issues.return_value = {"ABC-123": ("In Progress", None), "ABC-124": ("To Do", None)}
+    now = [0]
+    with running_daemon(tmp_path / "d.sock", jira_client, ttl=None, clock=lambda: now[0]) as daemon_server:
+        daemon_client = DaemonClient(tmp_path / "d.sock", "http://example.example/")
+        daemon_client.get_issues({"ABC-123", "ABC-124"})
+        now[0] = 10 ** 6
+
+        webhook_server = WebhookServer(("127.0.0.1", 0), _SECRET, daemon_server.update_issues)
+        thread = webhook_server.start()
+        try:
+            _post(webhook_server, _fixture("jira_webhook_issue_updated.json"))
+            _post(webhook_server, _fixture("jira_webhook_issue_deleted.json"))
+        finally:
+            webhook_server.shutdown()
+            webhook_server.server_close()
+            thread.join()
+
+        assert daemon_client.get_issues({"ABC-123", "ABC-124"}) == {"ABC-123": ("Done", "Done")}
+
+    jira_client.get_issues.assert_called_once_with({"ABC-123", "ABC-124"})
+
+
+def test_daemon_updates_issue_cache(tmp_path, mocker):
+    jira_client = mocker.MagicMock()
+    jira_client.get_issues.return_value = {"ABC-123": ("In Progress", None), "ABC-124": ("To Do", None)}
+    with running_daemon(tmp_path / "d.sock", IssueCache(jira_client, tmp_path), ttl=None) as daemon_server:
+        DaemonClient(tmp_path / "d.sock", "http://example.example/").get_issues({"ABC-123", "ABC-124"})
+        daemon_server.update_issues({"XYZ-7": ("Done", "Done"), "ABC-124": None}, {"ABC-123"})
+    jira_client.get_issues.reset_mock()
+
+    assert IssueCache(jira_client, tmp_path).get_issues({"ABC-123", "ABC-124", "XYZ-7"}) == {
+        "ABC-123": ("In Progress", None),
+        "XYZ-7": ("Done", "Done"),
+    }
+    jira_client.get_issues.assert_called_once_with({"ABC-123"})